@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""
+Offline Benchmark Suite for ERP RAG System
+Ingestion, chunking, embedding, search and end-to-end QA throughput/latency
+
+Usage:
+    python benchmark.py                              # all sections, default sizes
+    python benchmark.py --only search,e2e --sizes 1000,10000,100000
+    python benchmark.py --compare old.json new.json  # diff two result files
+"""
+
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.language_models.llms import LLM
+
+from config import Config
+
+SECTIONS = ["ingest", "chunk", "embed", "search", "quant", "docstore", "e2e", "prefix"]
+SAMPLE_QUERIES = [
+    "What is the purchase order approval workflow?",
+    "How many days do I have to submit expense reports?",
+    "What documents are needed for vendor registration?",
+    "How are invoices verified before payment?",
+    "Who approves capital purchases above the limit?",
+]
+
+# Prompt layout before the system prefix was split out: the static instructions
+# came after the per-request context, so almost nothing was reusable between calls
+INLINE_TEMPLATE = """You are an ERP system expert assistant. Answer the question using ONLY the context provided below.
+
+CONTEXT FROM ERP DOCUMENTATION:
+{context}
+
+INSTRUCTIONS:
+1. Answer directly and concisely
+2. Cite sources using [Source 1], [Source 2] format after each claim
+3. If information is missing, say "I don't have that information in the provided documents"
+4. Use bullet points for procedural questions
+5. Be specific and factual
+
+USER QUESTION: {query}
+
+ANSWER:"""
+
+
+class FakeLLM(LLM):
+    """Deterministic stand-in for Ollama with a fixed prefill and decode speed"""
+
+    prefill_seconds: float = 0.05
+    tokens_per_second: float = 200.0
+    answer_tokens: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    def _call(self, prompt: str, stop=None, run_manager=None, **kwargs) -> str:
+        time.sleep(self.prefill_seconds + self.answer_tokens / self.tokens_per_second)
+        return " ".join(["answer"] * self.answer_tokens) + " [Source 1]"
+
+
+def latency_stats(seconds: List[float]) -> Dict[str, float]:
+    """Mean and tail latency in milliseconds"""
+    if not seconds:
+        return {}
+    ms = np.asarray(seconds) * 1000
+    return {
+        "count": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def bench_ingest(data_dir: Path, max_files: int) -> Dict:
+    from ingestion import DocumentIngester
+
+    ingester = DocumentIngester(str(data_dir))
+    files = sorted(ingester.list_files())[: max_files or None]
+    total_bytes = sum(f.stat().st_size for f in files)
+
+    start = time.perf_counter()
+    docs = ingester.ingest_files(files)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "files": len(files),
+        "documents": len(docs),
+        "pages": ingester.pages_read,
+        "seconds": round(elapsed, 3),
+        "pages_per_s": round(ingester.pages_read / elapsed, 2) if elapsed else 0.0,
+        "mb_per_s": round(total_bytes / 1e6 / elapsed, 3) if elapsed else 0.0,
+        "_docs": docs,
+    }
+
+
+def bench_chunk(docs: List[Dict], repeats: int) -> Dict:
+    from ingestion import DocumentChunker
+
+    chunker = DocumentChunker(Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
+    words = sum(len(d["content"].split()) for d in docs)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        chunks = chunker.chunk_documents(docs)
+    elapsed = (time.perf_counter() - start) / repeats
+
+    return {
+        "documents": len(docs),
+        "chunks": len(chunks),
+        "words": words,
+        "seconds": round(elapsed, 4),
+        "chunks_per_s": round(len(chunks) / elapsed, 1) if elapsed else 0.0,
+        "words_per_s": round(words / elapsed, 1) if elapsed else 0.0,
+        "_chunks": chunks,
+    }
+
+
+def bench_embed(retriever, chunks: List[Dict], max_chunks: int) -> Dict:
+    texts = [c["text"] for c in chunks[:max_chunks]]
+    retriever.embeddings.embed_documents(texts[:8])  # warm up
+
+    start = time.perf_counter()
+    vectors = retriever.embeddings.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "chunks": len(texts),
+        "batch_size": Config.EMBEDDING_BATCH_SIZE,
+        "seconds": round(elapsed, 3),
+        "chunks_per_s": round(len(texts) / elapsed, 2) if elapsed else 0.0,
+        "_vectors": np.asarray(vectors, dtype=np.float32),
+    }
+
+
+def bench_search(retriever, dim: int, sizes: List[int], queries: int, top_k: int) -> Dict:
+    """Search latency over synthetic normalized vectors at several corpus sizes"""
+    from embeddings_store import RAGRetriever
+
+    rng = np.random.default_rng(0)
+    query_vectors = _normalize(rng.standard_normal((queries, dim)).astype(np.float32))
+    results = {}
+
+    for size in sizes:
+        vectors = _normalize(rng.standard_normal((size, dim)).astype(np.float32))
+        chunks = [
+            {
+                "text": f"synthetic chunk {i}",
+                "source": f"doc_{i % 50}.pdf",
+                "chunk_id": f"doc_{i % 50}.pdf_chunk_{i}",
+                "metadata": {"source_file": f"doc_{i % 50}.pdf", "category": "synthetic", "chunk_index": i},
+            }
+            for i in range(size)
+        ]
+        store = RAGRetriever(embeddings=retriever.embeddings)
+        build_start = time.perf_counter()
+        store.index_embeddings(chunks, vectors)
+        build_seconds = time.perf_counter() - build_start
+
+        plain, filtered = [], []
+        for q in query_vectors:
+            start = time.perf_counter()
+            store.retrieve_by_vector(q.tolist(), top_k=top_k)
+            plain.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            store.retrieve_by_vector(q.tolist(), top_k=top_k, filters={"source_file": "doc_7.pdf"})
+            filtered.append(time.perf_counter() - start)
+
+        results[str(size)] = {
+            "build_seconds": round(build_seconds, 3),
+            "search": latency_stats(plain),
+            "filtered_search": latency_stats(filtered),
+        }
+        print(f"  size={size}: p50 {results[str(size)]['search']['p50_ms']}ms")
+    return results
+
+
+def bench_quantization(retriever, corpora: Dict[str, np.ndarray], queries: int, top_k: int,
+                       rerank_factor: int) -> Dict:
+    """Index memory, recall@k against exact fp32 search and latency per storage format"""
+    from embeddings_store import RAGRetriever
+
+    rng = np.random.default_rng(1)
+    results = {}
+    for name, vectors in corpora.items():
+        # Queries near real points (perturbed corpus vectors) rather than uniform noise
+        picks = vectors[rng.integers(0, len(vectors), queries)]
+        query_vectors = _normalize(picks + 0.05 * rng.standard_normal(picks.shape).astype(np.float32))
+        chunks = [
+            {"text": f"chunk {i}", "source": "bench.pdf", "metadata": {"source_file": "bench.pdf", "chunk_index": i}}
+            for i in range(len(vectors))
+        ]
+
+        exact = np.argsort(-(query_vectors @ vectors.T), axis=1)[:, :top_k]
+        variants = [("fp32", 0), ("fp16", 0), ("int8", 0), ("int8", rerank_factor)]
+        rows = {}
+        for storage, factor in variants:
+            store = RAGRetriever(embeddings=retriever.embeddings, storage=storage, rerank_factor=factor)
+            store.index_embeddings(chunks, vectors)
+
+            latencies, hits = [], 0
+            for q, truth in zip(query_vectors, exact):
+                start = time.perf_counter()
+                found = store.retrieve_by_vector(q.tolist(), top_k=top_k)
+                latencies.append(time.perf_counter() - start)
+                hits += len({r["metadata"]["chunk_index"] for r in found} & set(truth.tolist()))
+
+            label = f"{storage}+rerank{factor}" if factor else storage
+            rows[label] = {
+                "index_mb": round(store.memory_bytes() / 1e6, 3),
+                f"recall@{top_k}": round(hits / (len(exact) * top_k), 4),
+                "search": latency_stats(latencies),
+            }
+        results[name] = rows
+        print(f"  {name}: " + ", ".join(f"{k} {v['index_mb']}MB r={v[f'recall@{top_k}']}" for k, v in rows.items()))
+    return results
+
+
+def bench_docstore(chunks: List[Dict], lookups: int) -> Dict:
+    """On-disk size, resident memory after loading and top-k lookup cost:
+    LangChain's pickled docstore vs ChunkStore (plain and zlib blocks)"""
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_core.documents import Document
+
+    from chunk_store import ChunkStore
+
+    rng = random.Random(0)
+    ids = [rng.randrange(len(chunks)) for _ in range(lookups)]
+    results = {"chunks": len(chunks)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # What FAISS.save_local pickles: the docstore plus the ID mapping
+        docstore = InMemoryDocstore(
+            {
+                str(i): Document(
+                    page_content=c["text"],
+                    metadata={"source": c["source"], "chunk_id": c["chunk_id"], **c["metadata"]},
+                )
+                for i, c in enumerate(chunks)
+            }
+        )
+        pickled = Path(tmp) / "index.pkl"
+        with open(pickled, "wb") as f:
+            pickle.dump((docstore, {i: str(i) for i in range(len(chunks))}), f)
+        del docstore
+
+        for compress in (False, True):
+            ChunkStore.from_chunks(chunks, compress=compress).save(str(Path(tmp) / f"store_{compress}"))
+
+        def load_langchain():
+            with open(pickled, "rb") as f:
+                store, id_map = pickle.load(f)
+            return lambda i: store.search(id_map[i])
+
+        def load_chunk_store(compress):
+            store = ChunkStore.load(str(Path(tmp) / f"store_{compress}"))
+            return lambda i: (store.text(i), store.metadata(i))
+
+        for name, load, files in [
+            ("langchain", load_langchain, [pickled]),
+            ("chunk_store", lambda: load_chunk_store(False), Path(tmp, "store_False").iterdir()),
+            ("chunk_store_zlib", lambda: load_chunk_store(True), Path(tmp, "store_True").iterdir()),
+        ]:
+            tracemalloc.start()
+            lookup = load()
+            resident = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            for i in ids:
+                lookup(i)
+            per_lookup = (time.perf_counter() - start) / len(ids)
+
+            results[name] = {
+                "disk_mb": round(sum(f.stat().st_size for f in files) / 1e6, 3),
+                "resident_mb": round(resident / 1e6, 3),
+                "lookup_us": round(per_lookup * 1e6, 2),
+            }
+            print(f"  {name}: {results[name]}")
+    return results
+
+
+def bench_e2e(retriever, queries: int, top_k: int, llm: FakeLLM) -> Dict:
+    """End-to-end answer_question latency with a deterministic fake LLM, and without any LLM"""
+    from llm_generation import RAGPipeline
+
+    pipeline = RAGPipeline(retriever, llm=llm)
+    report = {
+        "llm": {
+            "prefill_seconds": llm.prefill_seconds,
+            "tokens_per_second": llm.tokens_per_second,
+            "answer_tokens": llm.answer_tokens,
+        }
+    }
+    for mode in ("generate", "extractive"):
+        latencies, stages = [], {}
+        for i in range(queries):
+            query = SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]
+            start = time.perf_counter()
+            result = pipeline.answer_question(query, top_k=top_k, mode=mode)
+            latencies.append(time.perf_counter() - start)
+            for stage, ms in result.get("timings", {}).items():
+                stages.setdefault(stage, []).append(ms / 1000)
+
+        section = {
+            "latency": latency_stats(latencies),
+            "stages": {stage: latency_stats(values) for stage, values in stages.items()},
+        }
+        if mode == "generate":
+            report.update(section)
+        else:
+            report["extractive"] = section
+    return report
+
+
+def bench_prefix(base_url: str, model: str, contexts: List, keep_alive: str) -> Dict:
+    """Ollama-reported prefill per request: inline instructions vs a stable system prefix"""
+    import requests
+
+    from llm_generation import PROMPT_TEMPLATE, SYSTEM_PROMPT, format_context
+
+    results = {}
+    for layout in ("inline", "system"):
+        seconds, tokens = [], []
+        for n, (query, chunks) in enumerate(contexts):
+            context = format_context(chunks)
+            if layout == "inline":
+                payload = {"prompt": INLINE_TEMPLATE.format(context=context, query=query)}
+            else:
+                payload = {"system": SYSTEM_PROMPT, "prompt": PROMPT_TEMPLATE.format(context=context, query=query)}
+            payload.update(
+                model=model, stream=False, keep_alive=keep_alive,
+                options={"num_predict": 1, "temperature": 0},  # prefill is what we measure
+            )
+            response = requests.post(f"{base_url}/api/generate", json=payload, timeout=600)
+            response.raise_for_status()
+            info = response.json()
+            if n == 0:
+                continue  # Cold: loads the model / fills the cache for this layout
+            seconds.append(info.get("prompt_eval_duration", 0) / 1e9)
+            tokens.append(info.get("prompt_eval_count", 0))
+
+        results[layout] = {
+            "prefill": latency_stats(seconds),
+            "prompt_eval_tokens_mean": round(float(np.mean(tokens)), 1) if tokens else 0.0,
+        }
+
+    inline, system = results["inline"]["prefill"], results["system"]["prefill"]
+    if inline and system:
+        results["prefill_saved_ms_per_request"] = round(inline["mean_ms"] - system["mean_ms"], 3)
+        results["prompt_tokens_saved_per_request"] = round(
+            results["inline"]["prompt_eval_tokens_mean"] - results["system"]["prompt_eval_tokens_mean"], 1
+        )
+    print(f"  prefill saved per request: {results.get('prefill_saved_ms_per_request', 'n/a')} ms")
+    return results
+
+
+def _prefix_contexts(chunks: List[Dict], requests: int, top_k: int) -> List:
+    """(query, context chunks) pairs; real chunks if ingested, else synthetic text"""
+    rng = random.Random(0)
+    if not chunks:
+        chunks = [
+            {"text": " ".join(q.split() * 30), "source": f"doc_{i}.pdf"}
+            for i, q in enumerate(SAMPLE_QUERIES)
+        ]
+    return [
+        (SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)], rng.sample(chunks, min(top_k, len(chunks))))
+        for i in range(requests + 1)
+    ]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        ).stdout.strip()
+    except Exception:
+        commit = ""
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "embedding_model": Config.EMBEDDING_MODEL,
+            "chunk_size": Config.CHUNK_SIZE,
+            "chunk_overlap": Config.CHUNK_OVERLAP,
+            "embedding_batch_size": Config.EMBEDDING_BATCH_SIZE,
+        },
+    }
+
+
+def run(args) -> Dict:
+    sections = args.only.split(",") if args.only else SECTIONS
+    report = {"environment": environment(), "results": {}}
+    results = report["results"]
+
+    random.seed(0)
+    docs, chunks, retriever = [], [], None
+
+    if {"ingest", "chunk", "embed", "e2e"} & set(sections):
+        print("\n▶ Ingestion")
+        ingest = bench_ingest(Path(args.data_dir), args.max_files)
+        docs = ingest.pop("_docs")
+        if "ingest" in sections:
+            results["ingest"] = ingest
+
+        print("\n▶ Chunking")
+        chunk = bench_chunk(docs, args.repeats)
+        chunks = chunk.pop("_chunks")
+        if "chunk" in sections:
+            results["chunk"] = chunk
+
+    if {"embed", "search", "quant", "e2e"} & set(sections):
+        from embeddings_store import RAGRetriever
+
+        retriever = RAGRetriever(Config.EMBEDDING_MODEL)
+
+    if "embed" in sections or "e2e" in sections:
+        print("\n▶ Embedding")
+        embed = bench_embed(retriever, chunks, args.max_chunks)
+        vectors = embed.pop("_vectors")
+        if "embed" in sections:
+            results["embed"] = embed
+
+    if "search" in sections:
+        print("\n▶ Search")
+        dim = len(retriever.embeddings.embed_query("dimension probe"))
+        sizes = [int(s) for s in args.sizes.split(",")]
+        results["search"] = bench_search(retriever, dim, sizes, args.queries, args.top_k)
+
+    if "quant" in sections:
+        print("\n▶ Quantized storage")
+        dim = len(retriever.embeddings.embed_query("dimension probe"))
+        rng = np.random.default_rng(0)
+        corpora = {
+            str(size): _normalize(rng.standard_normal((size, dim)).astype(np.float32))
+            for size in (int(s) for s in args.sizes.split(","))
+        }
+        if "embed" in sections or "e2e" in sections:
+            corpora["corpus"] = vectors
+        results["quant"] = bench_quantization(
+            retriever, corpora, args.queries, args.top_k, Config.RERANK_FACTOR
+        )
+
+    if "docstore" in sections:
+        print("\n▶ Docstore")
+        if not chunks:
+            # No corpus loaded: synthesize chunker-shaped records
+            chunks = [
+                {
+                    "text": " ".join(random.choice(SAMPLE_QUERIES).split() * 40),
+                    "source": f"doc_{i // 20}.pdf",
+                    "chunk_id": f"doc_{i // 20}.pdf_chunk_{i % 20}",
+                    "metadata": {"source_file": f"doc_{i // 20}.pdf", "category": "synthetic",
+                                 "chunk_index": i % 20, "total_chunks": 20},
+                }
+                for i in range(max(int(s) for s in args.sizes.split(",")))
+            ]
+        results["docstore"] = bench_docstore(chunks, args.queries * args.top_k)
+
+    if "e2e" in sections:
+        print("\n▶ End-to-end QA")
+        retriever.index_embeddings(chunks[: len(vectors)], vectors)
+        llm = FakeLLM(
+            prefill_seconds=args.fake_prefill,
+            tokens_per_second=args.fake_tps,
+            answer_tokens=args.fake_tokens,
+        )
+        results["e2e"] = bench_e2e(retriever, args.queries, args.top_k, llm)
+
+    if "prefix" in sections:
+        print("\n▶ Prompt prefix reuse")
+        base_url = args.base_url
+        if args.mock:
+            from mock_ollama import start_mock_ollama
+
+            start_mock_ollama(args.mock_port, model=args.model, tokens_per_second=1000.0, answer_tokens=1)
+            base_url = f"http://127.0.0.1:{args.mock_port}"
+        contexts = _prefix_contexts(chunks, args.prefix_requests, args.top_k)
+        results["prefix"] = bench_prefix(base_url, args.model, contexts, Config.OLLAMA_KEEP_ALIVE)
+
+    return report
+
+
+def compare(old_file: str, new_file: str):
+    """Print relative change of every numeric leaf between two result files"""
+    with open(old_file, encoding="utf-8") as f:
+        old = json.load(f)["results"]
+    with open(new_file, encoding="utf-8") as f:
+        new = json.load(f)["results"]
+
+    def walk(a, b, path):
+        if isinstance(a, dict) and isinstance(b, dict):
+            for key in sorted(set(a) & set(b)):
+                walk(a[key], b[key], f"{path}.{key}" if path else key)
+        elif isinstance(a, (int, float)) and isinstance(b, (int, float)) and a:
+            change = (b - a) / abs(a)
+            print(f"  {path:<50} {a:>12.3f} → {b:>12.3f}  ({change:+.1%})")
+
+    walk(old, new, "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ERP RAG offline benchmarks")
+    parser.add_argument("--only", help=f"Comma-separated sections: {','.join(SECTIONS)}")
+    parser.add_argument("--data-dir", default=str(Config.RAW_DATA_DIR))
+    parser.add_argument("--max-files", type=int, default=20, help="0 = all files")
+    parser.add_argument("--max-chunks", type=int, default=500)
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=Config.DEFAULT_TOP_K)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--fake-prefill", type=float, default=0.05)
+    parser.add_argument("--fake-tps", type=float, default=200.0)
+    parser.add_argument("--fake-tokens", type=int, default=60)
+    parser.add_argument("--base-url", default=Config.OLLAMA_BASE_URL, help="Ollama for the prefix section")
+    parser.add_argument("--model", default=Config.OLLAMA_MODEL)
+    parser.add_argument("--prefix-requests", type=int, default=10)
+    parser.add_argument("--mock", action="store_true", help="Run the prefix section against mock_ollama.py")
+    parser.add_argument("--mock-port", type=int, default=11536)
+    parser.add_argument("--out", help="Result file (default data/benchmarks/bench_<commit>_<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args)
+
+    env = report["environment"]
+    out = Path(args.out) if args.out else (
+        Config.DATA_DIR / "benchmarks"
+        / f"bench_{env['commit'] or 'nogit'}_{env['timestamp'].replace(':', '')}.json"
+    )
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report["results"], indent=2))
+    print(f"\n✓ Results written to {out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
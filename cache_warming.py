@@ -0,0 +1,215 @@
+"""
+Cache Warming Module
+Answer cache, query log and a background warm-up that runs the hot queries
+(quick-access questions plus the most frequent logged ones) after a restart
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from metrics import REGISTRY
+from scheduler import SchedulerBusy
+
+try:
+    import fcntl
+except ImportError:  # Windows: no forked workers sharing the log
+    fcntl = None
+
+# Advertised in the UI's quick-access card, so they are the first things people ask
+QUICK_ACCESS_QUESTIONS = (
+    "Purchase order workflow",
+    "Expense validation protocol",
+    "Vendor registration",
+    "Payment processing",
+    "Invoice verification",
+)
+
+
+def normalize_query(query: str) -> str:
+    """Case, spacing and trailing punctuation don't change the answer"""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!. ").lower()
+
+
+class AnswerCache:
+    """LRU of finished answers, keyed by normalized query, parameters and index version"""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0):
+        """
+        Args:
+            max_entries: Answers kept (least recently used are dropped)
+            ttl: Seconds an answer stays valid; bounds staleness for unversioned indexes
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        REGISTRY.describe("rag_answer_cache_total", "Answer cache lookups by result")
+        REGISTRY.gauge("rag_answer_cache_entries", lambda: len(self._entries))
+
+    @staticmethod
+    def key(query: str, top_k: int, filters: Dict | None, mode: str, version) -> Tuple:
+        return (normalize_query(query), top_k, json.dumps(filters, sort_keys=True, default=str), mode, version)
+
+    def get(self, key: Tuple) -> Dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        REGISTRY.inc("rag_answer_cache_total", result="hit" if entry else "miss")
+        return entry[1] if entry else None
+
+    def put(self, key: Tuple, result: Dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class QueryLog:
+    """Append-only JSONL of asked questions, the source of the warm-up list"""
+
+    def __init__(self, path: str, max_bytes: int = 5_000_000):
+        """
+        Args:
+            path: Active JSONL file (e.g. Config.QUERY_LOG_FILE); one previous file is kept
+            max_bytes: Rotate once the active file reaches this size
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def add(self, query: str):
+        line = json.dumps({"timestamp": datetime.now().isoformat(), "query": query}) + "\n"
+        try:
+            with self._lock:
+                if self._full():
+                    with self._rotation_lock():
+                        # Another worker may have rotated while this one waited
+                        if self._full():
+                            os.replace(self.path, self._previous())
+                # One short O_APPEND write per line, so worker processes can share the file
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"  ⚠️  Could not log query: {e}")
+
+    def _full(self) -> bool:
+        return self.path.exists() and self.path.stat().st_size >= self.max_bytes
+
+    @contextmanager
+    def _rotation_lock(self):
+        """Excludes other processes (serve workers) from rotating at the same time"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.path.with_name(f"{self.path.name}.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def top(self, n: int) -> List[str]:
+        """The n most frequent questions, most frequent first (as first spelled)"""
+        counts: Counter = Counter()
+        spelling: Dict[str, str] = {}
+        for file_path in (self._previous(), self.path):
+            if not file_path.exists():
+                continue
+            with open(file_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        query = str(json.loads(line)["query"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    key = normalize_query(query)
+                    if key:
+                        counts[key] += 1
+                        spelling.setdefault(key, query)
+        return [spelling[key] for key, _ in counts.most_common(n)]
+
+    def _previous(self) -> Path:
+        return self.path.with_name(f"{self.path.stem}.1{self.path.suffix}")
+
+
+def hot_queries(configured: Iterable[str], query_log: QueryLog | None = None, from_log: int = 0) -> List[str]:
+    """Configured questions, then the most frequent logged ones, without duplicates"""
+    queries, seen = [], set()
+    logged = query_log.top(from_log) if query_log is not None and from_log > 0 else []
+    for query in [*configured, *logged]:
+        key = normalize_query(query)
+        if key and key not in seen:
+            seen.add(key)
+            queries.append(query)
+    return queries
+
+
+class CacheWarmer:
+    """Runs hot queries through retrieval and generation on a background thread"""
+
+    def __init__(self, pipeline, queries: List[str], scheduler=None, top_k: int = 5):
+        """
+        Args:
+            pipeline: RAGPipeline whose caches are filled
+            queries: Questions to answer, most important first
+            scheduler: RequestScheduler; warm-up takes one generation slot at a time
+                and stops as soon as real traffic fills the queue
+            top_k: Same top_k the UI and API use, so warmed answers are cache hits
+        """
+        self.pipeline = pipeline
+        self.queries = queries
+        self.scheduler = scheduler
+        self.top_k = top_k
+        self.done = threading.Event()
+        REGISTRY.describe("rag_cache_warm_queries_total", "Warm-up queries by outcome")
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, name="cache-warmer", daemon=True)
+        thread.start()
+        return thread
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            touched = self.pipeline.retriever.prefetch()
+            print(f"🔥 Pre-touched {touched / 1e6:.1f} MB of index pages")
+        except Exception as e:
+            print(f"⚠️  Index prefetch failed: {e}")
+
+        warmed = 0
+        for query in self.queries:
+            try:
+                if self.scheduler is not None:
+                    self.scheduler.run(self.pipeline.warm, query, top_k=self.top_k)
+                else:
+                    self.pipeline.warm(query, top_k=self.top_k)
+            except SchedulerBusy:
+                # Users are already queueing; they matter more than the warm-up
+                REGISTRY.inc("rag_cache_warm_queries_total", outcome="skipped")
+                print(f"⚠️  Cache warm-up stopped: the server is busy ({warmed}/{len(self.queries)} warmed)")
+                break
+            except Exception as e:
+                REGISTRY.inc("rag_cache_warm_queries_total", outcome="error")
+                print(f"⚠️  Could not warm '{query}': {e}")
+                continue
+            warmed += 1
+            REGISTRY.inc("rag_cache_warm_queries_total", outcome="warmed")
+
+        print(f"🔥 Cache warm-up: {warmed}/{len(self.queries)} queries in {time.perf_counter() - start:.1f}s")
+        self.done.set()
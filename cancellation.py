@@ -0,0 +1,67 @@
+"""
+Cancellation Module
+Per-request cancel tokens, so a generation stops (and frees its backend slot)
+when the client disconnects, asks again or the deadline passes
+"""
+
+import threading
+from typing import Callable, List
+
+
+class GenerationCancelled(RuntimeError):
+    """Raised when a request's generation was stopped before the model finished"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"generation stopped: {reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """Shared by a request and whoever may stop it (disconnect watcher, a newer request)"""
+
+    def __init__(self):
+        # "disconnected", "superseded", ...; None while the request may still run
+        self.reason: str | None = None
+        # time.monotonic() by which generation must end; set by RAGPipeline if left None
+        self.deadline: float | None = None
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str = "cancelled"):
+        """Stop the request; only the first reason sticks"""
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Run callback when cancelled (at once if already); returns an unsubscribe function"""
+        with self._lock:
+            if self.reason is None:
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def child(self) -> "CancelToken":
+        """A token (with its own deadline) cancelled whenever this one is, e.g. per query of a batch"""
+        child = CancelToken()
+        self.on_cancel(lambda: child.cancel(self.reason))
+        return child
+
+    def check(self):
+        """Raise GenerationCancelled if the request was cancelled"""
+        if self.reason is not None:
+            raise GenerationCancelled(self.reason)
+
+    def _discard(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
@@ -0,0 +1,238 @@
+"""
+Chunk Quality Module
+Vectorized junk detection for extracted text (scanned or table-heavy PDFs)
+before it is embedded: character entropy, dictionary-word ratio and repetition
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from config import Config
+
+QUALITY_ACTIONS = ("drop", "flag", "off")
+
+# Short and everyday words that prove a chunk is prose; longer words pass the shape test
+COMMON_WORDS = frozenset(
+    """
+    a i am an as at be by do go he if in is it me my no of on or so to up us we
+    all and any are but can did for get had has her him his how its may new not
+    now one our out per see she the too two use via was who why yes you also been
+    both each from have here into just made make many more most much must only
+    other over same some such than that them then they this very well were what
+    when will with your about after again below could every first these those
+    under until where which while would before should through during between
+    id po gl ap ar hr it erp sap vat gst tax pdf qty uom sku ok
+    """.split()
+)
+TOKEN = re.compile(r"\w+")
+VOWEL = re.compile(r"[aeiouyà-öø-ÿ]")
+CONSONANT_RUN = re.compile(r"[^aeiouyà-öø-ÿ]{5}")
+LETTERS = re.compile(r"[a-zß-öø-ÿ]+")
+TRIPLE_LETTER = re.compile(r"(.)\1\1")
+
+
+class ChunkQualityFilter:
+    """Scores chunk texts in one vectorized pass and drops (or flags) extraction junk"""
+
+    def __init__(
+        self,
+        min_entropy: float = 3.0,
+        max_entropy: float = 5.5,
+        min_word_ratio: float = 0.5,
+        max_repetition: float = 0.5,
+        action: str = "drop",
+        dictionary: str | None = None,
+    ):
+        """
+        Args:
+            min_entropy: Bits per character below which text is a repeated pattern
+                (dot leaders, "aaaa", one symbol over and over)
+            max_entropy: Bits per character above which text is symbol soup (OCR noise,
+                mis-decoded fonts); English prose sits around 4-4.5
+            min_word_ratio: Share of tokens that must be dictionary words (or shaped
+                like one: letters only, a vowel, no long consonant runs)
+            max_repetition: Highest share of repeated word trigrams (page headers and
+                table rows copied over and over)
+            action: "drop" junk before it is embedded, "flag" it in metadata
+                (quality_flags) but keep it, or "off"
+            dictionary: Optional word list file (one word per line, e.g.
+                /usr/share/dict/words) added to the built-in common words
+        """
+        if action not in QUALITY_ACTIONS:
+            raise ValueError(f"Unknown quality action '{action}', expected one of {QUALITY_ACTIONS}")
+
+        self.min_entropy = min_entropy
+        self.max_entropy = max_entropy
+        self.min_word_ratio = min_word_ratio
+        self.max_repetition = max_repetition
+        self.action = action
+        self.words = set(COMMON_WORDS)
+        if dictionary and os.path.exists(dictionary):
+            with open(dictionary, "r", encoding="utf-8", errors="ignore") as f:
+                self.words.update(line.strip().lower() for line in f if line.strip())
+        # Per source file: chunks seen, junk found, reasons and mean scores
+        self.files: Dict[str, Dict] = {}
+
+    def settings(self) -> str:
+        """Stable description of everything that changes which chunks survive"""
+        return (
+            f"{self.action}|{self.min_entropy}|{self.max_entropy}|{self.min_word_ratio}"
+            f"|{self.max_repetition}|{len(self.words)}"
+        )
+
+    def score(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Entropy (bits/char), word ratio and repeated-trigram share for every text"""
+        lowered = [text.lower() for text in texts]
+        n = len(lowered)
+
+        # Character entropy: count (text, code point) pairs across all texts at once
+        lengths = np.asarray([len(text) for text in lowered], dtype=np.int64)
+        codes = np.frombuffer("".join(lowered).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+        owners = np.repeat(np.arange(n, dtype=np.int64), lengths)
+        pairs, counts = np.unique((owners << 21) | codes, return_counts=True)
+        pair_owner = pairs >> 21
+        p = counts / lengths[pair_owner]
+        entropy = np.bincount(pair_owner, weights=-p * np.log2(p), minlength=n)
+
+        # Tokens get IDs once; the word test runs per distinct token, not per occurrence
+        token_lists = [TOKEN.findall(text) for text in lowered]
+        token_counts = np.asarray([len(tokens) for tokens in token_lists], dtype=np.int64)
+        vocabulary: Dict[str, int] = {}
+        ids = np.fromiter(
+            (vocabulary.setdefault(token, len(vocabulary)) for tokens in token_lists for token in tokens),
+            dtype=np.int64,
+            count=int(token_counts.sum()),
+        )
+        is_word = np.fromiter((self._is_word(token) for token in vocabulary), dtype=bool, count=len(vocabulary))
+        token_owner = np.repeat(np.arange(n, dtype=np.int64), token_counts)
+        words = np.bincount(token_owner, weights=is_word[ids], minlength=n)
+        word_ratio = words / np.maximum(token_counts, 1)
+
+        repetition = self._repetition(ids, token_owner, n)
+        return {"entropy": entropy, "word_ratio": word_ratio, "repetition": repetition}
+
+    def _repetition(self, ids: np.ndarray, token_owner: np.ndarray, n: int) -> np.ndarray:
+        """Share of each text's word trigrams that already occurred earlier in it"""
+        if len(ids) < 3:
+            return np.zeros(n)
+        within = token_owner[:-2] == token_owner[2:]
+        owner = token_owner[:-2][within]
+        # Hash each trigram into one uint64 (wrap-around multiply; collisions are negligible)
+        u = ids.astype(np.uint64)
+        with np.errstate(over="ignore"):
+            trigram = (u[:-2] * np.uint64(0x9E3779B97F4A7C15) ^ u[1:-1] * np.uint64(0xC2B2AE3D27D4EB4F) ^ u[2:])[within]
+
+        order = np.lexsort((trigram, owner))
+        trigram, owner = trigram[order], owner[order]
+        repeated = (trigram[1:] == trigram[:-1]) & (owner[1:] == owner[:-1])
+        duplicates = np.bincount(owner[1:][repeated], minlength=n)
+        return duplicates / np.maximum(np.bincount(owner, minlength=n), 1)
+
+    def _is_word(self, token: str) -> bool:
+        if token in self.words:
+            return True
+        return (
+            2 <= len(token) <= 20
+            and LETTERS.fullmatch(token) is not None
+            and VOWEL.search(token) is not None
+            and CONSONANT_RUN.search(token) is None
+            and TRIPLE_LETTER.search(token) is None
+        )
+
+    def filter(self, chunks: List[Dict]) -> List[Dict]:
+        """Chunks worth embedding; junk is dropped or flagged, and counted per file"""
+        if self.action == "off" or not chunks:
+            return chunks
+
+        scores = self.score([chunk["text"] for chunk in chunks])
+        checks = {
+            "low_entropy": scores["entropy"] < self.min_entropy,
+            "high_entropy": scores["entropy"] > self.max_entropy,
+            "few_words": scores["word_ratio"] < self.min_word_ratio,
+            "repetitive": scores["repetition"] > self.max_repetition,
+        }
+        junk = np.logical_or.reduce(list(checks.values()))
+
+        kept: List[Dict] = []
+        for i, chunk in enumerate(chunks):
+            source = chunk.get("metadata", {}).get("source_file", chunk.get("source", "Unknown"))
+            reasons = [reason for reason, failed in checks.items() if failed[i]]
+            self._count(source, reasons, scores, i)
+            if not junk[i]:
+                kept.append(chunk)
+            elif self.action == "flag":
+                chunk["metadata"] = {**chunk.get("metadata", {}), "quality_flags": ",".join(reasons)}
+                kept.append(chunk)
+
+        if junk.any():
+            verb = "Dropped" if self.action == "drop" else "Flagged"
+            print(f"🧹 {verb} {int(junk.sum())}/{len(chunks)} low-quality chunks")
+        return kept
+
+    def _count(self, source: str, reasons: List[str], scores: Dict[str, np.ndarray], i: int):
+        entry = self.files.setdefault(
+            source, {"chunks": 0, "junk": 0, "reasons": {}, "entropy": 0.0, "word_ratio": 0.0, "repetition": 0.0}
+        )
+        entry["chunks"] += 1
+        if reasons:
+            entry["junk"] += 1
+            for reason in reasons:
+                entry["reasons"][reason] = entry["reasons"].get(reason, 0) + 1
+        for key in ("entropy", "word_ratio", "repetition"):
+            # Running mean over the file's chunks
+            entry[key] += (float(scores[key][i]) - entry[key]) / entry["chunks"]
+
+    def report(self) -> List[Dict]:
+        """Per-file results, files with the most junk first"""
+        rows = [
+            {"file": source, "action": self.action, **entry,
+             **{key: round(entry[key], 3) for key in ("entropy", "word_ratio", "repetition")}}
+            for source, entry in self.files.items()
+        ]
+        return sorted(rows, key=lambda row: (-row["junk"] / max(row["chunks"], 1), row["file"]))
+
+    def print_report(self, limit: int = 10):
+        rows = [row for row in self.report() if row["junk"]]
+        if not rows:
+            return
+        print(f"🧹 Chunk quality: {sum(r['junk'] for r in rows)} junk chunks in {len(rows)} files")
+        for row in rows[:limit]:
+            reasons = ", ".join(f"{reason} {count}" for reason, count in sorted(row["reasons"].items()))
+            print(f"  {row['file']}: {row['junk']}/{row['chunks']} ({reasons})")
+
+    def save_report(self, path: str):
+        """Merge this run's files into the JSON report (incremental runs only see changed files)"""
+        report_path = Path(path)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        files: Dict[str, Dict] = {}
+        if report_path.exists():
+            try:
+                with open(report_path, "r", encoding="utf-8") as f:
+                    files = {row["file"]: row for row in json.load(f)["files"]}
+            except (ValueError, KeyError, TypeError):
+                files = {}
+        files.update({row["file"]: row for row in self.report()})
+
+        tmp = report_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"files": sorted(files.values(), key=lambda row: row["file"])}, f, indent=2)
+        os.replace(tmp, report_path)
+
+
+def load_quality_filter() -> ChunkQualityFilter | None:
+    """The filter configured in Config, or None when CHUNK_QUALITY is off"""
+    if Config.CHUNK_QUALITY == "off":
+        return None
+    return ChunkQualityFilter(
+        min_entropy=Config.QUALITY_MIN_ENTROPY,
+        max_entropy=Config.QUALITY_MAX_ENTROPY,
+        min_word_ratio=Config.QUALITY_MIN_WORD_RATIO,
+        max_repetition=Config.QUALITY_MAX_REPETITION,
+        action=Config.CHUNK_QUALITY,
+        dictionary=Config.QUALITY_DICTIONARY,
+    )
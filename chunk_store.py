@@ -0,0 +1,217 @@
+"""
+Chunk Store Module
+Compact docstore: chunk text in one byte buffer (optionally zlib-compressed
+blocks), interned strings and array-backed metadata, addressed by FAISS ID
+"""
+
+import json
+import mmap
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+# Metadata fields stored as codes into the shared string table
+STRING_FIELDS = ("source", "source_file", "category")
+# Metadata fields stored as int32 arrays
+INT_FIELDS = ("chunk_index", "total_chunks")
+MISSING = -1
+
+META_FILE = "meta.json"
+TEXT_FILE = "text.bin"
+
+
+class ChunkStore:
+    """Read-only chunk text and metadata for one index"""
+
+    def __init__(
+        self,
+        strings: List[str],
+        codes: Dict[str, np.ndarray],
+        ints: Dict[str, np.ndarray],
+        text: bytes,
+        offsets: np.ndarray,
+        block_offsets: np.ndarray | None = None,
+        block_size: int = 0,
+        extras: Dict[str, Dict] | None = None,
+    ):
+        """
+        Args:
+            strings: Interned string table shared by every STRING_FIELDS column
+            codes: Per string field, int32 index into `strings` (MISSING = absent)
+            ints: Per int field, int32 values (MISSING = absent)
+            text: UTF-8 chunk text, concatenated (or compressed blocks of it)
+            offsets: Start of each chunk in the uncompressed text, plus an end sentinel
+            block_offsets: Byte offsets of the compressed blocks, None if uncompressed
+            block_size: Chunks per compressed block
+            extras: Sparse per-ID metadata that does not fit the columns
+        """
+        self.strings = strings
+        self.codes = codes
+        self.ints = ints
+        self.text_buffer = text
+        self.offsets = offsets
+        self.block_offsets = block_offsets
+        self.block_size = block_size
+        self.extras = extras or {}
+        # A handful of hot blocks stay decompressed; top-k hits tend to cluster by document
+        self._block = lru_cache(maxsize=32)(self._decompress_block)
+
+    @classmethod
+    def from_chunks(cls, chunks: List[Dict], compress: bool = False, block_size: int = 16) -> "ChunkStore":
+        """Build from DocumentChunker-style dicts, in FAISS ID order"""
+        strings: List[str] = []
+        interned: Dict[str, int] = {}
+        codes = {field: np.full(len(chunks), MISSING, dtype=np.int32) for field in STRING_FIELDS}
+        ints = {field: np.full(len(chunks), MISSING, dtype=np.int32) for field in INT_FIELDS}
+        extras: Dict[str, Dict] = {}
+        encoded: List[bytes] = []
+
+        for i, chunk in enumerate(chunks):
+            metadata = {"source": chunk.get("source", "Unknown"), **chunk.get("metadata", {})}
+            extra = {}
+            for key, value in metadata.items():
+                if key in STRING_FIELDS and isinstance(value, str):
+                    code = interned.get(value)
+                    if code is None:
+                        code = interned[value] = len(strings)
+                        strings.append(value)
+                    codes[key][i] = code
+                elif key in INT_FIELDS and isinstance(value, int) and value >= 0:
+                    ints[key][i] = value
+                else:
+                    extra[key] = value
+
+            # chunk_id is derivable for chunker output; only store the odd ones
+            chunk_id = chunk.get("chunk_id", "")
+            if chunk_id != _default_chunk_id(metadata["source"], metadata.get("chunk_index")):
+                extra["chunk_id"] = chunk_id
+            if extra:
+                extras[str(i)] = extra
+            encoded.append(chunk["text"].encode("utf-8"))
+
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        if not compress:
+            return cls(strings, codes, ints, b"".join(encoded), offsets, extras=extras)
+
+        # Blocks of `block_size` chunks are compressed independently
+        blocks = [
+            zlib.compress(b"".join(encoded[start : start + block_size]), 6)
+            for start in range(0, len(encoded), block_size)
+        ]
+        block_offsets = np.zeros(len(blocks) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in blocks], out=block_offsets[1:])
+        return cls(
+            strings, codes, ints, b"".join(blocks), offsets,
+            block_offsets=block_offsets, block_size=block_size, extras=extras,
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def text(self, i: int) -> str:
+        if self.block_offsets is None:
+            return self.text_buffer[self.offsets[i] : self.offsets[i + 1]].decode("utf-8")
+
+        block = i // self.block_size
+        base = self.offsets[block * self.block_size]
+        data = self._block(block)
+        return data[self.offsets[i] - base : self.offsets[i + 1] - base].decode("utf-8")
+
+    def metadata(self, i: int) -> Dict:
+        """Materialize the metadata dict of one chunk"""
+        metadata: Dict = {}
+        for field in STRING_FIELDS:
+            code = self.codes[field][i]
+            if code != MISSING:
+                metadata[field] = self.strings[code]
+        metadata.setdefault("source", "Unknown")
+        for field in INT_FIELDS:
+            value = self.ints[field][i]
+            if value != MISSING:
+                metadata[field] = int(value)
+        metadata["chunk_id"] = _default_chunk_id(metadata["source"], metadata.get("chunk_index"))
+        metadata.update(self.extras.get(str(i), {}))
+        return metadata
+
+    def prefetch(self) -> int:
+        """Fault the mapped text and metadata arrays into memory; bytes touched"""
+        arrays = list(self.codes.values()) + list(self.ints.values()) + [self.offsets]
+        if self.block_offsets is not None:
+            arrays.append(self.block_offsets)
+        return touch_pages(self.text_buffer) + sum(touch_pages(a) for a in arrays)
+
+    def nbytes(self) -> int:
+        """Approximate resident size of the store"""
+        arrays = list(self.codes.values()) + list(self.ints.values()) + [self.offsets]
+        if self.block_offsets is not None:
+            arrays.append(self.block_offsets)
+        strings = sum(len(s) + 49 for s in self.strings)
+        return len(self.text_buffer) + sum(a.nbytes for a in arrays) + strings
+
+    def save(self, save_dir: str):
+        path = Path(save_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        (path / TEXT_FILE).write_bytes(self.text_buffer)
+        np.save(path / "offsets.npy", self.offsets)
+        if self.block_offsets is not None:
+            np.save(path / "block_offsets.npy", self.block_offsets)
+        for field, values in {**self.codes, **self.ints}.items():
+            np.save(path / f"{field}.npy", values)
+        with open(path / META_FILE, "w", encoding="utf-8") as f:
+            json.dump(
+                {"strings": self.strings, "extras": self.extras, "block_size": self.block_size}, f
+            )
+
+    @classmethod
+    def load(cls, load_dir: str) -> "ChunkStore":
+        """Memory-map a saved store; processes loading the same files share their pages"""
+        path = Path(load_dir)
+        with open(path / META_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        block_file = path / "block_offsets.npy"
+        return cls(
+            meta["strings"],
+            {field: np.load(path / f"{field}.npy", mmap_mode="r") for field in STRING_FIELDS},
+            {field: np.load(path / f"{field}.npy", mmap_mode="r") for field in INT_FIELDS},
+            _map_file(path / TEXT_FILE),
+            np.load(path / "offsets.npy", mmap_mode="r"),
+            block_offsets=np.load(block_file, mmap_mode="r") if block_file.exists() else None,
+            block_size=meta["block_size"],
+            extras=meta["extras"],
+        )
+
+    @staticmethod
+    def exists(load_dir: str) -> bool:
+        return (Path(load_dir) / META_FILE).exists()
+
+    def _decompress_block(self, block: int) -> bytes:
+        start, end = self.block_offsets[block], self.block_offsets[block + 1]
+        return zlib.decompress(self.text_buffer[start:end])
+
+
+def touch_pages(buffer) -> int:
+    """Read one byte per page of a buffer or array so later reads don't fault; its size"""
+    if isinstance(buffer, mmap.mmap) and hasattr(mmap, "MADV_WILLNEED"):
+        buffer.madvise(mmap.MADV_WILLNEED)  # Let the kernel read ahead
+    if isinstance(buffer, np.ndarray):
+        data = np.ascontiguousarray(buffer).reshape(-1).view(np.uint8)
+    else:
+        data = np.frombuffer(buffer, dtype=np.uint8)
+    int(data[:: mmap.PAGESIZE].sum())
+    return data.nbytes
+
+
+def _map_file(file_path: Path):
+    """Read-only mapping of a file (mmap can't map an empty one)"""
+    with open(file_path, "rb") as f:
+        if not f.seek(0, 2):
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _default_chunk_id(source: str, chunk_index) -> str:
+    return f"{source}_chunk_{chunk_index}" if chunk_index is not None else ""
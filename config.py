@@ -16,34 +16,136 @@ class Config:
     RAW_DATA_DIR = DATA_DIR / "raw"
     EMBEDDINGS_DIR = DATA_DIR / "embeddings"
     FEEDBACK_FILE = DATA_DIR / "feedback" / "feedback.jsonl"
+    FEEDBACK_MAX_BYTES = 5_000_000
+    FEEDBACK_ROTATE_SECONDS = 24 * 3600
+    FEEDBACK_BACKUP_COUNT = 10
+    FEEDBACK_FLUSH_SECONDS = 1.0
     
     # Document Processing
     CHUNK_SIZE = 500
     CHUNK_OVERLAP = 100
     MIN_CHUNK_SIZE = 50
+    # Junk-chunk filter for scanned/table-heavy PDFs, applied before embedding:
+    # drop, flag (keep, marked with metadata quality_flags) or off. A chunk is junk
+    # if its character entropy (bits/char) is outside the range, too few of its
+    # tokens are words, or too many of its word trigrams repeat. QUALITY_DICTIONARY
+    # extends the built-in word list if the file exists
+    CHUNK_QUALITY = os.getenv("CHUNK_QUALITY", "drop")
+    QUALITY_MIN_ENTROPY = 3.0
+    QUALITY_MAX_ENTROPY = 5.5
+    QUALITY_MIN_WORD_RATIO = 0.5
+    QUALITY_MAX_REPETITION = 0.5
+    QUALITY_DICTIONARY = os.getenv("QUALITY_DICTIONARY", "/usr/share/dict/words")
+    QUALITY_REPORT_FILE = DATA_DIR / "quality" / "chunk_quality.json"
     SUPPORTED_FORMATS = ['.pdf', '.docx', '.txt', '.html', '.md']
     
     # Embedding Model
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"
     EMBEDDING_BATCH_SIZE = 32
+    # Shared model served by `quick_start.py embed-server`: "unix:/path.sock" or
+    # "host:port". Empty = every process loads its own copy
+    EMBEDDING_SERVICE = os.getenv("EMBEDDING_SERVICE", "")
+    EMBEDDING_SERVICE_MAX_BATCH = 64
+    EMBEDDING_SERVICE_MAX_WAIT_MS = 2.0
     
     # Vector Store
     VECTOR_STORE = "faiss"
+    # One index shard per top-level data/raw folder, searched via a centroid router
+    SHARD_BY_CATEGORY = os.getenv("SHARD_BY_CATEGORY", "true").lower() == "true"
+    ROUTER_MAX_SHARDS = 2
+    ROUTER_MARGIN = 0.1
+    MAX_LOADED_SHARDS = 0  # 0 = keep every routed shard in memory
+    # Distributed search: comma-separated shard-server addresses ("host:port" or
+    # "unix:/path.sock"). Every query is sent to all of them and their top-k merged;
+    # a shard slower than SHARD_TIMEOUT_SECONDS is left out (partial results)
+    SHARD_SERVERS = [a.strip() for a in os.getenv("SHARD_SERVERS", "").split(",") if a.strip()]
+    SHARD_TIMEOUT_SECONDS = float(os.getenv("SHARD_TIMEOUT_SECONDS", "2"))
+    SHARD_SERVER_PORT = 8801  # First port of `quick_start.py shard-server` local servers
+    # In-RAM vector format for new indexes: fp32 (exact), fp16 (1/2 size) or int8 (1/4 size)
+    VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "fp32")
+    RERANK_FACTOR = 4  # Quantized: re-rank top_k * N candidates against fp32 on disk (0 = off)
+    COMPRESS_CHUNK_TEXT = os.getenv("COMPRESS_CHUNK_TEXT", "false").lower() == "true"
+    # Indexes are published as data/embeddings/versions/<version>/ behind a CURRENT pointer
+    INDEX_KEEP_VERSIONS = 3
+    INDEX_RELOAD_SECONDS = 10  # How often the server checks for a new version (0 = never)
+    # Full builds checkpoint embedded vectors every N chunks and resume after a crash
+    INDEX_CHECKPOINT_DIR = EMBEDDINGS_DIR / "build"
+    INDEX_CHECKPOINT_CHUNKS = 512
+    # `quick_start.py watch`: poll data/raw, wait for changes to settle, re-embed only touched files
+    INDEXER_POLL_SECONDS = 2.0
+    INDEXER_DEBOUNCE_SECONDS = 5.0
+    INDEXER_CACHE_DIR = EMBEDDINGS_DIR / "file_cache"
     
     # Ollama Configuration
     LLM_PROVIDER = "ollama"
     OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
     OLLAMA_TEMPERATURE = 0.1
-    MAX_GENERATION_TOKENS = 1000
+    # Per answer: at most this many tokens (Ollama num_predict) and this many
+    # seconds of generation; then it stops and the partial answer is returned
+    MAX_GENERATION_TOKENS = int(os.getenv("MAX_GENERATION_TOKENS", "1000"))
+    GENERATION_TIMEOUT_SECONDS = float(os.getenv("GENERATION_TIMEOUT_SECONDS", "120"))
+    # Identical questions asked while one is being answered share its generation
+    SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+    # Keep the model (and the cached system-prompt prefix) loaded between requests
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    # auto = LLM with extractive fallback, generate = LLM only, extractive = no LLM
+    ANSWER_MODE = os.getenv("ANSWER_MODE", "auto")
+    GENERATION_SLO_SECONDS = float(os.getenv("GENERATION_SLO_SECONDS", "20"))
+    BACKEND_RETRY_SECONDS = 30.0  # After a failure, skip the LLM this long before probing again
     
+    # Request Scheduling (admission control in front of generation)
+    MAX_INFLIGHT_GENERATIONS = int(os.getenv("MAX_INFLIGHT_GENERATIONS", "2"))
+    MAX_QUEUE_SIZE = int(os.getenv("MAX_QUEUE_SIZE", "16"))
+    QUEUE_TIMEOUT_SECONDS = 30.0
+
+    # JSON API (http://localhost:API_PORT/query); next to the UI in `demo` (0 = off).
+    # `quick_start.py serve` answers it from N forked workers that share the
+    # embedding model and the memory-mapped index
+    API_PORT = int(os.getenv("API_PORT", "8000"))
+    SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "0"))  # 0 = one per CPU
+
+    # Answer cache and startup warm-up: after a (re)start, the quick-access questions
+    # (or WARM_QUERIES, "|"-separated) and the WARM_FROM_LOG most frequent logged
+    # questions are answered in the background, so first users hit warm caches
+    ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))  # 0 = off
+    ANSWER_CACHE_SECONDS = 3600.0
+    QUERY_LOG_FILE = DATA_DIR / "queries" / "queries.jsonl"
+    QUERY_LOG_MAX_BYTES = 5_000_000
+    WARM_CACHE = os.getenv("WARM_CACHE", "true").lower() == "true"
+    WARM_QUERIES = [q for q in os.getenv("WARM_QUERIES", "").split("|") if q.strip()]
+    WARM_FROM_LOG = int(os.getenv("WARM_FROM_LOG", "20"))
+
     # Retrieval Settings
     DEFAULT_TOP_K = 5
+    # Concurrent queries share one embedding forward pass and one FAISS multi-query
+    # search. Only queries that arrive while a batch is running join the next one,
+    # unless QUERY_BATCH_WAIT_MS holds the batch open longer (0 = no added latency)
+    QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", "32"))  # 0 = off
+    QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", "0"))
     MIN_SIMILARITY_SCORE = 0.3
+    # Two-stage retrieval: score per-document centroid vectors first, then search only
+    # the chunks of the DOC_CANDIDATES best documents (0 = search every chunk).
+    # DOC_SECTION_CHUNKS > 0 summarizes runs of that many chunks instead of whole
+    # documents, for long manuals (takes effect on the next index build)
+    DOC_CANDIDATES = int(os.getenv("DOC_CANDIDATES", "0"))
+    DOC_SECTION_CHUNKS = int(os.getenv("DOC_SECTION_CHUNKS", "0"))
     
     # UI Settings
     UI_PORT = 7860
+    UI_TOP_K = 3
     UI_SHARE = False
+
+    # Profiling: cProfile (+ tracemalloc if PROFILE_MEMORY) of sampled calls, written
+    # to PROFILE_DIR. Kinds: answer, retrieve, ingest (per file), index (whole build).
+    # PROFILE_KINDS lists kinds captured on every call, e.g. "ingest,index"
+    PROFILE_DIR = DATA_DIR / "profiles"
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_KINDS = [k for k in os.getenv("PROFILE_KINDS", "").split(",") if k]
+    PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "false").lower() == "true"
+
+    # Metrics (Prometheus text format at http://localhost:METRICS_PORT/metrics, 0 = off)
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9090"))
     
     @classmethod
     def create_directories(cls):
@@ -0,0 +1,330 @@
+"""
+Distributed Search Module
+Index shards served by separate shard-server processes, and a scatter-gather
+retriever that searches them in parallel and merges their top-k by score
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config import Config
+from embedding_service import MicroBatcher, _recv, _send, _TCPServer, _UnixServer, parse_address
+from embeddings_store import RAGRetriever, group_by_filters, load_embeddings, with_timings
+from metadata_index import check_filters
+from metrics import REGISTRY, StageTimer, attribute, span
+from profiling import PROFILER, active as profiling_active
+
+
+class _VectorsOnly:
+    """Embeddings stand-in for shard servers: the coordinator sends query vectors"""
+
+    def embed_query(self, text: str):
+        raise RuntimeError("Shard servers search query vectors; embed on the coordinator")
+
+    def embed_documents(self, texts: List[str]):
+        raise RuntimeError("Shard servers search query vectors; embed on the coordinator")
+
+
+class _ShardRequestHandler(socketserver.StreamRequestHandler):
+    """Frames: JSON request (a "search" is followed by raw float32 query vectors), JSON reply"""
+
+    shard: "ShardServer" = None
+    wbufsize = -1
+
+    def setup(self):
+        self.disable_nagle_algorithm = self.request.family != socket.AF_UNIX
+        super().setup()
+
+    def handle(self):
+        while True:
+            try:
+                request = json.loads(_recv(self.rfile))
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+                op = request.get("op")
+                payload = _recv(self.rfile) if op == "search" else None
+            except ConnectionError:
+                return
+            except ValueError as e:
+                # Unreadable header: whether a vector frame follows is unknown, so close
+                self._reply({"error": f"bad request: {e}"})
+                return
+            try:
+                if op == "search":
+                    vectors = np.frombuffer(payload, dtype=np.float32).reshape(request["shape"])
+                    reply = {"rows": self.shard.search(vectors, request["top_k"], request.get("filters"))}
+                elif op == "prefetch":
+                    reply = {"bytes": self.shard.retriever.prefetch()}
+                else:
+                    reply = self.shard.info()
+            except (KeyError, ValueError) as e:
+                reply = {"error": f"bad request: {e}"}
+            except Exception as e:
+                reply = {"error": str(e)}
+            self._reply(reply)
+
+    def _reply(self, reply: Dict):
+        _send(self.wfile, json.dumps(reply, default=float).encode("utf-8"))
+        self.wfile.flush()
+
+
+class ShardServer:
+    """Serves searches over one index directory (one shard) to a coordinator"""
+
+    def __init__(self, index_dir: str, address: str, name: str | None = None):
+        """
+        Args:
+            index_dir: Flat index directory, e.g. versions/<version>/shards/vendor
+            address: "unix:/path/to.sock" or "host:port"
+            name: Reported in logs and metrics (defaults to the directory name)
+        """
+        self.address = address
+        self.name = name or os.path.basename(os.path.normpath(index_dir))
+        self.retriever = RAGRetriever(
+            embeddings=_VectorsOnly(),
+            rerank_factor=Config.RERANK_FACTOR,
+            doc_candidates=Config.DOC_CANDIDATES,
+        )
+        self.retriever.load(index_dir)
+
+    def search(self, vectors: np.ndarray, top_k: int, filters: Dict | None) -> List[List[Dict]]:
+        return self.retriever.retrieve_by_vectors(vectors, top_k=top_k, filters=filters)
+
+    def info(self) -> Dict:
+        return {"name": self.name, "vectors": self.retriever.index.ntotal, "pid": os.getpid()}
+
+    def make_server(self) -> socketserver.BaseServer:
+        """Bound (not yet serving) socket server for this shard"""
+        kind, target = parse_address(self.address)
+        handler = type("ConfiguredShardHandler", (_ShardRequestHandler,), {"shard": self})
+        if kind == "unix":
+            if os.path.exists(target):
+                os.unlink(target)  # Stale socket from a previous run
+            return _UnixServer(target, handler)
+        return _TCPServer(target, handler)
+
+    def serve_forever(self):
+        server = self.make_server()
+        print(f"✓ Shard '{self.name}' ({self.retriever.index.ntotal} vectors) listening on {self.address}")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            kind, target = parse_address(self.address)
+            if kind == "unix" and os.path.exists(target):
+                os.unlink(target)
+
+
+class RemoteShard:
+    """Client for one ShardServer; a shard that refuses connections is skipped for a while"""
+
+    def __init__(self, address: str, timeout: float = 30.0, retry_after: float = 5.0):
+        """
+        Args:
+            address: Where the ShardServer listens
+            timeout: Socket timeout per request; a late reply is still read so the
+                connection stays usable, even after the coordinator gave up on it
+            retry_after: Seconds to fail fast after the shard could not be reached
+        """
+        self.address = address
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._down_until = 0.0
+        self._local = threading.local()
+
+    def search(self, vectors: np.ndarray, top_k: int, filters: Dict | None) -> List[List[Dict]]:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        request = {"op": "search", "shape": list(vectors.shape), "top_k": top_k, "filters": filters}
+        return self._call(request, vectors.tobytes())["rows"]
+
+    def prefetch(self) -> int:
+        return self._call({"op": "prefetch"})["bytes"]
+
+    def info(self) -> Dict:
+        return self._call({"op": "info"})
+
+    def _call(self, request: Dict, payload: bytes | None = None) -> Dict:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn[0] != os.getpid():
+            if time.monotonic() < self._down_until:
+                raise ConnectionError(f"shard {self.address} is down")
+            try:
+                conn = self._local.conn = (os.getpid(), self._connect())
+            except OSError:
+                self._down_until = time.monotonic() + self.retry_after
+                raise
+        sock_file = conn[1]
+        try:
+            _send(sock_file, json.dumps(request, default=str).encode("utf-8"))
+            if payload is not None:
+                _send(sock_file, payload)
+            sock_file.flush()
+            reply = json.loads(_recv(sock_file))
+        except (OSError, ConnectionError):
+            self._local.conn = None  # Reconnect on the next call
+            raise
+        if "error" in reply:
+            raise RuntimeError(f"Shard {self.address} error: {reply['error']}")
+        return reply
+
+    def _connect(self):
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.timeout)
+        sock.connect(target)
+        return sock.makefile("rwb")
+
+
+class DistributedRetriever:
+    """Drop-in retriever that scatters each search to every shard server and merges the hits"""
+
+    def __init__(
+        self,
+        addresses: List[str],
+        embedding_model: str = "all-MiniLM-L6-v2",
+        embeddings=None,
+        shard_timeout: float = 2.0,
+        query_batch_size: int = 0,
+        query_batch_wait: float = 0.0,
+    ):
+        """
+        Args:
+            addresses: One ShardServer address per shard
+            embedding_model: sentence-transformers model name (queries are embedded here)
+            embeddings: Already-loaded embeddings to share instead of loading a new copy
+            shard_timeout: Seconds to wait for the shards; slower or failed shards are
+                left out of that query's results instead of failing it
+            query_batch_size: Concurrent retrieve() calls embedded together and sent to
+                each shard as one multi-query search, at most this many (0 = off)
+            query_batch_wait: Seconds a query waits for others to join its batch
+        """
+        if not addresses:
+            raise ValueError("DistributedRetriever needs at least one shard address")
+
+        self.embeddings = embeddings if embeddings is not None else load_embeddings(embedding_model)
+        self.shard_timeout = shard_timeout
+        self.shards = [RemoteShard(address, timeout=max(30.0, shard_timeout)) for address in addresses]
+        # Room for a slow shard's searches to pile up without starving the others
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(self.shards), thread_name_prefix="scatter")
+        self.batcher = (
+            MicroBatcher(self._retrieve_batch, query_batch_size, query_batch_wait, name="query-batcher")
+            if query_batch_size > 0 else None
+        )
+        REGISTRY.describe("rag_shard_failures_total", "Shard searches left out of results, by shard and reason")
+
+    def retrieve(
+        self, query: str, top_k: int = 5, filters: Dict | None = None, request_id: str | None = None
+    ) -> List[Dict]:
+        """Retrieve relevant chunks from every shard that answers within shard_timeout"""
+        check_filters(filters)
+        with PROFILER.capture("retrieve", request_id or uuid.uuid4().hex[:12]):
+            if self.batcher is not None and not profiling_active():
+                results, timings = self.batcher.submit([(query, top_k, filters)])[0]
+                attribute(timings)
+                return results
+
+            with span("embed_query"):
+                embedding = self.embeddings.embed_query(query)
+            return self.retrieve_by_vectors([embedding], top_k=top_k, filters=filters)[0]
+
+    def _retrieve_batch(self, requests: List[Tuple[str, int, Dict | None]]) -> List[Tuple[List[Dict], Dict]]:
+        """Micro-batched retrieve(): one forward pass, one scatter per distinct filter"""
+        timer = StageTimer()
+        with timer.activate():
+            results = self._search_batch(requests)
+        return with_timings(results, timer.timings)
+
+    def _search_batch(self, requests: List[Tuple[str, int, Dict | None]]) -> List[List[Dict] | Exception]:
+        with span("embed_query"):
+            vectors = np.asarray(
+                self.embeddings.embed_documents([query for query, _, _ in requests]), dtype=np.float32
+            )
+
+        results: List[List[Dict] | Exception] = [[] for _ in requests]
+        for members in group_by_filters(requests).values():
+            try:
+                top_k = max(requests[i][1] for i in members)
+                rows = self.retrieve_by_vectors(vectors[members], top_k=top_k, filters=requests[members[0]][2])
+            except Exception as e:
+                # Only the requests sharing these filters fail, not the whole batch
+                for i in members:
+                    results[i] = e
+                continue
+            for i, row in zip(members, rows):
+                results[i] = row[: requests[i][1]]
+        return results
+
+    def retrieve_by_vector(
+        self, embedding: List[float], top_k: int = 5, filters: Dict | None = None
+    ) -> List[Dict]:
+        """Retrieve relevant chunks for an already-embedded query"""
+        return self.retrieve_by_vectors([embedding], top_k=top_k, filters=filters)[0]
+
+    def retrieve_by_vectors(self, embeddings, top_k: int = 5, filters: Dict | None = None) -> List[List[Dict]]:
+        """Search every shard in parallel and keep the best top_k per query"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with span("scatter_gather"):
+            futures = {
+                self._executor.submit(shard.search, vectors, top_k, filters): shard for shard in self.shards
+            }
+            done, late = wait(futures, timeout=self.shard_timeout)
+
+        merged: List[List[Dict]] = [[] for _ in range(len(vectors))]
+        answered = 0
+        for future in done:
+            try:
+                rows = future.result()
+            except Exception as e:
+                self._left_out(futures[future], "error", e)
+                continue
+            answered += 1
+            for i, row in enumerate(rows):
+                merged[i].extend(row)
+        for future in late:
+            self._left_out(futures[future], "timeout")
+        if not answered:
+            raise RuntimeError(f"None of the {len(self.shards)} shard servers answered")
+
+        # Every shard scores with the same metric, so scores compare across shards
+        for row in merged:
+            row.sort(key=lambda r: r["score"], reverse=True)
+            del row[top_k:]
+        return merged
+
+    def _left_out(self, shard: RemoteShard, reason: str, error: Exception | None = None):
+        REGISTRY.inc("rag_shard_failures_total", shard=shard.address, reason=reason)
+        detail = f": {error}" if error else f" after {self.shard_timeout:g}s"
+        print(f"⚠️  Shard {shard.address} left out ({reason}{detail}); returning partial results")
+
+    def prefetch(self) -> int:
+        """Ask every reachable shard to fault its pages in; bytes touched"""
+        touched = 0
+        for shard in self.shards:
+            try:
+                touched += shard.prefetch()
+            except Exception as e:
+                print(f"⚠️  Could not prefetch shard {shard.address}: {e}")
+        return touched
+
+    def shard_status(self) -> Dict[str, Dict | None]:
+        """info() of every shard, None for the unreachable ones"""
+        status = {}
+        for shard in self.shards:
+            try:
+                status[shard.address] = shard.info()
+            except Exception:
+                status[shard.address] = None
+        return status
@@ -0,0 +1,98 @@
+"""
+Document Summary Module
+One centroid vector per document (or per section of a document) for
+two-stage retrieval: pick candidate documents, then search only their chunks
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+from chunk_store import ChunkStore
+
+CENTROIDS_FILE = "centroids.npy"
+MEMBERS_FILE = "members.npy"
+OFFSETS_FILE = "offsets.npy"
+
+
+class DocumentIndex:
+    """Normalized mean chunk embedding per group (document or section) and its chunk IDs"""
+
+    def __init__(self, centroids: np.ndarray, members: np.ndarray, offsets: np.ndarray, size: int):
+        """
+        Args:
+            centroids: (groups, dim) normalized mean vector of each group's chunks
+            members: Chunk IDs ordered by group
+            offsets: Start of each group in `members`, plus an end sentinel
+            size: Chunks in the index (bitmap length)
+        """
+        self.centroids = centroids
+        self.members = members
+        self.offsets = offsets
+        self.size = size
+
+    @classmethod
+    def build(cls, store: ChunkStore, vectors: np.ndarray, section_size: int = 0) -> "DocumentIndex":
+        """
+        Group chunks by source document (and by runs of `section_size` consecutive
+        chunks within it, if set) and average their embeddings
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        documents = np.asarray(store.codes["source"], dtype=np.int64)
+        sections = np.zeros(len(documents), dtype=np.int64)
+        if section_size > 0:
+            sections = np.maximum(np.asarray(store.ints["chunk_index"], dtype=np.int64), 0) // section_size
+
+        # Chunks of one group end up adjacent; reduceat then sums each run
+        members = np.lexsort((sections, documents))
+        keys = np.stack([documents[members], sections[members]], axis=1)
+        starts = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+        offsets = np.concatenate([[0], starts, [len(members)]]).astype(np.int64)
+
+        sums = np.add.reduceat(vectors[members], offsets[:-1], axis=0)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+        return cls(centroids, members.astype(np.int64), offsets, len(store))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def eligible(self, packed: np.ndarray) -> np.ndarray:
+        """Per group, whether any of its chunks is in a packed ID bitmap (e.g. a filter)"""
+        selected = np.unpackbits(packed, count=self.size, bitorder="little").astype(bool)
+        return np.logical_or.reduceat(selected[self.members], self.offsets[:-1])
+
+    def candidates(self, query_vector: np.ndarray, groups: int, eligible: np.ndarray | None = None) -> np.ndarray:
+        """Packed ID bitmap (FAISS IDSelectorBitmap layout) of the best groups' chunks"""
+        scores = self.centroids @ query_vector
+        if eligible is not None:
+            # Only rank groups that can contribute a chunk
+            scores = np.where(eligible, scores, -np.inf)
+            groups = min(groups, int(eligible.sum()))
+        best = np.argpartition(-scores, groups - 1)[:groups] if groups < len(scores) else np.arange(len(scores))
+        mask = np.zeros(self.size, dtype=bool)
+        for group in best:
+            mask[self.members[self.offsets[group] : self.offsets[group + 1]]] = True
+        return np.packbits(mask, bitorder="little")
+
+    def save(self, save_dir: str):
+        path = Path(save_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / CENTROIDS_FILE, self.centroids)
+        np.save(path / MEMBERS_FILE, self.members)
+        np.save(path / OFFSETS_FILE, self.offsets)
+
+    @classmethod
+    def load(cls, load_dir: str, size: int) -> "DocumentIndex":
+        """Memory-map a saved document index (shared between processes like the chunk store)"""
+        path = Path(load_dir)
+        return cls(
+            np.load(path / CENTROIDS_FILE, mmap_mode="r"),
+            np.load(path / MEMBERS_FILE, mmap_mode="r"),
+            np.load(path / OFFSETS_FILE, mmap_mode="r"),
+            size,
+        )
+
+    @staticmethod
+    def exists(load_dir: str) -> bool:
+        return (Path(load_dir) / CENTROIDS_FILE).exists()
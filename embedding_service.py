@@ -0,0 +1,312 @@
+"""
+Embedding Service Module
+One warm sentence-transformers model shared by every process on the machine,
+over a Unix socket or localhost TCP, with micro-batching of concurrent calls
+"""
+
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Callable, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from metrics import REGISTRY, size_buckets
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+# An idle batcher thread exits (and is restarted by the next submit), so it
+# never keeps a retired retriever alive after a hot swap
+BATCHER_IDLE_SECONDS = 10.0
+_FRAME = struct.Struct("!I")
+
+
+class _Pending:
+    """One caller's items waiting in a MicroBatcher"""
+
+    def __init__(self, items: List):
+        self.items = items
+        self.results: List | None = None
+        self.error: BaseException | None = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Coalesces concurrent calls into one batched call on a worker thread"""
+
+    def __init__(
+        self,
+        fn: Callable[[List], List],
+        max_batch: int = 64,
+        max_wait: float = 0.002,
+        name: str = "micro-batcher",
+    ):
+        """
+        Args:
+            fn: Batched function; gets a list of items, returns one result per item.
+                An exception instance in place of a result fails only that item's
+                caller; an exception raised by fn fails the whole batch
+            max_batch: Items per call to fn (a single larger submit still runs whole)
+            max_wait: Seconds to wait for more callers once one is queued (0 = only
+                batch what piled up while the previous call ran)
+            name: Worker thread name, also the label of the batch-size metric
+        """
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.name = name
+        self._queue: List[_Pending] = []
+        self._cond = threading.Condition()
+        self._worker_pid: int | None = None
+        REGISTRY.describe("rag_batch_size", "Items per micro-batched call", buckets=size_buckets(max_batch))
+
+    def submit(self, items: List) -> List:
+        """Block until fn has run on these items (batched with other callers)"""
+        if not items:
+            return []
+        pending = _Pending(items)
+        with self._cond:
+            if self._worker_pid != os.getpid():
+                # First use, after an idle exit, or in a forked child (threads don't
+                # survive fork; anything queued belongs to the parent)
+                self._queue = []
+                self._worker_pid = os.getpid()
+                threading.Thread(target=self._run, name=self.name, daemon=True).start()
+            self._queue.append(pending)
+            self._cond.notify()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        for result in pending.results:
+            if isinstance(result, BaseException):
+                raise result
+        return pending.results
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            items = [item for pending in batch for item in pending.items]
+            REGISTRY.observe("rag_batch_size", len(items), batcher=self.name)
+            try:
+                results = self.fn(items)
+                offset = 0
+                for pending in batch:
+                    pending.results = results[offset : offset + len(pending.items)]
+                    offset += len(pending.items)
+            except BaseException as e:
+                for pending in batch:
+                    pending.error = e
+            for pending in batch:
+                pending.done.set()
+
+    def _next_batch(self) -> List[_Pending] | None:
+        """Next batch to run, or None once idle for BATCHER_IDLE_SECONDS"""
+        with self._cond:
+            if not self._queue and not self._cond.wait_for(lambda: self._queue, BATCHER_IDLE_SECONDS):
+                self._worker_pid = None
+                return None
+
+            # Callers that arrive within max_wait of the first one share its batch
+            deadline = time.monotonic() + self.max_wait
+            while sum(len(p.items) for p in self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, size = [], 0
+            while self._queue and (not batch or size + len(self._queue[0].items) <= self.max_batch):
+                pending = self._queue.pop(0)
+                batch.append(pending)
+                size += len(pending.items)
+            return batch
+
+
+def parse_address(address: str):
+    """("unix", path) for "unix:/path/to.sock", else ("tcp", (host, port))"""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+def _send(sock_file, payload: bytes):
+    sock_file.write(_FRAME.pack(len(payload)) + payload)
+
+
+def _recv(sock_file) -> bytes:
+    header = sock_file.read(_FRAME.size)
+    if len(header) < _FRAME.size:
+        raise ConnectionError("connection closed by the other end")
+    (length,) = _FRAME.unpack(header)
+    payload = sock_file.read(length)
+    if len(payload) < length:
+        raise ConnectionError("connection closed by the other end")
+    return payload
+
+
+class _EmbeddingRequestHandler(socketserver.StreamRequestHandler):
+    """Frames: JSON request, then a JSON header and raw float32 rows in reply"""
+
+    service: "EmbeddingServer" = None
+    # Replies go out as two frames: buffer them and flush once
+    wbufsize = -1
+
+    def setup(self):
+        # No Nagle delay between small replies (TCP only; Unix sockets have no such option)
+        self.disable_nagle_algorithm = self.request.family != socket.AF_UNIX
+        super().setup()
+
+    def handle(self):
+        while True:
+            try:
+                request = json.loads(_recv(self.rfile))
+            except ConnectionError:
+                return
+            try:
+                if request.get("op") == "info":
+                    _send(self.wfile, json.dumps(self.service.info()).encode("utf-8"))
+                else:
+                    vectors = self.service.embed(request["texts"])
+                    _send(self.wfile, json.dumps({"shape": list(vectors.shape)}).encode("utf-8"))
+                    _send(self.wfile, vectors.tobytes())
+            except Exception as e:
+                _send(self.wfile, json.dumps({"error": str(e)}).encode("utf-8"))
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    request_queue_size = 128  # Every serving thread of every process connects at once
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    request_queue_size = 128
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class EmbeddingServer:
+    """Serves one loaded embeddings model to local clients"""
+
+    def __init__(self, embeddings, model_name: str, address: str = DEFAULT_ADDRESS,
+                 max_batch: int = 64, max_wait: float = 0.002):
+        """
+        Args:
+            embeddings: Loaded LangChain embeddings (see load_embeddings)
+            model_name: Reported to clients so they can refuse a mismatched model
+            address: "unix:/path/to.sock" or "host:port"
+            max_batch: Texts per forward pass across concurrent clients
+            max_wait: Seconds a request waits for others to share its batch
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.address = address
+        self.batcher = MicroBatcher(self._encode, max_batch, max_wait, name="embedding-service")
+        self._dim: int | None = None
+
+    def _encode(self, texts: List[str]) -> List[np.ndarray]:
+        return list(np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32))
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        rows = self.batcher.submit(list(texts))
+        return np.vstack(rows) if rows else np.zeros((0, self.dim()), dtype=np.float32)
+
+    def dim(self) -> int:
+        if self._dim is None:
+            self._dim = len(self.embeddings.embed_query("dimension probe"))
+        return self._dim
+
+    def info(self):
+        return {"model": self.model_name, "dim": self.dim(), "pid": os.getpid()}
+
+    def make_server(self) -> socketserver.BaseServer:
+        """Bound (not yet serving) socket server for this service"""
+        kind, target = parse_address(self.address)
+        handler = type("ConfiguredEmbeddingHandler", (_EmbeddingRequestHandler,), {"service": self})
+        if kind == "unix":
+            if os.path.exists(target):
+                os.unlink(target)  # Stale socket from a previous run
+            return _UnixServer(target, handler)
+        return _TCPServer(target, handler)
+
+    def serve_forever(self):
+        server = self.make_server()
+        print(f"✓ Embedding service ({self.model_name}, dim {self.dim()}) listening on {self.address}")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            kind, target = parse_address(self.address)
+            if kind == "unix" and os.path.exists(target):
+                os.unlink(target)
+
+
+class RemoteEmbeddings(Embeddings):
+    """LangChain embeddings backed by an EmbeddingServer; drop-in for the local model"""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, model_name: str | None = None, timeout: float = 60.0):
+        """
+        Args:
+            address: Where the EmbeddingServer listens
+            model_name: Expected model; raises ValueError if the service runs another
+            timeout: Socket timeout per request in seconds
+        """
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+        info, _ = self._call({"op": "info"})
+        if model_name and info["model"] != model_name:
+            raise ValueError(
+                f"Embedding service at {address} runs {info['model']}, expected {model_name}"
+            )
+        self.model_name = info["model"]
+        self.dim = info["dim"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Embeddings as a float32 array, without the list conversion"""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        header, data = self._call({"op": "embed", "texts": list(texts)})
+        return np.frombuffer(data, dtype=np.float32).reshape(header["shape"])
+
+    def _call(self, request):
+        """(reply header, raw vector bytes or None) for one request"""
+        # One connection per thread, and per process so forked workers reconnect
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn[0] != os.getpid():
+            conn = self._local.conn = (os.getpid(), self._connect())
+        sock_file = conn[1]
+        try:
+            _send(sock_file, json.dumps(request).encode("utf-8"))
+            sock_file.flush()
+            header = json.loads(_recv(sock_file))
+            if "error" in header:
+                raise RuntimeError(f"Embedding service error: {header['error']}")
+            return header, (_recv(sock_file) if "shape" in header else None)
+        except (OSError, ConnectionError):
+            self._local.conn = None  # Reconnect on the next call
+            raise
+
+    def _connect(self):
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.timeout)
+        sock.connect(target)
+        return sock.makefile("rwb")
@@ -1,91 +1,366 @@
 """
 Embeddings and Vector Store Module
-Using LangChain + FAISS + sentence-transformers
+Using FAISS + sentence-transformers, with a compact chunk store as docstore
 """
 
-from typing import List, Dict
+import json
+import uuid
+from typing import List, Dict, Tuple
 from pathlib import Path
 
+import faiss
+import numpy as np
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
+
+from chunk_store import ChunkStore, touch_pages
+from config import Config
+from document_index import DocumentIndex
+from embedding_service import MicroBatcher
+from metadata_index import MetadataIndex, Selection, check_filters
+from metrics import StageTimer, attribute, span
+from profiling import PROFILER, active as profiling_active
+
+# Scalar quantizer per storage option; fp32 keeps the exact IndexFlatL2
+STORAGE_TYPES = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+FULL_VECTORS_FILE = "vectors_fp32.npy"
+INDEX_FILE = "index.faiss"
+CHUNKS_SUBDIR = "chunks"
+DOCUMENTS_SUBDIR = "documents"
+# Flat and scalar-quantizer codes are read straight from the mapped file, so
+# processes serving the same version share one copy in the page cache.
+# Older FAISS builds lack the flag and read the index into private memory.
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+
+def load_embeddings(embedding_model: str = "all-MiniLM-L6-v2", service: str | None = None):
+    """
+    Load the sentence-transformers embedding model, or connect to the shared
+    embedding service (Config.EMBEDDING_SERVICE) if one is configured
+
+    Args:
+        embedding_model: sentence-transformers model name
+        service: Embedding service address; None = Config.EMBEDDING_SERVICE, "" = in-process
+    """
+    service = Config.EMBEDDING_SERVICE if service is None else service
+    if service:
+        from embedding_service import RemoteEmbeddings
+
+        try:
+            embeddings = RemoteEmbeddings(service, model_name=embedding_model)
+            print(f"✓ Using embedding service at {service} ({embedding_model})")
+            return embeddings
+        except OSError as e:
+            print(f"⚠️  Embedding service at {service} unreachable ({e}); loading the model in-process")
+
+    print(f"Loading embedding model: {embedding_model}")
+    print("(First time download ~90MB, may take 1-2 minutes)")
+
+    embeddings = HuggingFaceEmbeddings(
+        model_name=embedding_model,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": True},
+    )
+    print("✓ Embedding model loaded")
+    return embeddings
+
+
+def group_by_filters(requests: List[Tuple[str, int, Dict | None]]) -> Dict[str, List[int]]:
+    """Positions of (query, top_k, filters) requests, grouped by identical filters"""
+    groups: Dict[str, List[int]] = {}
+    for i, (_, _, filters) in enumerate(requests):
+        groups.setdefault(json.dumps(filters, sort_keys=True, default=str), []).append(i)
+    return groups
+
+
+def with_timings(results: List, timings: Dict) -> List:
+    """MicroBatcher results of a batched search: (rows, timings), or a request's own exception"""
+    return [rows if isinstance(rows, Exception) else (rows, timings) for rows in results]
 
 
 class RAGRetriever:
-    """RAG retriever using LangChain and FAISS"""
+    """RAG retriever using FAISS and a compact chunk store"""
 
-    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2"):
-        print(f"Loading embedding model: {embedding_model}")
-        print("(First time download ~90MB, may take 1-2 minutes)")
+    def __init__(
+        self,
+        embedding_model: str = "all-MiniLM-L6-v2",
+        embeddings=None,
+        storage: str = "fp32",
+        rerank_factor: int = 0,
+        compress_text: bool = False,
+        query_batch_size: int = 0,
+        query_batch_wait: float = 0.0,
+        doc_candidates: int = 0,
+        section_size: int = 0,
+    ):
+        """
+        Args:
+            embedding_model: sentence-transformers model name
+            embeddings: Already-loaded embeddings to share instead of loading a new copy
+            storage: In-memory vector format for new indexes: "fp32", "fp16" or "int8"
+            rerank_factor: With quantized storage, fetch top_k * rerank_factor candidates
+                and re-rank them exactly against fp32 vectors memory-mapped from disk (0 = off)
+            compress_text: zlib-compress chunk text in blocks (smaller, slightly slower lookups)
+            query_batch_size: Concurrent retrieve() calls embedded in one forward pass and
+                searched with one multi-query FAISS call, at most this many (0 = off)
+            query_batch_wait: Seconds a query waits for others to join its batch
+            doc_candidates: Two-stage search: pick this many documents (or sections) by
+                centroid similarity, then search only their chunks (0 = flat search)
+            section_size: Summarize runs of this many chunks per document instead of
+                whole documents when building the index (0 = one vector per document)
+        """
+        if storage != "fp32" and storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown vector storage '{storage}', expected fp32, fp16 or int8")
 
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=embedding_model,
-            model_kwargs={"device": "cpu"},
-            encode_kwargs={"normalize_embeddings": True},
+        self.embeddings = embeddings if embeddings is not None else load_embeddings(embedding_model)
+        self.storage = storage
+        self.rerank_factor = rerank_factor
+        self.compress_text = compress_text
+        self.index: faiss.Index | None = None
+        self.chunk_store: ChunkStore | None = None
+        self.metadata_index: MetadataIndex | None = None
+        self.doc_candidates = doc_candidates
+        self.section_size = section_size
+        self.document_index: DocumentIndex | None = None
+        # Full-precision vectors for re-ranking: in RAM right after a build, mmap'd after save/load
+        self.full_vectors: np.ndarray | None = None
+        self.batcher = (
+            MicroBatcher(self._retrieve_batch, query_batch_size, query_batch_wait, name="query-batcher")
+            if query_batch_size > 0 else None
         )
 
-        self.vectorstore: FAISS | None = None
-        print("✓ Embedding model loaded")
-
     def index_documents(self, chunks: List[Dict[str, str]]):
         """Build FAISS index from document chunks"""
         print("\nBuilding FAISS vector index...")
         print("(This may take 1-2 minutes for first time)")
 
+        with PROFILER.capture("index", "index_documents"):
+            chunks = self._kept_chunks(chunks)
+            vectors = self.embeddings.embed_documents([chunk["text"] for chunk in chunks])
+            self._build_index(chunks, vectors)
+
+    def index_embeddings(self, chunks: List[Dict[str, str]], vectors):
+        """Build FAISS index from chunks whose embeddings are already computed"""
+        if len(chunks) != len(vectors):
+            raise ValueError(f"Got {len(chunks)} chunks but {len(vectors)} vectors")
+
+        kept = [i for i, chunk in enumerate(chunks) if chunk.get("text", "").strip()]
+        self._build_index(self._kept_chunks([chunks[i] for i in kept]), [vectors[i] for i in kept])
+
+    def _kept_chunks(self, chunks: List[Dict[str, str]]) -> List[Dict[str, str]]:
         if not chunks:
             raise ValueError(
                 "No chunks provided to index_documents(). "
                 "Ensure that DocumentChunker.chunk_documents produced at least one chunk."
             )
 
-        documents: List[Document] = [
-            Document(
-                page_content=chunk["text"],
-                metadata={
-                    "source": chunk.get("source", "Unknown"),
-                    "chunk_id": chunk.get("chunk_id", ""),
-                    **chunk.get("metadata", {}),
-                },
-            )
-            for chunk in chunks
-            if chunk.get("text", "").strip()
-        ]
-
-        if not documents:
+        kept = [chunk for chunk in chunks if chunk.get("text", "").strip()]
+        if not kept:
             raise ValueError(
                 "All provided chunks were empty after filtering. "
                 "Check your ingestion and chunking pipeline."
             )
+        return kept
+
+    def _build_index(self, chunks: List[Dict[str, str]], vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+        if self.storage == "fp32":
+            self.index = faiss.IndexFlatL2(dim)
+        else:
+            # Same IDs and metric as IndexFlatL2, so filters and scores are unchanged
+            self.index = faiss.IndexScalarQuantizer(dim, STORAGE_TYPES[self.storage], faiss.METRIC_L2)
+            self.index.train(vectors)
+            self.full_vectors = vectors
+        self.index.add(vectors)
+
+        self.chunk_store = ChunkStore.from_chunks(chunks, compress=self.compress_text)
+        self.metadata_index = MetadataIndex(self.chunk_store)
+        self.document_index = DocumentIndex.build(self.chunk_store, vectors, self.section_size)
+        print(f"✓ FAISS index built with {len(chunks)} vectors ({self.storage}, {len(self.document_index)} documents)")
+
+    def retrieve(
+        self, query: str, top_k: int = 5, filters: Dict | None = None, request_id: str | None = None
+    ) -> List[Dict]:
+        """
+        Retrieve relevant chunks for query
+
+        Args:
+            query: User question
+            top_k: Number of chunks to return
+            filters: Optional metadata filters applied inside the FAISS search,
+                e.g. {"source_file": "vendor registration procedure HAL.pdf"},
+                {"category": ["vendor", "purchase"]} or {"chunk_range": (0, 10)}
+            request_id: Names the profile of this call, if one is captured
+        """
+        if self.index is None:
+            raise ValueError("Index not built. Call index_documents() first.")
+        check_filters(filters)
+
+        with PROFILER.capture("retrieve", request_id or uuid.uuid4().hex[:12]):
+            # A profiled call runs on this thread, where the profiler can see it
+            if self.batcher is not None and not profiling_active():
+                results, timings = self.batcher.submit([(query, top_k, filters)])[0]
+                attribute(timings)
+                return results
+
+            with span("embed_query"):
+                embedding = self.embeddings.embed_query(query)
+            return self.retrieve_by_vector(embedding, top_k=top_k, filters=filters)
+
+    def _retrieve_batch(self, requests: List[Tuple[str, int, Dict | None]]) -> List[Tuple[List[Dict], Dict]]:
+        """Micro-batched retrieve(): one forward pass, one FAISS search per distinct filter"""
+        # Stage times of the shared batch are reported to every request in it
+        timer = StageTimer()
+        with timer.activate():
+            results = self._search_batch(requests)
+        return with_timings(results, timer.timings)
+
+    def _search_batch(self, requests: List[Tuple[str, int, Dict | None]]) -> List[List[Dict] | Exception]:
+        with span("embed_query"):
+            vectors = np.asarray(
+                self.embeddings.embed_documents([query for query, _, _ in requests]), dtype=np.float32
+            )
+
+        results: List[List[Dict] | Exception] = [[] for _ in requests]
+        for members in group_by_filters(requests).values():
+            try:
+                top_k = max(requests[i][1] for i in members)
+                rows = self.retrieve_by_vectors(vectors[members], top_k=top_k, filters=requests[members[0]][2])
+            except Exception as e:
+                # Only the requests sharing these filters fail, not the whole batch
+                for i in members:
+                    results[i] = e
+                continue
+            for i, row in zip(members, rows):
+                results[i] = row[: requests[i][1]]
+        return results
 
-        self.vectorstore = FAISS.from_documents(documents, self.embeddings)
-        print(f"✓ FAISS index built with {len(documents)} vectors")
+    def retrieve_by_vector(
+        self, embedding: List[float], top_k: int = 5, filters: Dict | None = None
+    ) -> List[Dict]:
+        """Retrieve relevant chunks for an already-embedded query"""
+        return self.retrieve_by_vectors([embedding], top_k=top_k, filters=filters)[0]
 
-    def retrieve(self, query: str, top_k: int = 5) -> List[Dict]:
-        """Retrieve relevant chunks for query"""
-        if self.vectorstore is None:
+    def retrieve_by_vectors(self, embeddings, top_k: int = 5, filters: Dict | None = None) -> List[List[Dict]]:
+        """Retrieve for several already-embedded queries with a single FAISS search"""
+        if self.index is None:
             raise ValueError("Index not built. Call index_documents() first.")
 
-        results = self.vectorstore.similarity_search_with_score(query, k=top_k)
-        formatted_results: List[Dict] = [
-            {
-                "text": doc.page_content,
-                "source": doc.metadata.get("source", "Unknown"),
-                # Convert distance to a relevance-like score if desired
-                "score": float(1.0 - score),
-                "metadata": doc.metadata,
-            }
-            for doc, score in results
-        ]
+        selection = None
+        if filters:
+            with span("filter_select"):
+                selection = self.metadata_index.select(filters)
+            if selection is None:
+                return [[] for _ in range(len(embeddings))]
+
+        query_vectors = np.asarray(embeddings, dtype=np.float32)
+        if self.doc_candidates and self.document_index is not None and len(self.document_index) > self.doc_candidates:
+            eligible = self.document_index.eligible(selection.packed) if selection is not None else None
+            # Candidates differ per query, so each query gets its own search
+            return [
+                self._search(query_vector[None], top_k, self._candidates(query_vector, selection, eligible))[0]
+                for query_vector in query_vectors
+            ]
+        return self._search(query_vectors, top_k, selection)
+
+    def _candidates(self, query_vector: np.ndarray, selection: Selection | None, eligible) -> Selection:
+        """Stage one: chunks of the documents whose centroids best match the query"""
+        with span("doc_select"):
+            packed = self.document_index.candidates(query_vector, self.doc_candidates, eligible)
+            if selection is not None:
+                packed &= selection.packed  # Candidate documents also hold unfiltered chunks
+            return Selection(packed, self.document_index.size)
+
+    def _search(self, query_vectors: np.ndarray, top_k: int, selection: Selection | None) -> List[List[Dict]]:
+        params = None
+        if selection is not None:
+            params = selection.search_params()
+            top_k = min(top_k, selection.count)
+
+        rerank = self.rerank_factor > 0 and self.full_vectors is not None
+        with span("faiss_search"):
+            k = top_k * self.rerank_factor if rerank else top_k
+            distances, ids = self.index.search(query_vectors, k, params=params)
+
+        if rerank:
+            with span("rerank"):
+                rows = [self._rerank(q, candidates, top_k) for q, candidates in zip(query_vectors, ids)]
+        else:
+            rows = list(zip(distances, ids))
+
+        with span("docstore_lookup"):
+            # Text and metadata dicts are only materialized for the hits
+            return [self._format_hits(row_distances, row_ids) for row_distances, row_ids in rows]
+
+    def _format_hits(self, distances: np.ndarray, ids: np.ndarray) -> List[Dict]:
+        formatted_results: List[Dict] = []
+        for score, i in zip(distances, ids):
+            if i < 0:
+                continue
+            metadata = self.chunk_store.metadata(int(i))
+            formatted_results.append(
+                {
+                    "text": self.chunk_store.text(int(i)),
+                    "source": metadata["source"],
+                    # Convert distance to a relevance-like score if desired
+                    "score": float(1.0 - score),
+                    "metadata": metadata,
+                }
+            )
         return formatted_results
 
+    def _rerank(self, query_vector: np.ndarray, candidate_ids: np.ndarray, top_k: int):
+        """Exact squared-L2 distances for quantized-search candidates, best top_k kept"""
+        candidates = np.sort(candidate_ids[candidate_ids >= 0])
+        exact = np.asarray(self.full_vectors[candidates], dtype=np.float32)
+        dist = ((exact - query_vector) ** 2).sum(axis=1)
+        order = np.argsort(dist)[:top_k]
+        return dist[order], candidates[order]
+
+    def vectors(self):
+        """All indexed vectors as a (n, dim) float32 array"""
+        if self.index is None:
+            raise ValueError("Index not built. Call index_documents() first.")
+
+        if self.full_vectors is not None:
+            return np.asarray(self.full_vectors, dtype=np.float32)
+        return self.index.reconstruct_n(0, self.index.ntotal)
+
+    def prefetch(self) -> int:
+        """Fault the mapped index, chunk store and fp32 vectors into the page cache; bytes touched"""
+        if self.index is None:
+            return 0
+        # A flat or scalar-quantizer search reads every stored code once
+        self.index.search(np.zeros((1, self.index.d), dtype=np.float32), 1)
+        touched = self.memory_bytes() + self.chunk_store.prefetch()
+        if self.full_vectors is not None:
+            touched += touch_pages(self.full_vectors)
+        return touched
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size of the vector index (excludes docstore and mmap'd fp32)"""
+        if self.index is None:
+            return 0
+        return self.index.ntotal * self.index.sa_code_size()
+
     def save(self, save_dir: str = "data/embeddings"):
-        """Save FAISS index to disk"""
-        if self.vectorstore is None:
+        """Save FAISS index and chunk store to disk"""
+        if self.index is None:
             raise ValueError("No vector store to save. Build the index first.")
 
         save_path = Path(save_dir)
         save_path.mkdir(parents=True, exist_ok=True)
-        self.vectorstore.save_local(str(save_path))
+        faiss.write_index(self.index, str(save_path / INDEX_FILE))
+        self.chunk_store.save(str(save_path / CHUNKS_SUBDIR))
+        if self.document_index is not None:
+            self.document_index.save(str(save_path / DOCUMENTS_SUBDIR))
+        if self.full_vectors is not None:
+            np.save(save_path / FULL_VECTORS_FILE, np.asarray(self.full_vectors, dtype=np.float32))
+            # Serve re-ranks from the page cache instead of keeping a RAM copy
+            self.full_vectors = np.load(save_path / FULL_VECTORS_FILE, mmap_mode="r")
         print(f"✓ Vector store saved to {save_dir}")
 
     def load(self, load_dir: str = "data/embeddings"):
@@ -94,9 +369,41 @@ class RAGRetriever:
         if not load_path.exists():
             raise FileNotFoundError(f"No index found at {load_dir}")
 
-        self.vectorstore = FAISS.load_local(
+        if ChunkStore.exists(str(load_path / CHUNKS_SUBDIR)):
+            self.index = faiss.read_index(str(load_path / INDEX_FILE), MMAP_FLAG)
+            self.chunk_store = ChunkStore.load(str(load_path / CHUNKS_SUBDIR))
+        else:
+            self._load_langchain(load_path)
+        full_vectors_file = load_path / FULL_VECTORS_FILE
+        self.full_vectors = np.load(full_vectors_file, mmap_mode="r") if full_vectors_file.exists() else None
+        self.metadata_index = MetadataIndex(self.chunk_store)
+        if DocumentIndex.exists(str(load_path / DOCUMENTS_SUBDIR)):
+            self.document_index = DocumentIndex.load(str(load_path / DOCUMENTS_SUBDIR), len(self.chunk_store))
+        elif self.doc_candidates:
+            # Index saved before document summaries existed
+            self.document_index = DocumentIndex.build(self.chunk_store, self.vectors(), self.section_size)
+        print(f"✓ Vector store loaded from {load_dir}")
+
+    def _load_langchain(self, load_path: Path):
+        """Read an index saved by LangChain's FAISS.save_local (index.faiss + pickled docstore)"""
+        from langchain_community.vectorstores import FAISS
+
+        vectorstore = FAISS.load_local(
             str(load_path),
             self.embeddings,
             allow_dangerous_deserialization=True,
         )
-        print(f"✓ Vector store loaded from {load_dir}")
+        chunks = []
+        for i in range(vectorstore.index.ntotal):
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+            metadata = dict(doc.metadata)
+            chunks.append(
+                {
+                    "text": doc.page_content,
+                    "source": metadata.pop("source", "Unknown"),
+                    "chunk_id": metadata.pop("chunk_id", ""),
+                    "metadata": metadata,
+                }
+            )
+        self.index = vectorstore.index
+        self.chunk_store = ChunkStore.from_chunks(chunks, compress=self.compress_text)
@@ -0,0 +1,86 @@
+"""
+Extractive Answer Module
+LLM-free answers: the retrieved sentences closest to the query, with citations
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?;])\s+")
+
+
+class ExtractiveAnswerer:
+    """Scores the sentences of retrieved chunks against the query embedding"""
+
+    def __init__(self, embeddings, max_sentences: int = 3, min_words: int = 4, cache_size: int = 2048):
+        """
+        Args:
+            embeddings: Same embeddings the index was built with
+            max_sentences: Sentences returned per answer
+            min_words: Shorter fragments (headings, list numbers) are ignored
+            cache_size: Chunks whose sentence embeddings are kept between requests
+        """
+        self.embeddings = embeddings
+        self.max_sentences = max_sentences
+        self.min_words = min_words
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[List[str], np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def answer(self, query: str, chunks: List[Dict]) -> str:
+        """Best sentences as a bulleted answer citing [Source n] in chunk order"""
+        sentences, vectors, sources = [], [], []
+        for source_number, chunk in enumerate(chunks, 1):
+            chunk_sentences, chunk_vectors = self._sentences(chunk["text"])
+            if chunk_sentences:
+                sentences.extend(chunk_sentences)
+                vectors.append(chunk_vectors)
+                sources.extend([source_number] * len(chunk_sentences))
+
+        if not sentences:
+            return "I don't have that information in the provided documents"
+
+        query_vector = _normalize(np.asarray([self.embeddings.embed_query(query)], dtype=np.float32))[0]
+        scores = np.vstack(vectors) @ query_vector
+
+        # Overlapping chunks repeat sentences; keep each one once, at its best score
+        lines, seen = [], set()
+        for i in np.argsort(-scores):
+            if sentences[i] in seen:
+                continue
+            seen.add(sentences[i])
+            lines.append(f"• {sentences[i]} [Source {sources[i]}]")
+            if len(lines) == self.max_sentences:
+                break
+        return "\n".join(lines)
+
+    def _sentences(self, text: str) -> Tuple[List[str], np.ndarray]:
+        """Sentences of one chunk and their normalized embeddings (cached per chunk text)"""
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        sentences = [s.strip() for s in SENTENCE_SPLIT.split(text) if len(s.split()) >= self.min_words]
+        if sentences:
+            vectors = _normalize(np.asarray(self.embeddings.embed_documents(sentences), dtype=np.float32))
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+
+        with self._lock:
+            self._cache[key] = (sentences, vectors)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return sentences, vectors
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
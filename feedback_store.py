@@ -0,0 +1,236 @@
+"""
+Feedback Store Module
+Buffered background writer with rotation and constant-memory aggregates
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+RATINGS = (1, 2, 3, 4, 5)
+
+
+class FeedbackStore:
+    """Appends feedback records to JSONL without blocking the UI thread"""
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 5_000_000,
+        rotate_seconds: float = 86_400,
+        backup_count: int = 10,
+        flush_interval: float = 1.0,
+        max_batch: int = 100,
+    ):
+        """
+        Args:
+            path: Active JSONL file (e.g. Config.FEEDBACK_FILE)
+            max_bytes: Rotate once the active file reaches this size
+            rotate_seconds: Rotate once the active file's first record is this old
+            backup_count: Rotated files to keep; older ones are deleted, their
+                ratings kept in a snapshot ("<name>.retired.json") so the
+                aggregates survive restarts
+            flush_interval: Max seconds a record waits in the buffer
+            max_batch: Records written per batch
+        """
+        self.path = Path(path)
+        self.retired_path = self.path.with_name(f"{self.path.stem}.retired.json")
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self.count = 0
+        self.total = 0
+        self.histogram: Dict[int, int] = {rating: 0 for rating in RATINGS}
+        self._stats_lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._load_aggregates()
+
+        self._queue: "queue.Queue[Dict | None]" = queue.Queue()
+        self._file = None
+        self._started_at = 0.0
+        self._writer = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def add(self, feedback: Dict) -> Dict:
+        """Queue a record for writing and return the updated summary"""
+        rating = int(feedback["rating"])
+        with self._stats_lock:
+            self._count_rating(rating)
+        self._queue.put(feedback)
+        return self.summary()
+
+    def summary(self) -> Dict:
+        """Count, mean rating and rating histogram"""
+        with self._stats_lock:
+            return {
+                "count": self.count,
+                "mean": self.total / self.count if self.count else 0.0,
+                "histogram": dict(self.histogram),
+            }
+
+    def flush(self, timeout: float = 5.0):
+        """Block until everything queued so far is on disk"""
+        done = threading.Event()
+        self._queue.put({"_flush": done})
+        done.wait(timeout)
+
+    def close(self):
+        """Flush and stop the writer thread"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+
+    def _count_rating(self, rating: int):
+        self.count += 1
+        self.total += rating
+        if rating in self.histogram:
+            self.histogram[rating] += 1
+
+    def _load_aggregates(self):
+        """Seed aggregates from the deleted files' snapshot, then by streaming the kept files"""
+        retired = self._load_retired()
+        self.count, self.total = retired["count"], retired["total"]
+        self.histogram.update(retired["histogram"])
+        for file_path in self._files():
+            if file_path.name not in retired["files"]:
+                for rating in self._ratings(file_path):
+                    self._count_rating(rating)
+
+    def _ratings(self, file_path: Path) -> Iterator[int]:
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield int(json.loads(line)["rating"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+    def _load_retired(self) -> Dict:
+        """Ratings of deleted files, plus the names of files counted but maybe not deleted yet"""
+        retired = {"count": 0, "total": 0, "histogram": {}, "files": []}
+        if self.retired_path.exists():
+            try:
+                with open(self.retired_path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                retired = {
+                    "count": int(saved["count"]),
+                    "total": int(saved["total"]),
+                    "histogram": {int(rating): int(n) for rating, n in saved["histogram"].items()},
+                    "files": list(saved.get("files", [])),
+                }
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                print(f"  ⚠️  Could not read feedback snapshot: {e}")
+        return retired
+
+    def _retire(self, files: List[Path]):
+        """Fold the ratings of rotated files into the snapshot, then delete them"""
+        retired = self._load_retired()
+        # Names only matter until their file is gone (a crash between snapshot and unlink)
+        retired["files"] = [name for name in retired["files"] if (self.path.parent / name).exists()]
+        for file_path in files:
+            if file_path.name in retired["files"]:
+                continue
+            for rating in self._ratings(file_path):
+                retired["count"] += 1
+                retired["total"] += rating
+                retired["histogram"][rating] = retired["histogram"].get(rating, 0) + 1
+            retired["files"].append(file_path.name)
+
+        tmp = self.retired_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(retired, f)
+        os.replace(tmp, self.retired_path)
+        for file_path in files:
+            file_path.unlink(missing_ok=True)
+
+    def _files(self) -> List[Path]:
+        rotated = sorted(self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}"))
+        return rotated + ([self.path] if self.path.exists() else [])
+
+    def _run(self):
+        while True:
+            batch: List[Dict] = []
+            flushes: List[threading.Event] = []
+            stop = False
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is None:
+                        stop = True
+                        break
+                    if "_flush" in item:
+                        flushes.append(item["_flush"])
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.max_batch:
+                        break
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                pass
+
+            if batch:
+                try:
+                    self._write(batch)
+                except OSError as e:
+                    print(f"  ⚠️  Could not write feedback: {e}")
+            for event in flushes:
+                event.set()
+            if stop:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def _write(self, batch: List[Dict]):
+        if self._file is None:
+            self._open()
+        # Also right after opening: the file may have come of age while the process was down
+        if self._should_rotate():
+            self._rotate()
+
+        self._file.write("".join(json.dumps(record) + "\n" for record in batch))
+        self._file.flush()
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._started_at = self._first_record_time()
+
+    def _first_record_time(self) -> float:
+        """Age of the active file: its first record's timestamp, not when this process opened it"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                first = f.readline()
+            if not first:
+                return time.time()
+            return datetime.fromisoformat(json.loads(first)["timestamp"]).timestamp()
+        except (ValueError, KeyError, TypeError):
+            # Records without timestamps: the last write is the best lower bound
+            return self.path.stat().st_mtime
+
+    def _should_rotate(self) -> bool:
+        return (
+            self._file.tell() >= self.max_bytes
+            or time.time() - self._started_at >= self.rotate_seconds
+        )
+
+    def _rotate(self):
+        self._file.close()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        self.path.rename(self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}"))
+
+        rotated = sorted(self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}"))
+        expired = rotated[: max(0, len(rotated) - self.backup_count)]
+        if expired:
+            self._retire(expired)
+        self._open()
@@ -0,0 +1,211 @@
+"""
+Index Build Module
+Checkpointed full index builds: embedded vectors are written in parts next
+to the chunk cursor, so an interrupted build resumes where it stopped
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from chunk_quality import load_quality_filter
+from config import Config
+from embeddings_store import load_embeddings
+from index_versions import IndexVersions, new_retriever
+from ingestion import DocumentChunker, DocumentIngester
+from profiling import PROFILER
+
+STATE_FILE = "state.json"
+CHUNKS_FILE = "chunks.json"
+PARTS_SUBDIR = "parts"
+
+
+class Progress:
+    """Throttled progress line with rate and ETA for one build stage"""
+
+    def __init__(self, stage: str, total: int, unit: str = "items", interval: float = 1.0, done: int = 0):
+        self.stage = stage
+        self.total = total
+        self.unit = unit
+        self.interval = interval
+        self.done = done
+        self._resumed_from = done
+        self._start = time.perf_counter()
+        self._last_print = 0.0
+
+    def update(self, n: int = 1):
+        self.done += n
+        now = time.perf_counter()
+        if now - self._last_print >= self.interval or self.done >= self.total:
+            self._last_print = now
+            print(self.line())
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self._start
+        # Rate only counts work done in this run, not what a checkpoint restored
+        rate = (self.done - self._resumed_from) / elapsed if elapsed else 0.0
+        remaining = (self.total - self.done) / rate if rate else float("inf")
+        pct = 100.0 * self.done / self.total if self.total else 100.0
+        eta = _format_seconds(remaining) if remaining != float("inf") else "?"
+        return (
+            f"  [{self.stage}] {self.done}/{self.total} {self.unit} ({pct:.0f}%) "
+            f"| {rate:.1f} {self.unit}/s | elapsed {_format_seconds(elapsed)} | ETA {eta}"
+        )
+
+
+def _format_seconds(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class CheckpointedIndexBuild:
+    """Full rebuild of data/raw that survives crashes and interruptions"""
+
+    def __init__(
+        self,
+        data_dir: str,
+        index_root: str,
+        checkpoint_dir: str,
+        embedding_model: str = "all-MiniLM-L6-v2",
+        part_size: int = 512,
+        embeddings=None,
+    ):
+        """
+        Args:
+            data_dir: Raw documents (Config.RAW_DATA_DIR)
+            index_root: Embeddings root that the finished version is published under
+            checkpoint_dir: Where chunks, vector parts and the cursor are kept
+            embedding_model: sentence-transformers model name
+            part_size: Chunks embedded per checkpoint
+            embeddings: Already-loaded embeddings to share instead of loading a new copy
+        """
+        self.data_dir = Path(data_dir)
+        self.versions = IndexVersions(index_root)
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.embedding_model = embedding_model
+        self.part_size = part_size
+        self.embeddings = embeddings if embeddings is not None else load_embeddings(embedding_model)
+        self.ingester = DocumentIngester(str(self.data_dir))
+        self.quality = load_quality_filter()
+
+    def run(self) -> Dict | None:
+        """Build (or resume) and publish; returns a summary, or None if there was nothing to index"""
+        with PROFILER.capture("index", "full_build"):
+            return self._run()
+
+    def _run(self) -> Dict | None:
+        files = sorted(self.ingester.list_files())
+        fingerprint = self._fingerprint(files)
+        state = self._load_state(fingerprint)
+
+        if state is None:
+            chunks = self._ingest_and_chunk(files)
+            if not chunks:
+                print("❌ No documents found. Add documents to data/raw and try again.")
+                return None
+            state = {"fingerprint": fingerprint, "total": len(chunks), "done": 0, "parts": 0}
+            self._write_json(CHUNKS_FILE, chunks)
+            self._write_json(STATE_FILE, state)
+        else:
+            with open(self.checkpoint_dir / CHUNKS_FILE, "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            print(f"↻ Resuming index build at chunk {state['done']}/{state['total']}")
+
+        self._embed(chunks, state)
+        vectors = np.vstack(
+            [np.load(self._part_path(i)) for i in range(state["parts"])]
+        )
+
+        print("Step 4: Building FAISS index")
+        retriever = new_retriever(self.embeddings, sharded=Config.SHARD_BY_CATEGORY)
+        retriever.index_embeddings(chunks, vectors)
+
+        staging = self.versions.staging_dir()
+        retriever.save(str(staging))
+        version = self.versions.publish(staging, keep=Config.INDEX_KEEP_VERSIONS)
+
+        # The published version is the new source of truth
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+        return {"files": len(files), "chunks": len(chunks), "version": version}
+
+    def _ingest_and_chunk(self, files: List[Path]) -> List[Dict]:
+        print("Step 1: Ingesting documents")
+        progress = Progress("ingest", len(files), "files")
+        docs = []
+        for file_path in files:
+            docs.extend(self.ingester.ingest_files([file_path]))
+            progress.update()
+        print(f"\n✓ Total documents ingested: {len(docs)}")
+        if not docs:
+            return []
+
+        print("Step 2: Chunking documents")
+        chunker = DocumentChunker(Config.CHUNK_SIZE, Config.CHUNK_OVERLAP, quality=self.quality)
+        chunks = chunker.chunk_documents(docs)
+        if self.quality is not None:
+            self.quality.print_report()
+            self.quality.save_report(str(Config.QUALITY_REPORT_FILE))
+        return chunks
+
+    def _embed(self, chunks: List[Dict], state: Dict):
+        print("Step 3: Embedding chunks")
+        progress = Progress("embed", state["total"], "chunks", done=state["done"])
+        while state["done"] < state["total"]:
+            batch = chunks[state["done"] : state["done"] + self.part_size]
+            vectors = np.asarray(
+                self.embeddings.embed_documents([chunk["text"] for chunk in batch]),
+                dtype=np.float32,
+            )
+
+            # Part first, then cursor: a crash in between only re-embeds one part
+            tmp = self._part_path(state["parts"]).with_suffix(".tmp.npy")
+            tmp.parent.mkdir(parents=True, exist_ok=True)
+            np.save(tmp, vectors)
+            os.replace(tmp, self._part_path(state["parts"]))
+            state["done"] += len(batch)
+            state["parts"] += 1
+            self._write_json(STATE_FILE, state)
+            progress.update(len(batch))
+
+    def _fingerprint(self, files: List[Path]) -> str:
+        """Changes whenever the inputs or anything that shapes chunks/vectors changes"""
+        digest = hashlib.sha1()
+        digest.update(
+            f"{self.embedding_model}|{Config.CHUNK_SIZE}|{Config.CHUNK_OVERLAP}|{self.part_size}".encode()
+        )
+        if self.quality is not None:
+            digest.update(f"|{self.quality.settings()}".encode())
+        for file_path in files:
+            stat = file_path.stat()
+            digest.update(f"|{file_path}|{stat.st_mtime_ns}|{stat.st_size}".encode())
+        return digest.hexdigest()
+
+    def _load_state(self, fingerprint: str) -> Dict | None:
+        state_file = self.checkpoint_dir / STATE_FILE
+        if not state_file.exists():
+            return None
+        with open(state_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("fingerprint") != fingerprint:
+            print("⚠️  data/raw or settings changed since the last checkpoint; starting over")
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+            return None
+        return state
+
+    def _part_path(self, index: int) -> Path:
+        return self.checkpoint_dir / PARTS_SUBDIR / f"part-{index:05d}.npy"
+
+    def _write_json(self, name: str, payload):
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_dir / f"{name}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, self.checkpoint_dir / name)
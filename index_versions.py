@@ -0,0 +1,297 @@
+"""
+Index Versioning Module
+Versioned index directories with an atomic CURRENT pointer, and a
+retriever that hot-swaps to a newly published version between requests
+"""
+
+import gc
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from config import Config
+from embeddings_store import RAGRetriever, load_embeddings
+from sharding import ShardedRetriever
+
+try:
+    import fcntl
+except ImportError:  # Windows: prune() cannot see other processes' readers
+    fcntl = None
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_SUBDIR = "versions"
+STAGING_PREFIX = ".staging-"
+# Held with a shared flock() by every process serving a version; the kernel
+# drops it when the process exits, so a crashed server never pins a version
+LEASE_FILE = ".readers.lock"
+
+
+class IndexVersions:
+    """data/embeddings/versions/<version>/ plus data/embeddings/CURRENT"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.versions_dir = self.root / VERSIONS_SUBDIR
+
+    def current(self) -> str | None:
+        """Name of the published version, if any"""
+        pointer = self.root / CURRENT_FILE
+        if not pointer.exists():
+            return None
+        version = pointer.read_text(encoding="utf-8").strip()
+        return version if version and (self.versions_dir / version).is_dir() else None
+
+    def current_path(self) -> Path | None:
+        version = self.current()
+        return self.versions_dir / version if version else None
+
+    def list(self) -> List[str]:
+        if not self.versions_dir.exists():
+            return []
+        return sorted(
+            p.name for p in self.versions_dir.iterdir()
+            if p.is_dir() and not p.name.startswith(STAGING_PREFIX)
+        )
+
+    def staging_dir(self) -> Path:
+        """Fresh directory to build the next version into"""
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = self.versions_dir / f"{STAGING_PREFIX}{stamp}"
+        path.mkdir(parents=True)
+        return path
+
+    def publish(self, staging: Path, keep: int = 3) -> str:
+        """Promote a staging directory and atomically repoint CURRENT at it"""
+        version = staging.name[len(STAGING_PREFIX):] if staging.name.startswith(STAGING_PREFIX) else staging.name
+        final = self.versions_dir / version
+        if staging != final:
+            staging.rename(final)
+
+        # Write-then-rename so readers never see a half-written pointer
+        tmp = self.root / f"{CURRENT_FILE}.tmp"
+        tmp.write_text(version, encoding="utf-8")
+        os.replace(tmp, self.root / CURRENT_FILE)
+        print(f"✓ Published index version {version}")
+
+        self.prune(keep)
+        return version
+
+    def prune(self, keep: int):
+        """
+        Delete all but the newest `keep` versions (never the current one, nor one
+        a serving process still holds a lease on; a later prune retries those)
+        """
+        current = self.current()
+        versions = self.list()
+        for version in versions[: max(0, len(versions) - keep)]:
+            if version == current:
+                continue
+            fd = self._lock_unused(version)
+            if fd is False:
+                print(f"  Keeping index version {version}: still in use")
+                continue
+            try:
+                shutil.rmtree(self.versions_dir / version, ignore_errors=True)
+            finally:
+                if fd is not None:
+                    os.close(fd)
+
+    def lease(self, version: str) -> int | None:
+        """Keep prune() (in any process) from deleting a version; pass the result to release()"""
+        if fcntl is None:
+            return None
+        fd = os.open(self.versions_dir / version / LEASE_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        return fd
+
+    @staticmethod
+    def release(lease: int | None):
+        if lease is not None:
+            os.close(lease)
+
+    def _lock_unused(self, version: str):
+        """Exclusive lock on a version nobody leases (an fd, or None without fcntl), False if leased"""
+        if fcntl is None:
+            return None
+        try:
+            fd = os.open(self.versions_dir / version / LEASE_FILE, os.O_RDWR)
+        except FileNotFoundError:
+            return None  # Never served
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        return fd
+
+
+def new_retriever(embeddings, sharded: bool):
+    """Empty flat or sharded retriever configured from Config"""
+    common = {
+        "embeddings": embeddings,
+        "storage": Config.VECTOR_STORAGE,
+        "rerank_factor": Config.RERANK_FACTOR,
+        "compress_text": Config.COMPRESS_CHUNK_TEXT,
+        "query_batch_size": Config.QUERY_BATCH_SIZE,
+        "query_batch_wait": Config.QUERY_BATCH_WAIT_MS / 1000,
+        "doc_candidates": Config.DOC_CANDIDATES,
+        "section_size": Config.DOC_SECTION_CHUNKS,
+    }
+    if sharded:
+        return ShardedRetriever(
+            max_shards=Config.ROUTER_MAX_SHARDS,
+            margin=Config.ROUTER_MARGIN,
+            max_loaded_shards=Config.MAX_LOADED_SHARDS,
+            **common,
+        )
+    return RAGRetriever(**common)
+
+
+def open_index(index_dir: str, embeddings):
+    """Load a flat or sharded index directory with shared embeddings"""
+    retriever = new_retriever(embeddings, sharded=ShardedRetriever.exists(index_dir))
+    retriever.load(index_dir)
+    return retriever
+
+
+class _Generation:
+    """One loaded index version and the number of requests using it"""
+
+    def __init__(self, version: str, retriever, lease: int | None = None):
+        self.version = version
+        self.retriever = retriever
+        self.lease = lease
+        self.readers = 0
+        self.retired = False
+
+
+class HotSwapRetriever:
+    """Retriever facade that swaps index versions without dropping requests"""
+
+    def __init__(
+        self,
+        root: str,
+        embedding_model: str = "all-MiniLM-L6-v2",
+        embeddings=None,
+        loader: Callable[[str, object], object] = open_index,
+    ):
+        """
+        Args:
+            root: Embeddings root (versions/ + CURRENT, or a legacy unversioned index)
+            embedding_model: sentence-transformers model name
+            embeddings: Already-loaded embeddings to share instead of loading a new copy
+            loader: Function (index_dir, embeddings) -> retriever
+        """
+        self.versions = IndexVersions(root)
+        self.embeddings = embeddings if embeddings is not None else load_embeddings(embedding_model)
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._active: _Generation | None = None
+        self._watcher: threading.Thread | None = None
+        self._stop = threading.Event()
+
+        version, path = self._resolve()
+        self._active = self._open(version, path)
+
+    @property
+    def current_version(self) -> str:
+        return self._active.version
+
+    def retrieve(
+        self, query: str, top_k: int = 5, filters: Dict | None = None, request_id: str | None = None
+    ) -> List[Dict]:
+        generation = self._acquire()
+        try:
+            return generation.retriever.retrieve(query, top_k=top_k, filters=filters, request_id=request_id)
+        finally:
+            self._release(generation)
+
+    def prefetch(self) -> int:
+        """Fault the active version's pages into memory; bytes touched"""
+        generation = self._acquire()
+        try:
+            return generation.retriever.prefetch()
+        finally:
+            self._release(generation)
+
+    def reload(self) -> bool:
+        """Load the published version if it changed; True if a swap happened"""
+        with self._reload_lock:
+            version, path = self._resolve()
+            if version == self._active.version:
+                return False
+
+            # Load next to the old version so requests keep flowing meanwhile
+            print(f"🔄 Loading index version {version}...")
+            generation = self._open(version, path, warm=True)
+
+            with self._lock:
+                old = self._active
+                self._active = generation
+                old.retired = True
+                drained = old.readers == 0
+            if drained:
+                self._free(old)
+            print(f"✓ Swapped index {old.version} → {version}")
+            return True
+
+    def start_watching(self, interval: float = 10.0):
+        """Poll CURRENT in the background and swap when it changes"""
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"⚠️  Index reload failed, keeping {self._active.version}: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def _open(self, version: str, path, warm: bool = False) -> _Generation:
+        """
+        Lease and load a version; with warm, load its shards (up to the residency limit)
+        before it takes traffic. The lease keeps the directory for shards loaded later.
+        """
+        lease = self.versions.lease(version) if version != "legacy" else None
+        try:
+            retriever = self.loader(str(path), self.embeddings)
+            if warm and hasattr(retriever, "prefetch"):
+                retriever.prefetch()
+        except BaseException:
+            self.versions.release(lease)
+            raise
+        return _Generation(version, retriever, lease)
+
+    def _resolve(self):
+        path = self.versions.current_path()
+        if path is None:
+            # No published versions yet: serve the legacy index at the root
+            return "legacy", self.versions.root
+        return path.name, path
+
+    def _acquire(self) -> _Generation:
+        with self._lock:
+            generation = self._active
+            generation.readers += 1
+            return generation
+
+    def _release(self, generation: _Generation):
+        with self._lock:
+            generation.readers -= 1
+            drained = generation.retired and generation.readers == 0
+        if drained:
+            self._free(generation)
+
+    def _free(self, generation: _Generation):
+        generation.retriever = None
+        gc.collect()
+        self.versions.release(generation.lease)
+        generation.lease = None
+        print(f"✓ Released index version {generation.version}")
@@ -0,0 +1,229 @@
+"""
+Indexer Daemon Module
+Watches data/raw, re-embeds only the files that changed and publishes a new
+index version for the serving process to hot-swap
+"""
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from chunk_quality import load_quality_filter
+from config import Config
+from embeddings_store import load_embeddings
+from index_versions import IndexVersions, new_retriever
+from ingestion import DocumentChunker, DocumentIngester
+from profiling import PROFILER
+
+MANIFEST_FILE = "manifest.json"
+
+# relative path -> (mtime_ns, size)
+Snapshot = Dict[str, Tuple[int, int]]
+
+
+def settings_fingerprint(embedding_model: str, quality) -> str:
+    """Changes whenever anything that shapes cached chunks/vectors changes"""
+    digest = hashlib.sha1(
+        f"{embedding_model}|{Config.CHUNK_SIZE}|{Config.CHUNK_OVERLAP}|{Config.MIN_CHUNK_SIZE}".encode()
+    )
+    digest.update(f"|{quality.settings() if quality is not None else 'off'}".encode())
+    return digest.hexdigest()
+
+
+class FileCache:
+    """
+    Chunks and embeddings per source file, keyed by the file's mtime and size.
+    The whole cache is dropped when the settings fingerprint it was built with changes.
+    """
+
+    def __init__(self, cache_dir: str, fingerprint: str = ""):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.fingerprint = fingerprint
+        self.manifest: Dict[str, Dict] = {}
+        manifest_file = self.cache_dir / MANIFEST_FILE
+        if manifest_file.exists():
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("fingerprint") == fingerprint:
+                self.manifest = stored["files"]
+            else:
+                print("⚠️  Embedding model or chunking settings changed; re-embedding every file")
+                self.clear()
+
+    def clear(self):
+        for path in self.cache_dir.iterdir():
+            if path.suffix in (".json", ".npy"):
+                path.unlink(missing_ok=True)
+        self.manifest = {}
+
+    def snapshot(self) -> Snapshot:
+        return {path: (entry["mtime_ns"], entry["size"]) for path, entry in self.manifest.items()}
+
+    def put(self, rel_path: str, stat: Tuple[int, int], chunks: List[Dict], vectors: np.ndarray):
+        key = hashlib.sha1(rel_path.encode("utf-8")).hexdigest()[:16]
+        with open(self.cache_dir / f"{key}.json", "w", encoding="utf-8") as f:
+            json.dump(chunks, f)
+        np.save(self.cache_dir / f"{key}.npy", vectors)
+        self.manifest[rel_path] = {"key": key, "mtime_ns": stat[0], "size": stat[1], "chunks": len(chunks)}
+
+    def remove(self, rel_path: str):
+        entry = self.manifest.pop(rel_path, None)
+        if entry:
+            for suffix in (".json", ".npy"):
+                (self.cache_dir / f"{entry['key']}{suffix}").unlink(missing_ok=True)
+
+    def load_all(self) -> Tuple[List[Dict], np.ndarray | None]:
+        """Every cached chunk and vector, in path order"""
+        chunks: List[Dict] = []
+        vectors: List[np.ndarray] = []
+        for rel_path in sorted(self.manifest):
+            entry = self.manifest[rel_path]
+            if not entry["chunks"]:
+                continue
+            with open(self.cache_dir / f"{entry['key']}.json", "r", encoding="utf-8") as f:
+                chunks.extend(json.load(f))
+            vectors.append(np.load(self.cache_dir / f"{entry['key']}.npy"))
+        return chunks, (np.vstack(vectors) if vectors else None)
+
+    def save(self):
+        tmp = self.cache_dir / f"{MANIFEST_FILE}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "files": self.manifest}, f)
+        tmp.replace(self.cache_dir / MANIFEST_FILE)
+
+
+class IndexerDaemon:
+    """Polls the raw data directory and incrementally republishes the index"""
+
+    def __init__(
+        self,
+        data_dir: str,
+        index_root: str,
+        cache_dir: str,
+        embedding_model: str = "all-MiniLM-L6-v2",
+        poll_interval: float = 2.0,
+        debounce: float = 5.0,
+        embeddings=None,
+    ):
+        """
+        Args:
+            data_dir: Directory to watch (Config.RAW_DATA_DIR)
+            index_root: Embeddings root that versions are published under
+            cache_dir: Where per-file chunks and vectors are kept between runs
+            embedding_model: sentence-transformers model name
+            poll_interval: Seconds between directory scans
+            debounce: Seconds the directory must stay unchanged before indexing
+            embeddings: Already-loaded embeddings to share instead of loading a new copy
+        """
+        self.data_dir = Path(data_dir)
+        self.versions = IndexVersions(index_root)
+        self.embeddings = embeddings if embeddings is not None else load_embeddings(embedding_model)
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.ingester = DocumentIngester(str(self.data_dir))
+        self.quality = load_quality_filter()
+        self.cache = FileCache(cache_dir, settings_fingerprint(embedding_model, self.quality))
+        self.chunker = DocumentChunker(Config.CHUNK_SIZE, Config.CHUNK_OVERLAP, quality=self.quality)
+        self._stop = threading.Event()
+
+    def scan(self) -> Snapshot:
+        """Current (mtime, size) of every supported file"""
+        snapshot: Snapshot = {}
+        for file_path in self.ingester.list_files():
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                continue  # Deleted mid-scan
+            snapshot[file_path.relative_to(self.data_dir).as_posix()] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def sync(self, snapshot: Snapshot | None = None) -> Dict:
+        """Re-embed changed files, drop deleted ones and publish if anything moved"""
+        snapshot = self.scan() if snapshot is None else snapshot
+        cached = self.cache.snapshot()
+        changed = sorted(path for path, stat in snapshot.items() if cached.get(path) != stat)
+        removed = sorted(set(cached) - set(snapshot))
+        summary = {"changed": changed, "removed": removed, "version": None}
+
+        if not changed and not removed and self.versions.current() is not None:
+            return summary
+
+        start = time.perf_counter()
+        for rel_path in removed:
+            self.cache.remove(rel_path)
+            print(f"  🗑️  Removed: {rel_path}")
+        if changed:
+            with PROFILER.capture("index", f"incremental-{len(changed)}-files"):
+                self._embed_files(changed, snapshot)
+        self.cache.save()
+
+        chunks, vectors = self.cache.load_all()
+        if not chunks:
+            print("⚠️  No indexable documents in data/raw; nothing published")
+            return summary
+
+        retriever = new_retriever(self.embeddings, sharded=Config.SHARD_BY_CATEGORY)
+        retriever.index_embeddings(chunks, vectors)
+
+        staging = self.versions.staging_dir()
+        retriever.save(str(staging))
+        summary["version"] = self.versions.publish(staging, keep=Config.INDEX_KEEP_VERSIONS)
+        print(
+            f"✓ Indexed {len(changed)} changed / {len(removed)} removed files "
+            f"({len(chunks)} chunks total) in {time.perf_counter() - start:.1f}s"
+        )
+        return summary
+
+    def _embed_files(self, rel_paths: List[str], snapshot: Snapshot):
+        """Parse, chunk and embed only the given files, then cache the results"""
+        docs = self.ingester.ingest_files([self.data_dir / path for path in rel_paths])
+        by_path = {
+            Path(doc["path"]).relative_to(self.data_dir).as_posix(): doc for doc in docs
+        }
+
+        per_file = {path: self.chunker.chunk_documents([by_path[path]]) if path in by_path else []
+                    for path in rel_paths}
+        texts = [chunk["text"] for path in rel_paths for chunk in per_file[path]]
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32) if texts else None
+
+        offset = 0
+        for path in rel_paths:
+            chunks = per_file[path]
+            # Unreadable or empty files are cached as zero chunks until they change again
+            file_vectors = vectors[offset : offset + len(chunks)] if chunks else np.zeros((0, 0), np.float32)
+            self.cache.put(path, snapshot[path], chunks, file_vectors)
+            offset += len(chunks)
+
+        if self.quality is not None:
+            self.quality.print_report()
+            self.quality.save_report(str(Config.QUALITY_REPORT_FILE))
+            self.quality.files.clear()  # The report file keeps earlier runs' files
+
+    def run_forever(self):
+        """Index once, then keep publishing as data/raw changes"""
+        print(f"👀 Watching {self.data_dir} (poll {self.poll_interval}s, debounce {self.debounce}s)")
+        indexed = self.scan()
+        self.sync(indexed)
+        seen, changed_at = indexed, time.monotonic()
+
+        while not self._stop.wait(self.poll_interval):
+            snapshot = self.scan()
+            if snapshot != seen:
+                # Still changing (copy in progress, burst of drops): restart the quiet period
+                seen, changed_at = snapshot, time.monotonic()
+                continue
+            if snapshot != indexed and time.monotonic() - changed_at >= self.debounce:
+                try:
+                    self.sync(snapshot)
+                except Exception as e:
+                    print(f"⚠️  Incremental indexing failed, will retry on next change: {e}")
+                indexed = snapshot
+
+    def stop(self):
+        self._stop.set()
@@ -9,29 +9,50 @@ from pathlib import Path
 import PyPDF2
 import docx
 
+from profiling import PROFILER
+
 
 class DocumentIngester:
     """Handles multi-format document ingestion"""
 
     def __init__(self, data_dir: str):
         self.data_dir = Path(data_dir)
+        # Pages (PDF) or whole files (DOCX/TXT) parsed so far, for throughput stats
+        self.pages_read = 0
 
     def ingest_all(self) -> List[Dict[str, str]]:
         """Ingest all supported documents from directory"""
+        documents = self.ingest_files(self.list_files())
+        print(f"\n✓ Total documents ingested: {len(documents)}")
+        return documents
+
+    def list_files(self) -> List[Path]:
+        """All supported files under data_dir"""
+        return [
+            file_path
+            for file_path in self.data_dir.rglob("*")
+            if file_path.suffix.lower() in [".pdf", ".docx", ".txt"]
+        ]
+
+    def ingest_files(self, file_paths: List[Path]) -> List[Dict[str, str]]:
+        """Ingest a specific set of files"""
         documents: List[Dict[str, str]] = []
 
-        for file_path in self.data_dir.rglob("*"):
-            if file_path.suffix.lower() in [".pdf", ".docx", ".txt"]:
-                doc = self._process_file(file_path)
-                if doc and doc["content"].strip():
-                    documents.append(doc)
-                    print(f"  ✓ Processed: {file_path.name}")
+        for file_path in file_paths:
+            doc = self._process_file(Path(file_path))
+            if doc and doc["content"].strip():
+                documents.append(doc)
+                print(f"  ✓ Processed: {Path(file_path).name}")
 
-        print(f"\n✓ Total documents ingested: {len(documents)}")
         return documents
 
     def _process_file(self, file_path: Path) -> Dict[str, str] | None:
         """Process single file based on extension"""
+        with PROFILER.capture("ingest", file_path.name):
+            return self._parse_file(file_path)
+
+    def _parse_file(self, file_path: Path) -> Dict[str, str] | None:
+        """Document dict for one file, None if unsupported, empty or unreadable"""
         try:
             suffix = file_path.suffix.lower()
 
@@ -54,11 +75,20 @@ class DocumentIngester:
                 "source": str(file_path.name),
                 "content": cleaned,
                 "path": str(file_path),
+                "category": self._category(file_path),
             }
         except Exception as e:
             print(f"  ⚠️  Error processing {file_path.name}: {e}")
             return None
 
+    def _category(self, file_path: Path) -> str:
+        """Top-level folder under data_dir, e.g. data/raw/vendor/x.pdf -> vendor"""
+        try:
+            parts = file_path.relative_to(self.data_dir).parts
+        except ValueError:
+            return "general"
+        return parts[0] if len(parts) > 1 else "general"
+
     def _parse_pdf(self, file_path: Path) -> str:
         """Extract text from PDF"""
         text = ""
@@ -67,16 +97,19 @@ class DocumentIngester:
             for page in pdf_reader.pages:
                 page_text = page.extract_text() or ""
                 text += page_text + "\n"
+                self.pages_read += 1
         return text
 
     def _parse_docx(self, file_path: Path) -> str:
         """Extract text from DOCX"""
         doc = docx.Document(file_path)
+        self.pages_read += 1
         return "\n".join(para.text for para in doc.paragraphs)
 
     def _parse_txt(self, file_path: Path) -> str:
         """Read plain text file"""
         with open(file_path, "r", encoding="utf-8") as file:
+            self.pages_read += 1
             return file.read()
 
     def _clean_text(self, text: str) -> str:
@@ -91,12 +124,14 @@ class DocumentIngester:
 class DocumentChunker:
     """Splits documents into chunks for embedding"""
 
-    def __init__(self, chunk_size: int = 350, chunk_overlap: int = 60):
+    def __init__(self, chunk_size: int = 350, chunk_overlap: int = 60, quality=None):
         # Guard against invalid configuration
         if chunk_size <= chunk_overlap:
             raise ValueError("chunk_size must be greater than chunk_overlap")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # Optional ChunkQualityFilter; junk chunks never reach the embedding model
+        self.quality = quality
 
     def chunk_documents(self, documents: List[Dict[str, str]]) -> List[Dict[str, str]]:
         """Split documents into overlapping chunks"""
@@ -117,6 +152,7 @@ class DocumentChunker:
                         "chunk_id": f"{doc['source']}_chunk_{i}",
                         "metadata": {
                             "source_file": doc["source"],
+                            "category": doc.get("category", "general"),
                             "chunk_index": i,
                             "total_chunks": len(doc_chunks),
                         },
@@ -124,6 +160,8 @@ class DocumentChunker:
                 )
 
         print(f"✓ Created {len(chunks)} chunks from {len(documents)} documents")
+        if self.quality is not None:
+            chunks = self.quality.filter(chunks)
         if len(chunks) == 0:
             print("⚠️  No chunks were created. Check that your documents contain enough text.")
 
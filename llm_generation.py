@@ -1,7 +1,78 @@
-from typing import Dict
+import math
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterator, Tuple
 from langchain_community.llms import Ollama
 from langchain_core.prompts import PromptTemplate
 
+from cache_warming import AnswerCache
+from cancellation import CancelToken, GenerationCancelled
+from extractive import ExtractiveAnswerer
+from metrics import REGISTRY, StageTimer, record, span
+from profiling import PROFILER
+from single_flight import Flight, SingleFlight
+
+ANSWER_MODES = ("auto", "generate", "extractive")
+
+# Identical on every request and sent as Ollama's `system`, so it is the first
+# thing in the model's context and its prefill can be reused across requests
+SYSTEM_PROMPT = """You are an ERP system expert assistant. Answer the question using ONLY the context provided in each request.
+
+INSTRUCTIONS:
+1. Answer directly and concisely
+2. Cite sources using [Source 1], [Source 2] format after each claim
+3. If information is missing, say "I don't have that information in the provided documents"
+4. Use bullet points for procedural questions
+5. Be specific and factual"""
+
+# Generation ran out of time before the model produced anything
+TIMEOUT_ANSWER = "The answer took too long to generate. Please try again."
+
+# Per-request part: everything after the system prefix varies
+PROMPT_TEMPLATE = """CONTEXT FROM ERP DOCUMENTATION:
+{context}
+
+USER QUESTION: {query}
+
+ANSWER:"""
+
+
+def _run_now(fn: Callable, *args, **kwargs):
+    """Default `admit`: no scheduler, run straight away"""
+    return fn(*args, **kwargs)
+
+
+def format_context(context_chunks) -> str:
+    """Retrieved chunks as the labelled context block of the prompt"""
+    context_text = ""
+    for i, chunk in enumerate(context_chunks, 1):
+        source_label = f"[Source {i}: {chunk['source']}]"
+        context_text += f"\n{source_label}\n{chunk['text']}\n"
+    return context_text
+
+
+class BackendHealth:
+    """Marks the LLM backend down after a failure and lets a probe through later"""
+
+    def __init__(self, retry_after: float = 30.0):
+        self.retry_after = retry_after
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        with self._lock:
+            return time.monotonic() >= self._down_until
+
+    def failed(self):
+        with self._lock:
+            self._down_until = time.monotonic() + self.retry_after
+
+    def succeeded(self):
+        with self._lock:
+            self._down_until = 0.0
+
 
 class RAGPipeline:
     """Complete RAG pipeline using LangChain + Ollama"""
@@ -11,6 +82,16 @@ class RAGPipeline:
         retriever,
         base_url: str = "http://localhost:11434",
         model: str = "llama3.2",
+        llm=None,
+        keep_alive: str = "30m",
+        answer_mode: str = "auto",
+        generation_slo: float = 20.0,
+        retry_after: float = 30.0,
+        answer_cache=None,
+        query_log=None,
+        max_tokens: int = 1000,
+        generation_timeout: float = 120.0,
+        single_flight: bool = True,
     ):
         """
         Initialize RAG pipeline with Ollama
@@ -19,18 +100,74 @@ class RAGPipeline:
             retriever: RAGRetriever instance
             base_url: Ollama server URL
             model: Ollama model name (llama3.2, mistral, phi3, etc.)
+            llm: Pre-built LangChain LLM to use instead of Ollama (skips the probe)
+            keep_alive: How long Ollama keeps the model and cached prompt prefix loaded
+            answer_mode: Default mode: "generate" (LLM only), "extractive" (no LLM) or
+                "auto" (LLM, falling back to extractive on SLO breach or backend failure)
+            generation_slo: Seconds "auto" waits for the LLM before answering extractively
+            retry_after: Seconds "auto" skips an LLM backend that just failed
+            answer_cache: AnswerCache for repeated questions (None = always answer afresh)
+            query_log: QueryLog that records asked questions for startup cache warming
+            max_tokens: Most tokens generated per answer (Ollama's num_predict; also
+                enforced on the stream for injected LLMs)
+            generation_timeout: Wall-clock seconds a request may spend generating;
+                the generation is then stopped and its partial answer returned
+            single_flight: Identical questions (same normalized query and parameters)
+                asked while one is being answered attach to it instead of starting
+                their own retrieval and generation
         """
+        if answer_mode not in ANSWER_MODES:
+            raise ValueError(f"Unknown answer mode '{answer_mode}', expected one of {ANSWER_MODES}")
+
         self.retriever = retriever
+        self.answer_mode = answer_mode
+        self.generation_slo = generation_slo
+        self.health = BackendHealth(retry_after)
+        self.answer_cache = answer_cache
+        self.query_log = query_log
+        self.max_tokens = max_tokens
+        self.generation_timeout = generation_timeout
+        self.extractor = ExtractiveAnswerer(retriever.embeddings)
+        # session -> CancelToken of its request in flight; a newer request supersedes it
+        self._sessions: Dict[str, CancelToken] = {}
+        self._sessions_lock = threading.Lock()
+        self.single_flight = single_flight
+        self.flights = SingleFlight()
+        REGISTRY.describe(
+            "rag_answer_fallbacks_total", "Answers served extractively because the LLM was slow or down"
+        )
+        REGISTRY.describe(
+            "rag_generations_stopped_total", "Generations stopped before the model finished, by reason"
+        )
+
+        self.prompt = PromptTemplate(
+            input_variables=["context", "query"],
+            template=PROMPT_TEMPLATE,
+        )
+
+        if llm is not None:
+            self.llm = llm
+        else:
+            self._connect_ollama(base_url, model, keep_alive)
+
+        print("✓ RAG pipeline ready")
 
+    def _connect_ollama(self, base_url: str, model: str, keep_alive: str):
+        """Create the Ollama client and check it responds"""
         print(f"Initializing Ollama: {model}")
 
+        self.llm = Ollama(
+            base_url=base_url,
+            model=model,
+            temperature=0.1,
+            system=SYSTEM_PROMPT,
+            keep_alive=keep_alive,
+            num_predict=self.max_tokens,
+            # Bounds a stream nobody reads any more (e.g. stuck in prefill after a cancel)
+            timeout=math.ceil(self.generation_timeout),
+        )
         try:
-            self.llm = Ollama(
-                base_url=base_url,
-                model=model,
-                temperature=0.1,
-            )
-            # Test connection
+            # Test connection (also loads the model and prefills the system prefix)
             _ = self.llm.invoke("Hi")
             print(f"✓ Ollama connected: {model}")
         except Exception as e:
@@ -38,35 +175,349 @@ class RAGPipeline:
             print("1. Check Ollama is running: ollama serve")
             print(f"2. Check model is pulled: ollama pull {model}")
             print(f"3. Test manually: ollama run {model}")
-            raise
+            if self.answer_mode == "generate":
+                raise
+            # Serve extractive answers until a later probe reaches the backend
+            self.health.failed()
+            print("⚠️  Continuing with extractive answers until Ollama responds")
 
-        template = """You are an ERP system expert assistant. Answer the question using ONLY the context provided below.
+    def answer_question(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Dict | None = None,
+        request_id: str | None = None,
+        mode: str | None = None,
+        profile: bool = False,
+        session: str | None = None,
+        cancel: CancelToken | None = None,
+        admit: Callable | None = None,
+    ) -> Dict:
+        """
+        Generate answer for query using RAG
 
-CONTEXT FROM ERP DOCUMENTATION:
-{context}
+        Args:
+            query: User question
+            top_k: Number of chunks to use as context
+            filters: Optional metadata filters passed to the retriever,
+                e.g. {"source_file": "vendor registration procedure HAL.pdf"}
+            request_id: Stable ID for linking feedback and logs (generated if omitted)
+            mode: "auto", "generate" or "extractive" (defaults to the pipeline's answer_mode)
+            profile: Capture a cProfile of this request (see profiling.PROFILER); the
+                result then carries the profile path
+            session: Client/tab ID; a newer request from the same session cancels
+                this one's generation
+            cancel: CancelToken the caller cancels when the client disconnects
+            admit: Runs the computation, e.g. RequestScheduler.run. Cache hits and
+                requests that join an identical one in flight skip it (and the queue)
 
-INSTRUCTIONS:
-1. Answer directly and concisely
-2. Cite sources using [Source 1], [Source 2] format after each claim
-3. If information is missing, say "I don't have that information in the provided documents"
-4. Use bullet points for procedural questions
-5. Be specific and factual
+        Raises:
+            GenerationCancelled: The request was cancelled or superseded (a passed
+                deadline returns the partial answer instead)
+        """
+        mode = self._check_mode(mode)
+        if self.query_log is not None:
+            self.query_log.add(query)
+        # A profiled request is always answered, otherwise there is nothing to profile
+        cached = None if profile else self._cached(query, top_k, filters, mode, request_id)
+        if cached is not None:
+            return cached
+        cancel = cancel or CancelToken()
+        start = time.perf_counter()
+        try:
+            self._start(session, cancel)
+            member, leader = self.flights.attach(
+                self._flight_key("answer", query, top_k, filters, mode, unique=profile), cancel
+            )
+            try:
+                if not leader:
+                    return self._followed(member.flight.wait(cancel), query, request_id, start)
+                result = self._lead(
+                    member.flight, admit or _run_now, self._respond, query, top_k, filters, request_id, mode, profile
+                )
+            finally:
+                member.leave()
+            cancel.check()  # Computed for identical requests after this one was cancelled
+            return result
+        finally:
+            self._finish(session, cancel)
 
-USER QUESTION: {query}
+    def warm(self, query: str, top_k: int = 5) -> Dict:
+        """Answer a hot query into the caches (not logged as user traffic)"""
+        mode = self._check_mode(None)
+        result = self._cached(query, top_k, None, mode, None) or self._respond(query, top_k, None, None, mode)
+        if result["sources"] and result["mode"] != "extractive":
+            # Sentence embeddings for the fallback path, should the LLM go down later
+            self.extractor.answer(query, result["sources"])
+        return result
 
-ANSWER:"""
+    def _respond(
+        self,
+        query: str,
+        top_k: int,
+        filters: Dict | None,
+        request_id: str | None,
+        mode: str,
+        profile: bool = False,
+        cancel: CancelToken | None = None,
+    ) -> Dict:
+        cancel = self._begin(cancel)
+        request_id = request_id or uuid.uuid4().hex[:12]
+        timer = StageTimer()
+        request_start = time.perf_counter()
+        version = self._index_version()
 
-        self.prompt = PromptTemplate(
-            input_variables=["context", "query"],
-            template=template,
+        with PROFILER.capture("answer", request_id, force=profile) as capture, timer.activate():
+            result = self._answer(query, top_k, filters, mode, cancel, request_id)
+            record("total", time.perf_counter() - request_start)
+
+        result["timings"] = timer.as_dict()
+        result["request_id"] = request_id
+        self._store(query, top_k, filters, mode, version, result)
+        if capture.path:
+            result["profile"] = str(capture.path)
+        return result
+
+    def _index_version(self):
+        return getattr(self.retriever, "current_version", None)
+
+    def _start(self, session: str | None, cancel: CancelToken):
+        """
+        On arrival, before any queueing: make `cancel` the session's current request
+        and cancel the one before it, so a newer question does not wait behind it
+        """
+        if session:
+            with self._sessions_lock:
+                previous = self._sessions.get(session)
+                self._sessions[session] = cancel
+            if previous is not None and previous is not cancel:
+                previous.cancel("superseded")
+        cancel.check()
+
+    def _begin(self, cancel: CancelToken | None) -> CancelToken:
+        """Once admitted: start the generation deadline"""
+        cancel = cancel or CancelToken()
+        cancel.check()  # e.g. everyone waiting for it left while it was queued
+        if cancel.deadline is None:
+            cancel.deadline = time.monotonic() + self.generation_timeout
+        return cancel
+
+    def _flight_key(
+        self, kind: str, query: str, top_k: int, filters: Dict | None, mode: str, unique: bool = False
+    ) -> Tuple:
+        """Identical requests share a key; with single-flight off (or `unique`) none does"""
+        if unique or not self.single_flight:
+            return (kind, uuid.uuid4().hex)
+        return (kind, *AnswerCache.key(query, top_k, filters, mode, self._index_version()))
+
+    def _lead(self, flight: Flight, admit: Callable, fn: Callable, *args):
+        """Run fn(*args, cancel=flight.cancel) through `admit` and land the flight with its outcome"""
+        try:
+            result = admit(fn, *args, cancel=flight.cancel)
+        except BaseException as e:
+            self.flights.land(flight, error=e)
+            raise
+        self.flights.land(flight, result=result)
+        return result
+
+    def _followed(self, result: Dict, query: str, request_id: str | None, start: float) -> Dict:
+        """The shared result, as answered to a request that joined it"""
+        return {
+            **result,
+            "query": query,
+            "deduplicated": True,
+            "timings": {"total": round((time.perf_counter() - start) * 1000, 2)},
+            "request_id": request_id or uuid.uuid4().hex[:12],
+        }
+
+    def _finish(self, session: str | None, cancel: CancelToken):
+        if session:
+            with self._sessions_lock:
+                if self._sessions.get(session) is cancel:
+                    del self._sessions[session]
+
+    def _cached(
+        self, query: str, top_k: int, filters: Dict | None, mode: str, request_id: str | None
+    ) -> Dict | None:
+        if self.answer_cache is None:
+            return None
+        start = time.perf_counter()
+        cached = self.answer_cache.get(
+            self.answer_cache.key(query, top_k, filters, mode, self._index_version())
         )
+        if cached is None:
+            return None
+        return {
+            **cached,
+            "query": query,
+            "cached": True,
+            "timings": {"total": round((time.perf_counter() - start) * 1000, 2)},
+            "request_id": request_id or uuid.uuid4().hex[:12],
+        }
 
-        print("✓ RAG pipeline ready")
+    def _store(self, query: str, top_k: int, filters: Dict | None, mode: str, version, result: Dict):
+        """Cache complete answers only: not errors, fallbacks, stopped generations or empty retrievals"""
+        if (
+            self.answer_cache is None
+            or not result["sources"]
+            or result.get("fallback")
+            or "error" in result
+            or "stopped" in result
+        ):
+            return
+        entry = {key: value for key, value in result.items() if key not in ("timings", "request_id")}
+        self.answer_cache.put(self.answer_cache.key(query, top_k, filters, mode, version), entry)
 
-    def answer_question(self, query: str, top_k: int = 5) -> Dict:
-        """Generate answer for query using RAG"""
+    def stream_answer(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Dict | None = None,
+        request_id: str | None = None,
+        mode: str | None = None,
+        session: str | None = None,
+        cancel: CancelToken | None = None,
+        admit: Callable | None = None,
+    ) -> Iterator[Dict]:
+        """
+        Answer as a stream of events: {"event": "sources"} once retrieval is done,
+        {"event": "token", "text"} per generated piece, then {"event": "done"} with the
+        full answer, mode, fallback, timings and request_id (same fields as answer_question).
+        A cancelled or superseded request ends with {"event": "cancelled", "reason"}
+        instead; closing the generator (client gone) stops the generation. An
+        identical stream in flight is replayed from its first event and followed,
+        and the generation stops only once every stream following it is gone.
+        `admit` is as for answer_question
+        """
+        mode = self._check_mode(mode)
+        if self.query_log is not None:
+            self.query_log.add(query)
+        cached = self._cached(query, top_k, filters, mode, request_id)
+        if cached is not None:
+            yield {"event": "sources", "sources": cached["sources"], "confidence": cached["confidence"]}
+            yield {"event": "token", "text": cached["answer"]}
+            yield {"event": "done", **{key: value for key, value in cached.items() if key != "sources"}}
+            return
+
+        cancel = cancel or CancelToken()
+        start = time.perf_counter()
+        member = None
+        try:
+            self._start(session, cancel)
+            member, leader = self.flights.attach(self._flight_key("stream", query, top_k, filters, mode), cancel)
+            if leader:
+                threading.Thread(
+                    target=self._broadcast,
+                    args=(member.flight, admit or _run_now, query, top_k, filters, request_id, mode),
+                    name="stream-flight",
+                    daemon=True,
+                ).start()
+            for event in member.flight.follow(cancel):
+                if not leader and event["event"] == "done":
+                    event = {**self._followed(event, query, request_id, start), "event": "done"}
+                yield event
+        except GenerationCancelled as e:
+            yield {"event": "cancelled", "reason": e.reason}
+        except GeneratorExit:
+            # Stops the generation unless other streams still follow it
+            cancel.cancel("disconnected")
+            raise
+        finally:
+            if member is not None:
+                member.leave()
+            self._finish(session, cancel)
+
+    def _broadcast(
+        self, flight: Flight, admit: Callable, query: str, top_k: int, filters: Dict | None,
+        request_id: str | None, mode: str,
+    ):
+        """Produce one streamed answer and publish its events to every stream following the flight"""
+        def produce(cancel: CancelToken):
+            for event in self._stream(query, top_k, filters, request_id, mode, cancel):
+                flight.publish(event)
+
+        try:
+            self._lead(flight, admit, produce)
+        except BaseException:
+            pass  # Landed on the flight; the followers raise it
+
+    def _stream(
+        self, query: str, top_k: int, filters: Dict | None, request_id: str | None, mode: str, cancel: CancelToken
+    ) -> Iterator[Dict]:
+        cancel = self._begin(cancel)
+        request_id = request_id or uuid.uuid4().hex[:12]
+        timer = StageTimer()
+        request_start = time.perf_counter()
+        version = self._index_version()
+
+        # Spans are only opened between yields: the consumer may be a different context
+        with timer.activate():
+            with span("retrieve"):
+                context_chunks = self.retriever.retrieve(query, top_k=top_k, filters=filters, request_id=request_id)
+        confidence = sum(c["score"] for c in context_chunks) / len(context_chunks) if context_chunks else 0.0
+        yield {"event": "sources", "sources": context_chunks, "confidence": confidence}
+
+        result = {"query": query, "sources": context_chunks, "confidence": confidence, "mode": mode}
+        pieces = []
+        if not context_chunks:
+            result["answer"] = "I couldn't find relevant information in the ERP documentation."
+        elif mode == "extractive" or (mode == "auto" and not self.health.available()):
+            fallback = "backend_unhealthy" if mode == "auto" else None
+            with timer.activate():
+                self._extractive(result, query, context_chunks, fallback=fallback)
+        else:
+            with timer.activate(), span("prompt_build"):
+                prompt = self.build_prompt(query, context_chunks)
+            llm_start = time.perf_counter()
+            try:
+                for piece in self._stream_llm(prompt, cancel):
+                    if not pieces:
+                        timer.record("llm_first_token", time.perf_counter() - llm_start)
+                    pieces.append(piece)
+                    yield {"event": "token", "text": piece}
+                self.health.succeeded()
+                result.update({"answer": "".join(pieces).strip(), "mode": "generate"})
+            except GenerationCancelled as e:
+                if e.reason != "deadline":
+                    raise
+                # Out of time: keep what was generated, or say nothing came
+                answer = "".join(pieces).strip() or TIMEOUT_ANSWER
+                result.update({"answer": answer, "mode": "generate", "stopped": e.reason})
+            except Exception as e:
+                print(f"⚠️  Generation error: {e}")
+                self.health.failed()
+                if mode == "auto" and not pieces:
+                    with timer.activate():
+                        self._extractive(result, query, context_chunks, fallback="backend_error")
+                else:
+                    answer = "".join(pieces).strip() or "Error generating answer. Please check Ollama is running."
+                    result.update({"answer": answer, "mode": "generate", "error": str(e)})
+            timer.record("llm_total", time.perf_counter() - llm_start)
+
+        if not pieces:
+            # Extractive, empty and error answers arrive whole, as a single token
+            yield {"event": "token", "text": result["answer"]}
+        timer.record("total", time.perf_counter() - request_start)
+        self._store(query, top_k, filters, mode, version, result)
+        yield {
+            "event": "done",
+            **{key: value for key, value in result.items() if key != "sources"},
+            "timings": timer.as_dict(),
+            "request_id": request_id,
+        }
+
+    def _check_mode(self, mode: str | None) -> str:
+        mode = mode or self.answer_mode
+        if mode not in ANSWER_MODES:
+            raise ValueError(f"Unknown answer mode '{mode}', expected one of {ANSWER_MODES}")
+        return mode
+
+    def _answer(
+        self, query: str, top_k: int, filters: Dict | None, mode: str, cancel: CancelToken, request_id: str
+    ) -> Dict:
         print(f"\n🔍 Searching for: '{query}'")
-        context_chunks = self.retriever.retrieve(query, top_k=top_k)
+        with span("retrieve"):
+            context_chunks = self.retriever.retrieve(query, top_k=top_k, filters=filters, request_id=request_id)
 
         if not context_chunks:
             return {
@@ -74,39 +525,142 @@ ANSWER:"""
                 "sources": [],
                 "confidence": 0.0,
                 "query": query,
+                "mode": mode,
             }
 
         print(f"✓ Found {len(context_chunks)} relevant chunks")
+        avg_score = sum(c["score"] for c in context_chunks) / len(context_chunks)
+        result = {
+            "sources": context_chunks,
+            "confidence": avg_score,
+            "query": query,
+        }
 
-        # Build context text with source labels
-        context_text = ""
-        for i, chunk in enumerate(context_chunks, 1):
-            source_label = f"[Source {i}: {chunk['source']}]"
-            context_text += f"\n{source_label}\n{chunk['text']}\n"
+        if mode == "extractive":
+            return self._extractive(result, query, context_chunks)
+        if mode == "auto" and not self.health.available():
+            return self._extractive(result, query, context_chunks, fallback="backend_unhealthy")
+
+        with span("prompt_build"):
+            final_prompt = self.build_prompt(query, context_chunks)
 
         print("🤖 Generating answer with Ollama...")
 
         try:
-            # Format the prompt and call the LLM directly
-            final_prompt = self.prompt.format(
-                context=context_text,
-                query=query,
-            )
-            answer = self.llm.invoke(final_prompt).strip()
+            answer, stopped = self._generate(final_prompt, cancel, slo=self.generation_slo if mode == "auto" else None)
+            self.health.succeeded()
+            if stopped is not None and mode == "auto":
+                limit = self.generation_slo if stopped == "slo" else self.generation_timeout
+                print(f"⚠️  Generation exceeded {limit:g}s ({stopped}), answering extractively")
+                return self._extractive(result, query, context_chunks, fallback=stopped)
+            if stopped is not None:
+                answer = answer or TIMEOUT_ANSWER
+                result["stopped"] = stopped
+        except GenerationCancelled:
+            raise
         except Exception as e:
             print(f"⚠️  Generation error: {e}")
+            self.health.failed()
+            if mode == "auto":
+                return self._extractive(result, query, context_chunks, fallback="backend_error")
             answer = "Error generating answer. Please check Ollama is running."
+            result["error"] = str(e)
 
-        avg_score = sum(c["score"] for c in context_chunks) / len(context_chunks)
+        result.update({"answer": answer, "mode": "generate"})
+        print("✓ Answer generated")
+        return result
 
-        result = {
-            "answer": answer,
-            "sources": context_chunks,
-            "confidence": avg_score,
-            "query": query,
-        }
+    def build_prompt(self, query: str, context_chunks) -> str:
+        """Per-request prompt; the system prefix travels separately when the LLM supports it"""
+        prompt = self.prompt.format(context=format_context(context_chunks), query=query)
+        if getattr(self.llm, "system", None) == SYSTEM_PROMPT:
+            return prompt
+        # LLMs without a system slot still get the instructions as a stable leading prefix
+        return f"{SYSTEM_PROMPT}\n\n{prompt}"
 
-        print("✓ Answer generated")
+    def _generate(self, prompt: str, cancel: CancelToken, slo: float | None = None) -> Tuple[str, str | None]:
+        """
+        Generated text, and why generation stopped early ("deadline" or "slo") if
+        it ran out of time; a cancelled request raises GenerationCancelled
+        """
+        pieces = []
+        start = time.perf_counter()
+        with span("llm_total"):
+            try:
+                for piece in self._stream_llm(prompt, cancel, slo):
+                    if not pieces:
+                        record("llm_first_token", time.perf_counter() - start)
+                    pieces.append(piece)
+            except GenerationCancelled as e:
+                if e.reason not in ("deadline", "slo"):
+                    raise
+                return "".join(pieces).strip(), e.reason
+        return "".join(pieces).strip(), None
+
+    def _stream_llm(self, prompt: str, cancel: CancelToken, slo: float | None = None) -> Iterator[str]:
+        """
+        LLM pieces as they are decoded, at most max_tokens of them. The backend is
+        read on its own thread, so a cancel or a passed deadline (the request's, or
+        `slo` seconds from now if that is sooner) ends this at once, even during
+        prefill. The backend request is then closed at its next token, which stops
+        Ollama decoding and frees its slot for the next queued user.
+        """
+        deadline, expiry = cancel.deadline, "deadline"
+        if slo is not None and (deadline is None or time.monotonic() + slo < deadline):
+            deadline, expiry = time.monotonic() + slo, "slo"
+
+        pieces: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+        stop = threading.Event()
+
+        def produce():
+            stream = self.llm.stream(prompt)
+            try:
+                for piece in stream:
+                    if stop.is_set() or cancel.cancelled:
+                        break
+                    pieces.put(("piece", piece))
+                pieces.put(("end", None))
+            except Exception as e:
+                pieces.put(("error", e))
+            finally:
+                # Closing the generator drops the HTTP response, and with it the connection
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+
+        unsubscribe = cancel.on_cancel(lambda: pieces.put(("cancelled", None)))
+        threading.Thread(target=produce, name="llm-stream", daemon=True).start()
+        produced = 0
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    kind, value = pieces.get(timeout=timeout)
+                except queue.Empty:
+                    REGISTRY.inc("rag_generations_stopped_total", reason=expiry)
+                    raise GenerationCancelled(expiry)
+                if kind == "end":
+                    return
+                if kind == "error":
+                    raise value
+                if kind == "cancelled":
+                    REGISTRY.inc("rag_generations_stopped_total", reason=cancel.reason)
+                    raise GenerationCancelled(cancel.reason)
+                yield value
+                produced += 1
+                if produced >= self.max_tokens:
+                    REGISTRY.inc("rag_generations_stopped_total", reason="max_tokens")
+                    return
+        finally:
+            stop.set()
+            unsubscribe()
+
+    def _extractive(self, result: Dict, query: str, context_chunks, fallback: str | None = None) -> Dict:
+        with span("extractive"):
+            answer = self.extractor.answer(query, context_chunks)
+        if fallback:
+            REGISTRY.inc("rag_answer_fallbacks_total", reason=fallback)
+        result.update({"answer": answer, "mode": "extractive", "fallback": fallback})
         return result
 
     def format_response(self, result: Dict) -> str:
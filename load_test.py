@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Load Generator for ERP RAG System
+Simulates N concurrent chat users against RAGPipeline or the UI handler
+(scheduler included) and reports throughput, queueing and tail latency.
+
+Usage:
+    python load_test.py --mock --users 1,2,4,8,16 --duration 30
+    python load_test.py --target pipeline --users 8 --base-url http://gpu-box:11434
+    python load_test.py --target http --url http://localhost:8000 --users 1,4,16
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from benchmark import SAMPLE_QUERIES, latency_stats
+from config import Config
+
+BUSY_PREFIX = "### ⏳ SYSTEM BUSY"
+
+
+def run_level(
+    call: Callable[[str], str],
+    users: int,
+    duration: float,
+    think_time: float,
+    scheduler=None,
+) -> Dict:
+    """Drive `users` closed-loop clients for `duration` seconds"""
+    latencies: List[float] = []
+    outcomes = {"ok": 0, "busy": 0, "error": 0}
+    max_depth = 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def user(seed: int):
+        rng = random.Random(seed)
+        while time.perf_counter() < stop_at:
+            query = rng.choice(SAMPLE_QUERIES)
+            start = time.perf_counter()
+            try:
+                outcome = "busy" if call(query).startswith(BUSY_PREFIX) else "ok"
+            except Exception:
+                outcome = "error"
+            elapsed = time.perf_counter() - start
+            with lock:
+                outcomes[outcome] += 1
+                if outcome == "ok":
+                    latencies.append(elapsed)
+            if think_time:
+                time.sleep(rng.expovariate(1.0 / think_time))
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(users)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+
+    # Sample the scheduler queue while the level runs
+    while any(t.is_alive() for t in threads):
+        if scheduler is not None:
+            max_depth = max(max_depth, scheduler.stats()["queue_depth"])
+        time.sleep(0.05)
+    wall = time.perf_counter() - started
+
+    level = {
+        "users": users,
+        "seconds": round(wall, 2),
+        **outcomes,
+        "throughput_rps": round(outcomes["ok"] / wall, 3) if wall else 0.0,
+        "latency": latency_stats(latencies),
+    }
+    if scheduler is not None:
+        stats = scheduler.stats()
+        level["queue"] = {
+            "max_depth": max_depth,
+            "wait_p50_ms": round(stats["wait_p50"] * 1000, 1),
+            "wait_p95_ms": round(stats["wait_p95"] * 1000, 1),
+            "rejected_full": stats["rejected_full"],
+            "rejected_timeout": stats["rejected_timeout"],
+        }
+    return level
+
+
+def saturation_point(levels: List[Dict], gain: float = 0.1) -> int | None:
+    """First user count after which throughput stops growing by more than `gain`"""
+    for prev, cur in zip(levels, levels[1:]):
+        if prev["throughput_rps"] and cur["throughput_rps"] < prev["throughput_rps"] * (1 + gain):
+            return prev["users"]
+    return None
+
+
+def build_pipeline(args):
+    from llm_generation import RAGPipeline
+    from quick_start import load_retriever
+
+    retriever = load_retriever()
+    if retriever is None:
+        raise SystemExit(1)
+    return RAGPipeline(retriever, args.base_url, args.model)
+
+
+def build_target(args, pipeline):
+    """Return (call, scheduler) for the chosen target"""
+    if args.target == "http":
+        import requests
+
+        def call(query: str) -> str:
+            response = requests.post(f"{args.url}/query", json={"question": query, "top_k": args.top_k})
+            if response.status_code == 503:
+                return BUSY_PREFIX
+            response.raise_for_status()
+            return response.json()["answer"]
+
+        return call, None
+
+    if args.target == "pipeline":
+        def call(query: str) -> str:
+            return pipeline.answer_question(query, top_k=args.top_k)["answer"]
+
+        return call, None
+
+    from scheduler import RequestScheduler
+    from ui import RAGInterface
+
+    scheduler = RequestScheduler(
+        max_in_flight=Config.MAX_INFLIGHT_GENERATIONS,
+        max_queue_size=Config.MAX_QUEUE_SIZE,
+        queue_timeout=Config.QUEUE_TIMEOUT_SECONDS,
+    )
+    interface = RAGInterface(pipeline, scheduler)
+    return (lambda query: interface.respond(query, [])), scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the RAG stack")
+    parser.add_argument("--target", choices=["ui", "pipeline", "http"], default="ui")
+    parser.add_argument("--users", default="1,2,4,8,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--url", default=f"http://localhost:{Config.API_PORT}", help="Server for --target http")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per level")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between requests")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--base-url", default=Config.OLLAMA_BASE_URL)
+    parser.add_argument("--model", default=Config.OLLAMA_MODEL)
+    parser.add_argument("--mock", action="store_true", help="Start mock_ollama.py in-process")
+    parser.add_argument("--mock-port", type=int, default=11535)
+    parser.add_argument("--mock-tps", type=float, default=30.0)
+    parser.add_argument("--mock-prefill-ms", type=float, default=200.0)
+    parser.add_argument("--mock-tokens", type=int, default=80)
+    parser.add_argument("--mock-parallel", type=int, default=1)
+    parser.add_argument("--out", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    if args.mock:
+        from mock_ollama import start_mock_ollama
+
+        start_mock_ollama(
+            args.mock_port,
+            model=args.model,
+            prefill_ms=args.mock_prefill_ms,
+            tokens_per_second=args.mock_tps,
+            answer_tokens=args.mock_tokens,
+            parallel=args.mock_parallel,
+        )
+        args.base_url = f"http://127.0.0.1:{args.mock_port}"
+
+    # The http target talks to an already running `quick_start.py serve`
+    pipeline = build_pipeline(args) if args.target != "http" else None
+
+    levels = []
+    for users in [int(u) for u in args.users.split(",")]:
+        print(f"\n▶ {users} concurrent users for {args.duration:.0f}s")
+        # Fresh scheduler per level so queue stats don't bleed across levels
+        call, scheduler = build_target(args, pipeline)
+        level = run_level(call, users, args.duration, args.think_time, scheduler)
+        levels.append(level)
+        latency = level["latency"]
+        print(
+            f"  ✓ {level['throughput_rps']} req/s | ok {level['ok']} busy {level['busy']} "
+            f"err {level['error']} | p50 {latency.get('p50_ms', 0):.0f}ms "
+            f"p95 {latency.get('p95_ms', 0):.0f}ms p99 {latency.get('p99_ms', 0):.0f}ms"
+        )
+
+    saturated = saturation_point(levels)
+    print("\n" + "=" * 60)
+    if saturated:
+        print(f"📈 Throughput saturates at ~{saturated} concurrent users")
+    else:
+        print("📈 No saturation within the tested levels")
+
+    if args.out:
+        report = {"target": args.target, "base_url": args.base_url, "levels": levels,
+                  "saturation_users": saturated}
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
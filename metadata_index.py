@@ -0,0 +1,109 @@
+"""
+Metadata Filter Module
+Precomputed per-value ID bitmaps used as FAISS ID selectors
+"""
+
+from typing import Dict, Iterable, List
+
+import faiss
+import numpy as np
+
+from chunk_store import MISSING, ChunkStore
+
+# Filter keys that map to a chunk metadata field with one bitmap per value
+BITMAP_FIELDS = {
+    "source_file": "source_file",
+    "source": "source_file",
+    "category": "category",
+}
+RANGE_FIELD = "chunk_range"
+
+
+def check_filters(filters: Dict | None):
+    """
+    Raise ValueError for filters select() cannot apply; retrievers call this before
+    a query joins a micro-batch, so a bad filter fails only its own request
+    """
+    for key, wanted in (filters or {}).items():
+        if key == RANGE_FIELD:
+            if (
+                not isinstance(wanted, (list, tuple))
+                or len(wanted) != 2
+                or not all(isinstance(bound, (int, float)) for bound in wanted)
+            ):
+                raise ValueError(f"{RANGE_FIELD} must be [first, last] chunk numbers, got {wanted!r}")
+        elif key not in BITMAP_FIELDS:
+            raise ValueError(
+                f"Unknown filter '{key}'. "
+                f"Use one of: {', '.join(sorted(BITMAP_FIELDS))}, {RANGE_FIELD}"
+            )
+
+
+class Selection:
+    """A FAISS ID selector plus the bitmap memory it points into"""
+
+    def __init__(self, packed: np.ndarray, size: int):
+        self.packed = packed  # must outlive the selector, FAISS holds a raw pointer
+        self.count = int(np.unpackbits(packed, count=size, bitorder="little").sum())
+        self.selector = faiss.IDSelectorBitmap(size, faiss.swig_ptr(packed))
+
+    def search_params(self) -> faiss.SearchParameters:
+        return faiss.SearchParameters(sel=self.selector)
+
+
+class MetadataIndex:
+    """Bitmap index over chunk metadata, aligned with FAISS vector IDs"""
+
+    def __init__(self, store: ChunkStore):
+        """
+        Args:
+            store: Chunk store in FAISS ID order; its columns are already interned codes
+        """
+        self.size = len(store)
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        self.chunk_index = np.maximum(store.ints["chunk_index"], 0)
+
+        for field in set(BITMAP_FIELDS.values()):
+            codes = store.codes[field]
+            self.bitmaps[field] = {
+                (store.strings[code] if code != MISSING else ""): np.packbits(codes == code, bitorder="little")
+                for code in np.unique(codes)
+            }
+
+    def values(self, field: str) -> List[str]:
+        """Distinct values seen for a filterable field"""
+        return sorted(self.bitmaps.get(BITMAP_FIELDS.get(field, field), {}))
+
+    def select(self, filters: Dict) -> Selection | None:
+        """
+        Combine filters into one selection (None when nothing matches)
+
+        Values of one field are OR'ed, different fields are AND'ed, e.g.
+        {"source_file": ["a.pdf", "b.pdf"], "category": "vendor", "chunk_range": (0, 9)}
+        """
+        check_filters(filters)
+        packed = np.full((self.size + 7) // 8, 0xFF, dtype=np.uint8)
+
+        for key, wanted in filters.items():
+            if key == RANGE_FIELD:
+                first, last = wanted
+                mask = (self.chunk_index >= first) & (self.chunk_index <= last)
+                packed &= np.packbits(mask, bitorder="little")
+            else:
+                field_bitmaps = self.bitmaps[BITMAP_FIELDS[key]]
+                field_packed = np.zeros_like(packed)
+                for value in _as_list(wanted):
+                    bitmap = field_bitmaps.get(str(value))
+                    if bitmap is not None:
+                        field_packed |= bitmap
+                packed &= field_packed
+
+        if not packed.any():
+            return None
+        return Selection(packed, self.size)
+
+
+def _as_list(value) -> Iterable:
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return value
+    return [value]
@@ -0,0 +1,252 @@
+"""
+Metrics Module
+Per-stage timing spans, latency histograms and a Prometheus-style endpoint
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# Latency buckets in seconds, from sub-millisecond FAISS lookups to slow generations
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def size_buckets(limit: int) -> Tuple[float, ...]:
+    """Powers of two up to limit (and limit itself), for histograms of item counts"""
+    buckets = []
+    size = 1
+    while size < limit:
+        buckets.append(float(size))
+        size *= 2
+    buckets.append(float(max(limit, 1)))
+    return tuple(buckets)
+
+
+class Histogram:
+    """Cumulative bucket counts plus a recent window for quantiles"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, window: int = 2048):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent: deque = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class MetricsRegistry:
+    """Thread-safe store of histograms, counters and gauges"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._gauges: Dict[Tuple[str, Tuple], Callable[[], float]] = {}
+        self._help: Dict[str, str] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+
+    def describe(self, name: str, help_text: str, buckets: Tuple[float, ...] | None = None):
+        """Set a metric's help text, and for histograms not measured in seconds, its buckets"""
+        self._help[name] = help_text
+        if buckets is not None:
+            with self._lock:
+                self._buckets[name] = buckets
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self._buckets.get(name, DEFAULT_BUCKETS))
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def gauge(self, name: str, fn: Callable[[], float], **labels):
+        """Register a callback read at scrape time"""
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = fn
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Quantiles and counts per histogram, keyed by name{labels}"""
+        with self._lock:
+            return {
+                _series(name, labels): {
+                    "count": h.count,
+                    "mean": h.total / h.count if h.count else 0.0,
+                    **{f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES},
+                }
+                for (name, labels), h in self._histograms.items()
+            }
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+
+            seen = set()
+            for (name, labels), h in histograms:
+                if name not in seen:
+                    seen.add(name)
+                    self._header(lines, name, "histogram")
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f"{_series(name + '_bucket', labels + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{_series(name + '_bucket', labels + (('le', '+Inf'),))} {h.count}")
+                lines.append(f"{_series(name + '_sum', labels)} {h.total}")
+                lines.append(f"{_series(name + '_count', labels)} {h.count}")
+
+            seen.clear()
+            for (name, labels), h in histograms:
+                quantile_name = name + "_quantile"
+                if quantile_name not in seen:
+                    seen.add(quantile_name)
+                    self._header(lines, quantile_name, "gauge")
+                for q in QUANTILES:
+                    lines.append(
+                        f"{_series(quantile_name, labels + (('quantile', str(q)),))} {h.quantile(q)}"
+                    )
+
+            for (name, labels), value in counters:
+                if name not in seen:
+                    seen.add(name)
+                    self._header(lines, name, "counter")
+                lines.append(f"{_series(name, labels)} {value}")
+
+        # Gauge callbacks may take their own locks, so call them unlocked
+        for (name, labels), fn in gauges:
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            if name not in seen:
+                seen.add(name)
+                self._header(lines, name, "gauge")
+            lines.append(f"{_series(name, labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, kind: str):
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+def _series(name: str, labels: Tuple) -> str:
+    if not labels:
+        return name
+    inner = ",".join(f'{key}="{value}"' for key, value in labels)
+    return f"{name}{{{inner}}}"
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("rag_stage_seconds", "Latency of each retrieval and generation stage")
+
+_current_timer: contextvars.ContextVar = contextvars.ContextVar("rag_stage_timer", default=None)
+
+
+class StageTimer:
+    """Collects the per-stage timing breakdown of one request"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY):
+        self.registry = registry
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def activate(self) -> Iterator["StageTimer"]:
+        """Make spans opened anywhere below this call record into this timer"""
+        token = _current_timer.set(self)
+        try:
+            yield self
+        finally:
+            _current_timer.reset(token)
+
+    def record(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        self.registry.observe("rag_stage_seconds", seconds, stage=stage)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Stage timings in milliseconds"""
+        return {stage: round(seconds * 1000, 2) for stage, seconds in self.timings.items()}
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a block into the active StageTimer (or straight into REGISTRY)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def record(stage: str, seconds: float):
+    """Record an externally measured stage duration"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.record(stage, seconds)
+    else:
+        REGISTRY.observe("rag_stage_seconds", seconds, stage=stage)
+
+
+def attribute(timings: Dict[str, float]):
+    """Add stage times measured on another thread (e.g. a shared batch) to the active timer only"""
+    timer = _current_timer.get()
+    if timer is not None:
+        # REGISTRY already observed them once, where they were measured
+        for stage, seconds in timings.items():
+            timer.timings[stage] = timer.timings.get(stage, 0.0) + seconds
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = 9090, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve REGISTRY at http://host:port/metrics from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"✓ Metrics endpoint: http://localhost:{port}/metrics")
+    return server
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Mock Ollama Server
+Speaks the /api/tags, /api/generate and /api/chat endpoints (streaming and
+non-streaming) with configurable prefill latency and decode speed, so the
+stack can be load-tested without a real model.
+
+Usage:
+    python mock_ollama.py --port 11434 --tokens-per-second 30 --prefill-ms 300
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List
+
+FILLER = (
+    "According to the ERP documentation the request must be approved by the "
+    "department head before it is submitted to finance [Source 1]. "
+).split()
+
+
+class MockOllamaConfig:
+    """Latency model of the simulated backend"""
+
+    def __init__(
+        self,
+        model: str = "llama3.2",
+        prefill_ms: float = 200.0,
+        prefill_tokens_per_second: float = 2000.0,
+        tokens_per_second: float = 30.0,
+        answer_tokens: int = 80,
+        parallel: int = 1,
+        prefix_cache: bool = True,
+    ):
+        """
+        Args:
+            model: Model name reported by /api/tags
+            prefill_ms: Fixed time before the first token
+            prefill_tokens_per_second: Extra prompt-processing speed (prompt length matters)
+            tokens_per_second: Decode speed
+            answer_tokens: Tokens generated per request (capped by num_predict)
+            parallel: Requests decoded at once, like OLLAMA_NUM_PARALLEL; others queue
+            prefix_cache: Skip prefill for the prompt prefix shared with a recent request,
+                like Ollama reusing a slot's KV cache
+        """
+        self.model = model
+        self.prefill_ms = prefill_ms
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.parallel = parallel
+        self.slots = threading.BoundedSemaphore(parallel)
+        self.prefix_cache = prefix_cache
+        # One remembered prompt per slot
+        self._recent: "deque[List[str]]" = deque(maxlen=parallel)
+        self._cache_lock = threading.Lock()
+
+    def cached_prefix(self, words: List[str]) -> int:
+        """Words at the start of `words` already prefilled by a recent request"""
+        with self._cache_lock:
+            best = 0
+            if self.prefix_cache:
+                for recent in self._recent:
+                    n = 0
+                    for a, b in zip(recent, words):
+                        if a != b:
+                            break
+                        n += 1
+                    best = max(best, n)
+            self._recent.append(words)
+            return best
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    config: MockOllamaConfig = MockOllamaConfig()
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(
+                {
+                    "models": [
+                        {
+                            "name": f"{self.config.model}:latest",
+                            "model": f"{self.config.model}:latest",
+                            "size": 0,
+                            "details": {"family": "mock"},
+                        }
+                    ]
+                }
+            )
+        elif self.path == "/api/version":
+            self._send_json({"version": "mock"})
+        elif self.path == "/":
+            self._send_text("Ollama is running")
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self.send_error(400, "invalid JSON")
+            return
+
+        if self.path == "/api/generate":
+            # The system prompt comes first in the rendered template, as in Ollama
+            words = (body.get("system") or "").split() + (body.get("prompt") or "").split()
+            self._generate(body, words, chat=False)
+        elif self.path == "/api/chat":
+            words = " ".join(m.get("content", "") for m in body.get("messages", [])).split()
+            self._generate(body, words, chat=True)
+        else:
+            self.send_error(404)
+
+    def _generate(self, body: Dict, words: List[str], chat: bool):
+        cfg = self.config
+        stream = body.get("stream", True)
+        num_predict = (body.get("options") or {}).get("num_predict") or cfg.answer_tokens
+        if num_predict < 0:
+            num_predict = cfg.answer_tokens
+        n_tokens = min(cfg.answer_tokens, num_predict)
+        start = time.perf_counter()
+        with cfg.slots:
+            load_start = time.perf_counter()
+            cached = cfg.cached_prefix(words)
+            prompt_tokens = max(1, int((len(words) - cached) * 1.3))
+            prefill = cfg.prefill_ms / 1000 + prompt_tokens / cfg.prefill_tokens_per_second
+            time.sleep(prefill)
+
+            tokens = self._tokens(n_tokens)
+            decode_start = time.perf_counter()
+            if stream:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for token in tokens:
+                        self._write_chunk(self._message(body, token, chat, done=False))
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client went away: stop decoding and free the slot, like Ollama
+                    return
+                produced = n_tokens
+            else:
+                text = "".join(tokens)
+                produced = n_tokens
+            decode_end = time.perf_counter()
+
+        final = self._message(body, "" if stream else text, chat, done=True)
+        final.update(
+            {
+                "done_reason": "length" if num_predict < cfg.answer_tokens else "stop",
+                "total_duration": int((decode_end - start) * 1e9),
+                "load_duration": int((load_start - start) * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prefill * 1e9),
+                "eval_count": produced,
+                "eval_duration": int((decode_end - decode_start) * 1e9),
+            }
+        )
+
+        try:
+            if stream:
+                self._write_chunk(final)
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                self._send_json(final)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _tokens(self, n_tokens: int) -> Iterator[str]:
+        delay = 1.0 / self.config.tokens_per_second
+        for i in range(n_tokens):
+            time.sleep(delay)
+            yield FILLER[i % len(FILLER)] + " "
+
+    def _message(self, body: Dict, text: str, chat: bool, done: bool) -> Dict:
+        message = {
+            "model": body.get("model", self.config.model),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": done,
+        }
+        if chat:
+            message["message"] = {"role": "assistant", "content": text}
+        else:
+            message["response"] = text
+        return message
+
+    def _write_chunk(self, payload: Dict):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, payload: Dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_text(self, text: str):
+        data = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_ollama(port: int = 11434, host: str = "127.0.0.1", **config) -> ThreadingHTTPServer:
+    """Start the mock server on a daemon thread and return it"""
+    handler = type("ConfiguredMockOllamaHandler", (MockOllamaHandler,), {})
+    handler.config = MockOllamaConfig(**config)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-ollama", daemon=True).start()
+    print(f"✓ Mock Ollama listening on http://{host}:{server.server_port}")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", default="llama3.2")
+    parser.add_argument("--prefill-ms", type=float, default=200.0)
+    parser.add_argument("--prefill-tps", type=float, default=2000.0)
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--answer-tokens", type=int, default=80)
+    parser.add_argument("--parallel", type=int, default=1)
+    parser.add_argument("--no-prefix-cache", action="store_true", help="Always prefill the full prompt")
+    args = parser.parse_args()
+
+    server = start_mock_ollama(
+        args.port,
+        args.host,
+        model=args.model,
+        prefill_ms=args.prefill_ms,
+        prefill_tokens_per_second=args.prefill_tps,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        parallel=args.parallel,
+        prefix_cache=not args.no_prefix_cache,
+    )
+    print("💡 SHUTDOWN: Ctrl+C")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Profiling Module
+Opt-in cProfile/tracemalloc capture of single requests and index builds,
+sampled so it can stay enabled in production
+"""
+
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from config import Config
+from metrics import REGISTRY
+
+# Set while a capture runs, so nested hooks (retrieve inside answer) don't start another
+_capturing: contextvars.ContextVar = contextvars.ContextVar("rag_profiling", default=False)
+
+
+def active() -> bool:
+    """True inside a capture (e.g. to skip work hand-offs the profile would not see)"""
+    return _capturing.get()
+
+
+class Capture:
+    """Handle yielded by Profiler.capture; `path` is set once a profile was written"""
+
+    def __init__(self):
+        self.path: Path | None = None
+
+
+class Profiler:
+    """Writes a .prof (pstats) and a readable .txt summary per captured call"""
+
+    def __init__(
+        self,
+        output_dir: str,
+        sample_rate: float = 0.0,
+        kinds: Iterable[str] = (),
+        memory: bool = False,
+        top: int = 30,
+    ):
+        """
+        Args:
+            output_dir: Where profiles are written
+            sample_rate: Fraction of calls of every kind that are captured (0 = only forced ones)
+            kinds: Kinds captured on every call ("answer", "retrieve", "ingest", "index")
+            memory: Also trace allocations with tracemalloc (much slower; opt in separately)
+            top: Functions and allocation sites listed in the .txt summary
+        """
+        self.output_dir = Path(output_dir)
+        self.sample_rate = sample_rate
+        self.kinds = set(kinds)
+        self.memory = memory
+        self.top = top
+        self._tracing = 0
+        self._lock = threading.Lock()
+        REGISTRY.describe("rag_profiles_total", "Profiles captured by kind")
+
+    def wanted(self, kind: str, force: bool = False) -> bool:
+        if _capturing.get():
+            return False
+        return force or kind in self.kinds or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def capture(self, kind: str, name: str, force: bool = False) -> Iterator[Capture]:
+        """Profile the block if forced, its kind is enabled or it is sampled"""
+        handle = Capture()
+        if not self.wanted(kind, force):
+            yield handle
+            return
+
+        profile = cProfile.Profile()
+        baseline = self._start_memory()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one cProfile per process; another capture is running
+            if baseline is not None:
+                self._stop_memory()
+            yield handle
+            return
+
+        token = _capturing.set(True)
+        start = time.perf_counter()
+        try:
+            yield handle
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - start
+            _capturing.reset(token)
+            snapshot = self._stop_memory() if baseline is not None else None
+            try:
+                handle.path = self._write(kind, name, profile, elapsed, baseline, snapshot)
+                REGISTRY.inc("rag_profiles_total", kind=kind)
+            except OSError as e:
+                print(f"⚠️  Could not write {kind} profile: {e}")
+
+    def _start_memory(self):
+        if not self.memory:
+            return None
+        with self._lock:
+            # tracemalloc is process-wide: the first capture starts it, the last stops it
+            if self._tracing == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+            self._tracing += 1
+        return tracemalloc.take_snapshot()
+
+    def _stop_memory(self):
+        snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            self._tracing -= 1
+            if self._tracing == 0:
+                tracemalloc.stop()
+        return snapshot
+
+    def _write(self, kind, name, profile, elapsed, baseline, snapshot) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        safe_name = re.sub(r"[^\w.-]", "_", name)[:80]
+        base = self.output_dir / f"{stamp}-{kind}-{safe_name}"
+
+        profile.dump_stats(f"{base}.prof")
+
+        out = io.StringIO()
+        out.write(f"{kind} {name}: {elapsed * 1000:.1f} ms (pid {os.getpid()})\n\n")
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(self.top)
+        if snapshot is not None:
+            out.write("Top allocations during the call:\n")
+            for stat in snapshot.compare_to(baseline, "lineno")[: self.top]:
+                out.write(f"  {stat}\n")
+        Path(f"{base}.txt").write_text(out.getvalue(), encoding="utf-8")
+        print(f"📈 Profile written: {base}.txt")
+        return Path(f"{base}.prof")
+
+
+PROFILER = Profiler(
+    Config.PROFILE_DIR,
+    sample_rate=Config.PROFILE_SAMPLE_RATE,
+    kinds=Config.PROFILE_KINDS,
+    memory=Config.PROFILE_MEMORY,
+)
@@ -4,6 +4,7 @@ Quick Start Runner for ERP RAG System
 Complete automation of setup, indexing, and launch
 """
 
+import os
 import sys
 import subprocess
 import time
@@ -11,11 +12,12 @@ from pathlib import Path
 
 
 def check_ollama():
-    """Check if Ollama server is running"""
+    """Check if Ollama server (or mock_ollama.py) is running"""
     import requests
+    from config import Config
 
     try:
-        r = requests.get("http://localhost:11434/api/tags", timeout=2)
+        r = requests.get(f"{Config.OLLAMA_BASE_URL}/api/tags", timeout=2)
         return r.status_code == 200
     except Exception:
         return False
@@ -42,6 +44,17 @@ def start_ollama():
 
 def check_model(model: str = "llama3.2"):
     """Check if Ollama model is installed"""
+    import requests
+    from config import Config
+
+    # Ask the server first so remote and mock backends work without the CLI
+    try:
+        r = requests.get(f"{Config.OLLAMA_BASE_URL}/api/tags", timeout=2)
+        names = [m.get("name", "") for m in r.json().get("models", [])]
+        return any(name == model or name.split(":")[0] == model for name in names)
+    except Exception:
+        pass
+
     try:
         result = subprocess.run(
             ["ollama", "list"],
@@ -107,41 +120,178 @@ def create_samples():
 
 
 def run_indexing():
-    """Index documents"""
+    """Index documents (resumes from the last checkpoint if a build was interrupted)"""
     from config import Config
-    from ingestion import DocumentIngester, DocumentChunker
-    from embeddings_store import RAGRetriever
+    from index_build import CheckpointedIndexBuild
 
     Config.create_directories()
 
-    print("Step 1: Ingesting documents")
-    ingester = DocumentIngester(str(Config.RAW_DATA_DIR))
-    docs = ingester.ingest_all()
-    if not docs:
-        print("❌ No documents found. Add documents to data/raw and try again.")
+    build = CheckpointedIndexBuild(
+        str(Config.RAW_DATA_DIR),
+        str(Config.EMBEDDINGS_DIR),
+        str(Config.INDEX_CHECKPOINT_DIR),
+        Config.EMBEDDING_MODEL,
+        part_size=Config.INDEX_CHECKPOINT_CHUNKS,
+    )
+    summary = build.run()
+    if summary is None:
         return False
 
-    print("Step 2: Chunking documents")
-    chunker = DocumentChunker(Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
-    chunks = chunker.chunk_documents(docs)
+    print(f"✓ Indexing complete ({summary['files']} files, {summary['chunks']} chunks)")
+    return True
 
-    print("Step 3: Building FAISS index")
-    retriever = RAGRetriever(Config.EMBEDDING_MODEL)
-    retriever.index_documents(chunks)
-    retriever.save(str(Config.EMBEDDINGS_DIR))
 
-    print(f"✓ Indexing complete ({len(docs)} docs, {len(chunks)} chunks)")
-    return True
+def run_watch():
+    """Keep the index in sync with data/raw until interrupted"""
+    from config import Config
+    from indexer_daemon import IndexerDaemon
+
+    Config.create_directories()
+    daemon = IndexerDaemon(
+        str(Config.RAW_DATA_DIR),
+        str(Config.EMBEDDINGS_DIR),
+        str(Config.INDEXER_CACHE_DIR),
+        Config.EMBEDDING_MODEL,
+        poll_interval=Config.INDEXER_POLL_SECONDS,
+        debounce=Config.INDEXER_DEBOUNCE_SECONDS,
+    )
+    try:
+        daemon.run_forever()
+    except KeyboardInterrupt:
+        daemon.stop()
+        print("\n✓ Indexer stopped")
+
+
+def run_embed_server():
+    """Keep one embedding model warm for every other process on this machine"""
+    from config import Config
+    from embedding_service import DEFAULT_ADDRESS, EmbeddingServer
+    from embeddings_store import load_embeddings
+
+    server = EmbeddingServer(
+        load_embeddings(Config.EMBEDDING_MODEL, service=""),
+        Config.EMBEDDING_MODEL,
+        Config.EMBEDDING_SERVICE or DEFAULT_ADDRESS,
+        max_batch=Config.EMBEDDING_SERVICE_MAX_BATCH,
+        max_wait=Config.EMBEDDING_SERVICE_MAX_WAIT_MS / 1000,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n✓ Embedding service stopped")
+
+
+def run_shard_server(args):
+    """Serve one index directory (args: index_dir address), or every shard of the published index locally"""
+    from config import Config
+    from distributed_search import ShardServer
+    from index_versions import IndexVersions
+    from sharding import SHARDS_SUBDIR, ShardedRetriever
+
+    if len(args) == 2:
+        try:
+            ShardServer(args[0], args[1]).serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    root = IndexVersions(str(Config.EMBEDDINGS_DIR)).current_path() or Config.EMBEDDINGS_DIR
+    if ShardedRetriever.exists(str(root)):
+        index_dirs = sorted(p for p in (root / SHARDS_SUBDIR).iterdir() if p.is_dir())
+    else:
+        index_dirs = [root]
+
+    # One process per shard, as they would run on separate machines
+    addresses = [f"127.0.0.1:{Config.SHARD_SERVER_PORT + i}" for i in range(len(index_dirs))]
+    procs = [
+        subprocess.Popen([sys.executable, __file__, "shard-server", str(index_dir), address])
+        for index_dir, address in zip(index_dirs, addresses)
+    ]
+    print(f"Use them with: SHARD_SERVERS={','.join(addresses)} python quick_start.py serve")
+    try:
+        for proc in procs:
+            proc.wait()
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.terminate()
+        print("\n✓ Shard servers stopped")
+
+
+def load_retriever():
+    """Load the published index version (flat or sharded), or None if there is none"""
+    from config import Config
+    from index_versions import HotSwapRetriever
+
+    if Config.SHARD_SERVERS:
+        from distributed_search import DistributedRetriever
+
+        print(f"Searching {len(Config.SHARD_SERVERS)} shard servers: {', '.join(Config.SHARD_SERVERS)}")
+        return DistributedRetriever(
+            Config.SHARD_SERVERS,
+            Config.EMBEDDING_MODEL,
+            shard_timeout=Config.SHARD_TIMEOUT_SECONDS,
+            query_batch_size=Config.QUERY_BATCH_SIZE,
+            query_batch_wait=Config.QUERY_BATCH_WAIT_MS / 1000,
+        )
+
+    print("Loading vector store...")
+    try:
+        return HotSwapRetriever(str(Config.EMBEDDINGS_DIR), Config.EMBEDDING_MODEL)
+    except Exception:
+        print("❌ Index not found. Run index first.")
+        return None
+
+
+def build_pipeline(retriever):
+    """RAGPipeline configured from Config, with the answer cache and query log"""
+    from cache_warming import AnswerCache, QueryLog
+    from config import Config
+    from llm_generation import RAGPipeline
+
+    return RAGPipeline(
+        retriever,
+        Config.OLLAMA_BASE_URL,
+        Config.OLLAMA_MODEL,
+        keep_alive=Config.OLLAMA_KEEP_ALIVE,
+        answer_mode=Config.ANSWER_MODE,
+        generation_slo=Config.GENERATION_SLO_SECONDS,
+        retry_after=Config.BACKEND_RETRY_SECONDS,
+        answer_cache=(
+            AnswerCache(Config.ANSWER_CACHE_SIZE, Config.ANSWER_CACHE_SECONDS)
+            if Config.ANSWER_CACHE_SIZE else None
+        ),
+        query_log=QueryLog(Config.QUERY_LOG_FILE, Config.QUERY_LOG_MAX_BYTES),
+        max_tokens=Config.MAX_GENERATION_TOKENS,
+        generation_timeout=Config.GENERATION_TIMEOUT_SECONDS,
+        single_flight=Config.SINGLE_FLIGHT,
+    )
+
+
+def start_cache_warming(pipeline, scheduler, top_k: int):
+    """Answer the hot queries in the background so the first users don't pay cold-start latency"""
+    from cache_warming import QUICK_ACCESS_QUESTIONS, CacheWarmer, hot_queries
+    from config import Config
+
+    if not Config.WARM_CACHE:
+        return
+    queries = hot_queries(
+        Config.WARM_QUERIES or QUICK_ACCESS_QUESTIONS, pipeline.query_log, Config.WARM_FROM_LOG
+    )
+    print(f"🔥 Warming caches with {len(queries)} hot queries in the background")
+    CacheWarmer(pipeline, queries, scheduler, top_k=top_k).start()
 
 
 def run_demo():
     """Launch UI"""
     from config import Config
-    from embeddings_store import RAGRetriever
-    from llm_generation import RAGPipeline
+    from metrics import start_metrics_server
+    from scheduler import RequestScheduler
+    from serving import start_api_server
     from ui import RAGInterface
 
-    if not start_ollama():
+    # Without an LLM the demo can still serve extractive answers
+    llm_required = Config.ANSWER_MODE == "generate"
+    if not start_ollama() and llm_required:
         return False
 
     if not check_model(Config.OLLAMA_MODEL):
@@ -149,25 +299,85 @@ def run_demo():
             f"❌ Model {Config.OLLAMA_MODEL} not found. Pull with: "
             f"ollama pull {Config.OLLAMA_MODEL}"
         )
-        return False
+        if llm_required:
+            return False
 
-    print("Loading vector store...")
-    retriever = RAGRetriever(Config.EMBEDDING_MODEL)
-    try:
-        retriever.load(str(Config.EMBEDDINGS_DIR))
-    except Exception:
-        print("❌ Index not found. Run index first.")
+    retriever = load_retriever()
+    if retriever is None:
         return False
 
-    pipeline = RAGPipeline(retriever, Config.OLLAMA_BASE_URL, Config.OLLAMA_MODEL)
-    interface = RAGInterface(pipeline)
+    # Shard servers load their own index; only a local index is hot-swapped here
+    if Config.INDEX_RELOAD_SECONDS and hasattr(retriever, "start_watching"):
+        retriever.start_watching(Config.INDEX_RELOAD_SECONDS)
+
+    pipeline = build_pipeline(retriever)
+    scheduler = RequestScheduler(
+        max_in_flight=Config.MAX_INFLIGHT_GENERATIONS,
+        max_queue_size=Config.MAX_QUEUE_SIZE,
+        queue_timeout=Config.QUEUE_TIMEOUT_SECONDS,
+    )
+    start_cache_warming(pipeline, scheduler, Config.UI_TOP_K)
+    if Config.METRICS_PORT:
+        start_metrics_server(Config.METRICS_PORT)
+    if Config.API_PORT:
+        # Same pipeline, caches and generation slots as the UI
+        start_api_server(pipeline, scheduler, Config.API_PORT)
+    interface = RAGInterface(pipeline, scheduler)
     interface.launch(Config.UI_PORT)
     return True
 
 
+def run_serve():
+    """Serve the JSON query API from several worker processes"""
+    import shutil
+    import tempfile
+
+    from config import Config
+    from metrics import start_metrics_server
+    from scheduler import RequestScheduler, SharedSlots
+    from serving import WorkerPool
+
+    start_ollama()
+
+    # Loaded once before forking: workers share the model and the mmap'd index
+    retriever = load_retriever()
+    if retriever is None:
+        return False
+
+    workers = Config.SERVE_WORKERS or os.cpu_count() or 1
+    # Created before forking: MAX_INFLIGHT_GENERATIONS caps generations across all workers
+    slots_dir = tempfile.mkdtemp(prefix="rag-generation-slots-")
+    shared_slots = SharedSlots(slots_dir, Config.MAX_INFLIGHT_GENERATIONS)
+
+    def build_worker(slot: int):
+        if Config.INDEX_RELOAD_SECONDS and hasattr(retriever, "start_watching"):
+            retriever.start_watching(Config.INDEX_RELOAD_SECONDS)
+        if Config.METRICS_PORT:
+            start_metrics_server(Config.METRICS_PORT + 1 + slot)
+        pipeline = build_pipeline(retriever)
+        # Any worker may use every slot of the shared Ollama backend, but only one at a time
+        scheduler = RequestScheduler(
+            max_in_flight=Config.MAX_INFLIGHT_GENERATIONS,
+            max_queue_size=Config.MAX_QUEUE_SIZE,
+            queue_timeout=Config.QUEUE_TIMEOUT_SECONDS,
+            shared_slots=shared_slots,
+        )
+        # One warm-up per restart: the Ollama model and index pages are shared by every
+        # worker, and N warm-ups at once would crowd out real traffic for the backend
+        if slot == 0:
+            start_cache_warming(pipeline, scheduler, Config.DEFAULT_TOP_K)
+        return {"pipeline": pipeline, "scheduler": scheduler}
+
+    try:
+        WorkerPool(build_worker, Config.API_PORT, workers).serve_forever()
+    finally:
+        shutil.rmtree(slots_dir, ignore_errors=True)
+    return True
+
+
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python quick_start.py [setup|index|demo|all]")
+        print("Usage: python quick_start.py [setup|index|watch|demo|serve|embed-server|shard-server|all]")
         return
 
     cmd = sys.argv[1].lower()
@@ -177,8 +387,16 @@ def main():
             create_samples()
         elif cmd == "index":
             run_indexing()
+        elif cmd == "watch":
+            run_watch()
         elif cmd == "demo":
             run_demo()
+        elif cmd == "serve":
+            run_serve()
+        elif cmd == "embed-server":
+            run_embed_server()
+        elif cmd == "shard-server":
+            run_shard_server(sys.argv[2:])
         elif cmd == "all":
             # Agar tumhe sample docs nahi chahiye to create_samples() ko comment kar sakti ho
             create_samples()
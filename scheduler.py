@@ -0,0 +1,238 @@
+"""
+Request Scheduler Module
+Admission control and bounded queueing in front of answer generation
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+from cancellation import CancelToken, GenerationCancelled
+from metrics import REGISTRY
+
+try:
+    import fcntl
+except ImportError:  # Windows: no forked workers, so nothing to share slots with
+    fcntl = None
+
+
+class SchedulerBusy(RuntimeError):
+    """Raised when a request is rejected by admission control"""
+
+    def __init__(self, reason: str, queue_depth: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.queue_depth = queue_depth
+
+
+class SharedSlots:
+    """
+    Generation slots shared by forked worker processes: one lock file per slot,
+    held with flock() while a generation runs. The kernel drops the lock when its
+    holder exits, so a crashed worker cannot leak a slot.
+    """
+
+    def __init__(self, directory: str, count: int, poll_interval: float = 0.01):
+        """
+        Args:
+            directory: Where the lock files live; create it before forking
+            count: Generations allowed across all processes at once
+            poll_interval: Seconds between attempts while every slot is taken
+        """
+        if fcntl is None:
+            raise RuntimeError("Shared generation slots need fcntl (Linux or macOS)")
+        if count < 1:
+            raise ValueError("count must be at least 1")
+
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self.paths = [str(Path(directory) / f"slot-{i}.lock") for i in range(count)]
+        self.poll_interval = poll_interval
+
+    def acquire(self, timeout: float) -> int | None:
+        """File descriptor holding a free slot, or None if none freed up in time"""
+        deadline = time.monotonic() + timeout
+        # Own descriptors per call: flock() does not exclude threads sharing one
+        fds = [os.open(path, os.O_RDWR | os.O_CREAT, 0o600) for path in self.paths]
+        try:
+            while True:
+                for fd in fds:
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                    fds.remove(fd)
+                    return fd
+                if time.monotonic() >= deadline:
+                    return None
+                time.sleep(self.poll_interval)
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def release(self, fd: int):
+        os.close(fd)  # Closing the descriptor drops its lock
+
+
+class RequestScheduler:
+    """Bounded FIFO queue with a cap on concurrent generations"""
+
+    def __init__(
+        self,
+        max_in_flight: int = 2,
+        max_queue_size: int = 16,
+        queue_timeout: float = 30.0,
+        stats_window: int = 1000,
+        shared_slots: SharedSlots | None = None,
+    ):
+        """
+        Args:
+            max_in_flight: Requests allowed to run against the LLM at once
+            max_queue_size: Requests allowed to wait for a free slot
+            queue_timeout: Queue-time SLO in seconds; waiting longer is rejected
+            stats_window: Number of recent wait times kept for percentiles
+            shared_slots: Slots of a backend shared with other processes; admitted
+                requests also take one of these (within the same queue timeout)
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        if max_queue_size < 0:
+            raise ValueError("max_queue_size must not be negative")
+
+        self.max_in_flight = max_in_flight
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self.shared_slots = shared_slots
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._next_ticket = 0
+        self._serving_ticket = 0
+        self._abandoned: set = set()
+
+        self._admitted = 0
+        self._rejected_full = 0
+        self._rejected_timeout = 0
+        self._wait_times: deque = deque(maxlen=stats_window)
+
+        REGISTRY.describe("rag_queue_wait_seconds", "Time requests spent queued before generation")
+        REGISTRY.gauge("rag_queue_depth", lambda: self._waiting)
+        REGISTRY.gauge("rag_generations_in_flight", lambda: self._in_flight)
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn once a slot is free, or raise SchedulerBusy. A CancelToken passed
+        as cancel= (and on to fn) gives up the queue place as soon as it is
+        cancelled, raising GenerationCancelled.
+        """
+        start = time.perf_counter()
+        cancel = kwargs.get("cancel")
+        unsubscribe = cancel.on_cancel(self._wake) if isinstance(cancel, CancelToken) else None
+
+        with self._cond:
+            # Fast reject: every slot is busy and the queue is already full
+            if self._in_flight >= self.max_in_flight and self._waiting >= self.max_queue_size:
+                self._rejected_full += 1
+                REGISTRY.inc("rag_requests_rejected_total", reason="queue_full")
+                raise SchedulerBusy("queue full", self._waiting)
+
+            # Tickets keep admission FIFO so late arrivals can't jump the queue
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._waiting += 1
+            deadline = start + self.queue_timeout
+
+            try:
+                while ticket != self._serving_ticket or self._in_flight >= self.max_in_flight:
+                    if unsubscribe is not None:
+                        cancel.check()
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._rejected_timeout += 1
+                        REGISTRY.inc("rag_requests_rejected_total", reason="queue_timeout")
+                        raise SchedulerBusy("queue timeout", self._waiting)
+                    self._cond.wait(remaining)
+            except (SchedulerBusy, GenerationCancelled):
+                self._abandon_ticket(ticket)
+                raise
+            finally:
+                self._waiting -= 1
+                if unsubscribe is not None:
+                    unsubscribe()
+
+            self._serving_ticket += 1
+            self._skip_abandoned()
+            self._in_flight += 1
+            # Let the next ticket holder re-check if there's still a free slot
+            self._cond.notify_all()
+
+        try:
+            shared = None
+            if self.shared_slots is not None:
+                # Other workers' generations count against the same backend
+                shared = self.shared_slots.acquire(max(0.0, deadline - time.perf_counter()))
+                if shared is None:
+                    with self._cond:
+                        self._rejected_timeout += 1
+                    REGISTRY.inc("rag_requests_rejected_total", reason="queue_timeout")
+                    raise SchedulerBusy("queue timeout", self._waiting)
+
+            with self._cond:
+                self._admitted += 1
+                waited = time.perf_counter() - start
+                self._wait_times.append(waited)
+            REGISTRY.observe("rag_queue_wait_seconds", waited)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if shared is not None:
+                    self.shared_slots.release(shared)
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _abandon_ticket(self, ticket: int):
+        """Mark a timed-out ticket so the queue doesn't stall on it"""
+        self._abandoned.add(ticket)
+        self._skip_abandoned()
+        self._cond.notify_all()
+
+    def _skip_abandoned(self):
+        while self._serving_ticket in self._abandoned:
+            self._abandoned.discard(self._serving_ticket)
+            self._serving_ticket += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Snapshot of queue depth, load and wait-time metrics"""
+        with self._cond:
+            waits = sorted(self._wait_times)
+            snapshot = {
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "max_queue_size": self.max_queue_size,
+                "admitted": self._admitted,
+                "rejected_full": self._rejected_full,
+                "rejected_timeout": self._rejected_timeout,
+            }
+
+        snapshot["wait_avg"] = sum(waits) / len(waits) if waits else 0.0
+        snapshot["wait_p50"] = _percentile(waits, 0.50)
+        snapshot["wait_p95"] = _percentile(waits, 0.95)
+        snapshot["wait_max"] = waits[-1] if waits else 0.0
+        return snapshot
+
+
+def _percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
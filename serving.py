@@ -0,0 +1,370 @@
+"""
+Serving Module
+JSON query API for programmatic clients, served in-process or from
+pre-forked workers behind one port; the index and chunk store are
+memory-mapped, so workers share their pages
+"""
+
+import itertools
+import json
+import os
+import select
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+from cancellation import CancelToken, GenerationCancelled
+from scheduler import RequestScheduler, SchedulerBusy
+
+MAX_BATCH = 64
+# Largest top_k a request may ask for (0 would also crash the FAISS search)
+MAX_TOP_K = 50
+# How often a waiting request checks whether its client hung up
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    JSON API around RAGPipeline:
+        POST /query          {"question", "top_k", "filters", "mode", "request_id", "profile", "session"}
+        POST /query/batch    {"questions": [question or query object, ...], "top_k", "mode"}
+        POST /query/stream   same body as /query (minus "profile"); NDJSON events from stream_answer
+        GET  /health         the process is up
+        GET  /ready          an index is loaded (503 otherwise), plus LLM backend state
+    """
+
+    pipeline = None
+    scheduler: RequestScheduler | None = None
+    batch_parallelism = 4
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/health":
+            self._send_json(200, {"status": "ok", "worker": os.getpid()})
+        elif path == "/ready":
+            ready, status = self._readiness()
+            self._send_json(200 if ready else 503, status)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        if path not in ("/query", "/query/batch", "/query/stream"):
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            body = self._read_json()
+            if path == "/query/batch":
+                queries = self._batch_queries(body)
+            else:
+                question, kwargs = self._query_args(body)
+        except (KeyError, TypeError, ValueError) as e:
+            self._send_json(400, {"error": f"bad request: {e}"})
+            return
+
+        # Generations for a client that hung up are stopped, queued or not
+        client, replied = CancelToken(), threading.Event()
+        self._watch_client(client, replied)
+        try:
+            if path == "/query":
+                status, payload = self._answer(question, kwargs, client.child())
+                self._send_json(status, payload)
+            elif path == "/query/batch":
+                # Items beyond the parallelism wait in the pool, not in the scheduler queue
+                with ThreadPoolExecutor(max_workers=self._batch_parallelism()) as pool:
+                    answers = list(pool.map(lambda query: self._answer(*query, client.child()), queries))
+                self._send_json(200, {"results": [payload for _, payload in answers]})
+            else:
+                kwargs.pop("profile")
+                self._stream(question, {**kwargs, "cancel": client.child()})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client went away before the reply
+        finally:
+            replied.set()
+
+    def _answer(self, question: str, kwargs: Dict, cancel: CancelToken | None = None) -> Tuple[int, Dict]:
+        try:
+            # Cached and in-flight questions are answered without entering the generation queue
+            result = self.pipeline.answer_question(question, cancel=cancel, admit=self._admit, **kwargs)
+        except SchedulerBusy as e:
+            return 503, {"error": "busy", "reason": e.reason, "queue_depth": e.queue_depth}
+        except GenerationCancelled as e:
+            return 409, {"error": "cancelled", "reason": e.reason}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": str(e)}
+        result["worker"] = os.getpid()
+        return 200, result
+
+    def _stream(self, question: str, kwargs: Dict):
+        """Newline-delimited JSON events, written as they are produced"""
+        events = self.pipeline.stream_answer(question, admit=self._admit, **kwargs)
+        try:
+            first = next(events)  # Validates and admits the request before the 200 goes out
+        except SchedulerBusy as e:
+            self._send_json(503, {"error": "busy", "reason": e.reason, "queue_depth": e.queue_depth})
+            return
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        if first["event"] == "cancelled":
+            events.close()
+            self._send_json(409, {"error": "cancelled", "reason": first["reason"]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            for event in itertools.chain([first], events):
+                self._write_event(event)
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            # Headers are out; report the failure in-band
+            self._write_event({"event": "error", "error": str(e)})
+        finally:
+            events.close()  # Stops the generation if the client went away mid-stream
+
+    def _watch_client(self, client: CancelToken, replied: threading.Event):
+        """Cancel `client` if the connection closes before the reply is sent"""
+        connection = self.connection
+
+        def watch():
+            while not replied.wait(DISCONNECT_POLL_SECONDS):
+                try:
+                    readable, _, _ = select.select([connection], [], [], 0)
+                    if not readable:
+                        continue
+                    if connection.recv(1, socket.MSG_PEEK):
+                        return  # More request bytes (pipelining): the client is still there
+                except (OSError, ValueError):
+                    pass
+                client.cancel("disconnected")  # Readable with nothing to read: EOF
+                return
+
+        threading.Thread(target=watch, name="client-watch", daemon=True).start()
+
+    def _write_event(self, event: Dict):
+        self.wfile.write(json.dumps(event, default=float).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def _admit(self, fn, *args, **kwargs):
+        if self.scheduler is None:
+            return fn(*args, **kwargs)
+        return self.scheduler.run(fn, *args, **kwargs)
+
+    def _readiness(self) -> Tuple[bool, Dict]:
+        if self.pipeline is None:
+            return False, {"ready": False, "reason": "pipeline not loaded"}
+        status = {
+            "ready": True,
+            "index_version": getattr(self.pipeline.retriever, "current_version", None),
+            "answer_mode": self.pipeline.answer_mode,
+            "llm_available": self.pipeline.health.available(),
+            "worker": os.getpid(),
+        }
+        if self.scheduler is not None:
+            stats = self.scheduler.stats()
+            status.update(queue_depth=stats["queue_depth"], in_flight=stats["in_flight"])
+        return True, status
+
+    @staticmethod
+    def _query_args(body: Dict, defaults: Dict | None = None) -> Tuple[str, Dict]:
+        """(question, answer_question kwargs) from one query object"""
+        body = {**(defaults or {}), **body}
+        question = str(body["question"]).strip()
+        if not question:
+            raise ValueError("question is empty")
+        return question, {
+            "top_k": QueryHandler._top_k(body),
+            "filters": body.get("filters"),
+            "request_id": body.get("request_id"),
+            "mode": body.get("mode"),
+            "profile": bool(body.get("profile", False)),
+            "session": body.get("session"),
+        }
+
+    @staticmethod
+    def _top_k(body: Dict) -> int:
+        top_k = int(body.get("top_k", 5))
+        if not 1 <= top_k <= MAX_TOP_K:
+            raise ValueError(f"top_k must be between 1 and {MAX_TOP_K}")
+        return top_k
+
+    def _batch_parallelism(self) -> int:
+        """Batch items sent to the scheduler at once: never more than it has room for,
+        so a batch cannot fill the queue and have its own items rejected as busy"""
+        if self.scheduler is None:
+            return self.batch_parallelism
+        stats = self.scheduler.stats()
+        room = stats["max_in_flight"] + stats["max_queue_size"] - stats["in_flight"] - stats["queue_depth"]
+        return max(1, min(self.batch_parallelism, room))
+
+    def _batch_queries(self, body: Dict) -> List[Tuple[str, Dict]]:
+        questions = body["questions"]
+        if not isinstance(questions, list) or not questions:
+            raise ValueError("questions must be a non-empty list")
+        if len(questions) > MAX_BATCH:
+            raise ValueError(f"at most {MAX_BATCH} questions per batch")
+        # Batch-level top_k/filters/mode apply to plain strings and fill gaps in objects
+        defaults = {key: body[key] for key in ("top_k", "filters", "mode") if key in body}
+        self._top_k(defaults)
+        return [
+            self._query_args(q if isinstance(q, dict) else {"question": q}, defaults)
+            for q in questions
+        ]
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON ({e.msg})")
+        if not isinstance(body, dict):
+            raise ValueError("expected a JSON object")
+        return body
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload, default=float).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_api_server(
+    pipeline, scheduler: RequestScheduler | None = None, port: int = 8000, host: str = "0.0.0.0"
+) -> ThreadingHTTPServer:
+    """Serve the JSON API for an in-process pipeline (e.g. next to the Gradio UI) from a daemon thread"""
+    handler = type("ConfiguredQueryHandler", (QueryHandler,), {"pipeline": pipeline, "scheduler": scheduler})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="api-server", daemon=True).start()
+    print(f"✓ JSON API: http://localhost:{port}/query")
+    return server
+
+
+class WorkerPool:
+    """Forks N workers that accept connections from one shared listening socket"""
+
+    def __init__(
+        self,
+        build_worker: Callable[[int], Dict],
+        port: int = 8000,
+        workers: int = 0,
+        host: str = "0.0.0.0",
+    ):
+        """
+        Args:
+            build_worker: Called in each worker with its slot number; returns the
+                QueryHandler attributes ({"pipeline": ..., "scheduler": ...}).
+                Anything loaded before the pool starts (embedding model, mmap'd
+                index) is shared with the workers instead of loaded N times.
+            port: Port every worker serves on
+            workers: Number of worker processes (0 = one per CPU)
+            host: Interface to bind
+        """
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Multi-worker serving needs os.fork (Linux or macOS)")
+
+        self.build_worker = build_worker
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.host = host
+        self._pids: Dict[int, int] = {}  # pid -> slot
+        self._stopping = False
+
+    def serve_forever(self):
+        """Start the workers and restart any that die until SIGINT/SIGTERM"""
+        # Bound once in the parent; every worker accept()s on the same socket
+        listener = socket.create_server((self.host, self.port), backlog=128)
+        print(f"✓ Serving on http://localhost:{self.port}/query with {self.workers} workers")
+
+        signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        for slot in range(self.workers):
+            self._spawn(slot, listener)
+
+        try:
+            while self._pids:
+                try:
+                    pid, status = os.wait()
+                except ChildProcessError:
+                    break
+                except KeyboardInterrupt:
+                    self.stop()
+                    continue
+                slot = self._pids.pop(pid, None)
+                if slot is None or self._stopping:
+                    continue
+                print(f"⚠️  Worker {slot} (pid {pid}) exited with status {status}; restarting")
+                time.sleep(1.0)  # Don't spin if the worker crashes on startup
+                self._spawn(slot, listener)
+        finally:
+            listener.close()
+            print("✓ All workers stopped")
+
+    def stop(self):
+        self._stopping = True
+        for pid in list(self._pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _spawn(self, slot: int, listener: socket.socket):
+        pid = os.fork()
+        if pid:
+            self._pids[pid] = slot
+            return
+
+        # Worker process: never return into the parent's loop
+        code = 0
+        try:
+            self._run_worker(slot, listener)
+        except Exception as e:
+            print(f"❌ Worker {slot} failed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _run_worker(self, slot: int, listener: socket.socket):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # The parent handles Ctrl+C
+        _limit_threads(max(1, (os.cpu_count() or 1) // self.workers))
+
+        handler = type(f"QueryHandler{slot}", (QueryHandler,), self.build_worker(slot))
+        server = ThreadingHTTPServer((self.host, self.port), handler, bind_and_activate=False)
+        server.socket.close()
+        server.socket = listener
+        server.daemon_threads = True
+
+        # serve_forever must be stopped from another thread
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+        print(f"  worker {slot} ready (pid {os.getpid()})")
+        server.serve_forever()
+
+
+def _limit_threads(threads: int):
+    """Split the cores between workers instead of every worker using all of them"""
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    try:
+        import faiss
+
+        faiss.omp_set_num_threads(threads)
+    except ImportError:
+        pass
@@ -0,0 +1,350 @@
+"""
+Category Sharding Module
+One FAISS index per top-level data/raw category plus a centroid router
+"""
+
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from embedding_service import MicroBatcher
+from embeddings_store import RAGRetriever, group_by_filters, load_embeddings, with_timings
+from metadata_index import _as_list, check_filters
+from metrics import StageTimer, attribute, span
+from profiling import PROFILER, active as profiling_active
+
+ROUTER_FILE = "router.json"
+SHARDS_SUBDIR = "shards"
+
+
+class CentroidRouter:
+    """Picks the shards whose centroid is closest to the query"""
+
+    def __init__(self, max_shards: int = 2, margin: float = 0.1):
+        """
+        Args:
+            max_shards: Upper bound on shards searched per query
+            margin: Also search shards scoring within this much of the best one
+        """
+        self.max_shards = max_shards
+        self.margin = margin
+        self.names: List[str] = []
+        self.sizes: Dict[str, int] = {}
+        self.sources: Dict[str, List[str]] = {}
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+
+    def fit(self, shard_vectors: Dict[str, np.ndarray], shard_sources: Dict[str, List[str]]):
+        """Compute one normalized mean vector per shard"""
+        self.names = sorted(shard_vectors)
+        self.sources = {name: sorted(shard_sources.get(name, [])) for name in self.names}
+        self.sizes = {name: int(len(shard_vectors[name])) for name in self.names}
+        centroids = np.stack([shard_vectors[name].mean(axis=0) for name in self.names])
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = (centroids / np.maximum(norms, 1e-12)).astype(np.float32)
+
+    def route(self, query_vector: np.ndarray) -> List[str]:
+        """Shard names to search for this query, best first"""
+        if not self.names:
+            return []
+
+        scores = self.centroids @ query_vector
+        order = np.argsort(-scores)
+        best = scores[order[0]]
+        return [
+            self.names[i]
+            for i in order[: self.max_shards]
+            if scores[i] >= best - self.margin
+        ]
+
+    def shards_for(self, filters: Dict) -> List[str] | None:
+        """Shards that can satisfy category/source filters (None = no constraint)"""
+        names = set(self.names)
+        constrained = False
+
+        if "category" in filters:
+            names &= {str(v) for v in _as_list(filters["category"])}
+            constrained = True
+
+        for key in ("source_file", "source"):
+            if key in filters:
+                wanted = {str(v) for v in _as_list(filters[key])}
+                names &= {n for n in self.names if wanted & set(self.sources.get(n, []))}
+                constrained = True
+
+        return sorted(names) if constrained else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "names": self.names,
+            "sizes": self.sizes,
+            "sources": self.sources,
+            "centroids": self.centroids.tolist(),
+        }
+
+    def load_dict(self, data: Dict):
+        self.names = list(data["names"])
+        self.sizes = {name: int(size) for name, size in data["sizes"].items()}
+        self.sources = {name: list(files) for name, files in data.get("sources", {}).items()}
+        self.centroids = np.asarray(data["centroids"], dtype=np.float32)
+
+
+class ShardedRetriever:
+    """Drop-in replacement for RAGRetriever that searches routed shards only"""
+
+    def __init__(
+        self,
+        embedding_model: str = "all-MiniLM-L6-v2",
+        max_shards: int = 2,
+        margin: float = 0.1,
+        max_loaded_shards: int = 0,
+        embeddings=None,
+        storage: str = "fp32",
+        rerank_factor: int = 0,
+        compress_text: bool = False,
+        query_batch_size: int = 0,
+        query_batch_wait: float = 0.0,
+        doc_candidates: int = 0,
+        section_size: int = 0,
+    ):
+        """
+        Args:
+            embedding_model: sentence-transformers model name
+            max_shards: Upper bound on shards searched per query
+            margin: Router score margin for searching extra shards
+            max_loaded_shards: Keep at most this many shards in RAM (0 = no limit)
+            embeddings: Already-loaded embeddings to share instead of loading a new copy
+            storage: Vector format for new shards ("fp32", "fp16" or "int8")
+            rerank_factor: Exact re-rank candidate multiplier for quantized shards (0 = off)
+            compress_text: zlib-compress chunk text of new shards
+            query_batch_size: Concurrent retrieve() calls embedded together and searched
+                with one multi-query call per shard, at most this many (0 = off)
+            query_batch_wait: Seconds a query waits for others to join its batch
+            doc_candidates: Per shard, search only the chunks of this many best-matching
+                documents (0 = flat search of the shard)
+            section_size: Chunks per section summary of new shards (0 = whole documents)
+        """
+        self.embeddings = embeddings if embeddings is not None else load_embeddings(embedding_model)
+        self.storage = storage
+        self.rerank_factor = rerank_factor
+        self.compress_text = compress_text
+        self.doc_candidates = doc_candidates
+        self.section_size = section_size
+        self.router = CentroidRouter(max_shards=max_shards, margin=margin)
+        self.max_loaded_shards = max_loaded_shards
+        self.shard_dir: Path | None = None
+        self._shards: "OrderedDict[str, RAGRetriever]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.batcher = (
+            MicroBatcher(self._retrieve_batch, query_batch_size, query_batch_wait, name="query-batcher")
+            if query_batch_size > 0 else None
+        )
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        """True if index_dir holds a sharded index"""
+        return (Path(index_dir) / SHARDS_SUBDIR / ROUTER_FILE).exists()
+
+    def index_documents(self, chunks: List[Dict[str, str]]):
+        """Build one FAISS index per chunk category"""
+        with PROFILER.capture("index", "index_documents"):
+            groups = self._group(list(enumerate(chunks)))
+            self._build_shards(groups, lambda shard, items: shard.index_documents([c for _, c in items]))
+
+    def index_embeddings(self, chunks: List[Dict[str, str]], vectors):
+        """Build one FAISS index per chunk category from precomputed embeddings"""
+        if len(chunks) != len(vectors):
+            raise ValueError(f"Got {len(chunks)} chunks but {len(vectors)} vectors")
+
+        groups = self._group(list(enumerate(chunks)))
+        self._build_shards(
+            groups,
+            lambda shard, items: shard.index_embeddings(
+                [c for _, c in items], [vectors[i] for i, _ in items]
+            ),
+        )
+
+    @staticmethod
+    def _group(items: List) -> Dict[str, List]:
+        """(position, chunk) pairs grouped by chunk category"""
+        groups: Dict[str, List] = {}
+        for i, chunk in items:
+            category = chunk.get("metadata", {}).get("category", "general")
+            groups.setdefault(category, []).append((i, chunk))
+
+        if not groups:
+            raise ValueError(
+                "No chunks provided to index_documents(). "
+                "Ensure that DocumentChunker.chunk_documents produced at least one chunk."
+            )
+        return groups
+
+    def _build_shards(self, groups: Dict[str, List], build):
+        shard_vectors: Dict[str, np.ndarray] = {}
+        shard_sources = {
+            name: list({chunk.get("source", "Unknown") for _, chunk in group})
+            for name, group in groups.items()
+        }
+        self._shards.clear()
+        for name in sorted(groups):
+            print(f"\n[{name}] {len(groups[name])} chunks")
+            shard = self._new_shard()
+            build(shard, groups[name])
+            self._shards[name] = shard
+            shard_vectors[name] = shard.vectors()
+
+        self.router.fit(shard_vectors, shard_sources)
+        print(f"✓ Built {len(self._shards)} shards: {', '.join(self.router.names)}")
+
+    def retrieve(
+        self, query: str, top_k: int = 5, filters: Dict | None = None, request_id: str | None = None
+    ) -> List[Dict]:
+        """Retrieve relevant chunks from the shards the router selects"""
+        if not self.router.names:
+            raise ValueError("Index not built. Call index_documents() or load() first.")
+        check_filters(filters)
+
+        with PROFILER.capture("retrieve", request_id or uuid.uuid4().hex[:12]):
+            # A profiled call runs on this thread, where the profiler can see it
+            if self.batcher is not None and not profiling_active():
+                results, timings = self.batcher.submit([(query, top_k, filters)])[0]
+                attribute(timings)
+                return results
+
+            with span("embed_query"):
+                query_vector = self.embeddings.embed_query(query)
+
+            results: List[Dict] = []
+            for name in self._route(query_vector, filters):
+                results.extend(
+                    self._shard(name).retrieve_by_vector(query_vector, top_k=top_k, filters=filters)
+                )
+
+            results.sort(key=lambda r: r["score"], reverse=True)
+            return results[:top_k]
+
+    def _route(self, query_vector, filters: Dict | None) -> List[str]:
+        with span("route"):
+            # Category/source filters pick the shards directly, bypassing the router
+            shard_names = self.router.shards_for(filters) if filters else None
+            if shard_names is None:
+                shard_names = self.router.route(np.asarray(query_vector, dtype=np.float32))
+        return shard_names
+
+    def _retrieve_batch(self, requests: List[Tuple[str, int, Dict | None]]) -> List[Tuple[List[Dict], Dict]]:
+        """Micro-batched retrieve(): one forward pass, then one multi-query search per shard and filter"""
+        # Stage times of the shared batch are reported to every request in it
+        timer = StageTimer()
+        with timer.activate():
+            results = self._search_batch(requests)
+        return with_timings(results, timer.timings)
+
+    def _search_batch(self, requests: List[Tuple[str, int, Dict | None]]) -> List[List[Dict] | Exception]:
+        with span("embed_query"):
+            vectors = np.asarray(
+                self.embeddings.embed_documents([query for query, _, _ in requests]), dtype=np.float32
+            )
+
+        results: List[List[Dict] | Exception] = [[] for _ in requests]
+        for members in group_by_filters(requests).values():
+            try:
+                self._search_group(requests, members, vectors, results)
+            except Exception as e:
+                # Only the requests sharing these filters fail, not the whole batch
+                for i in members:
+                    results[i] = e
+
+        for i, (_, top_k, _) in enumerate(requests):
+            if isinstance(results[i], list):
+                results[i].sort(key=lambda r: r["score"], reverse=True)
+                del results[i][top_k:]
+        return results
+
+    def _search_group(self, requests: List, members: List[int], vectors: np.ndarray, results: List):
+        """Search the routed shards for requests sharing one filter, adding hits to their results"""
+        filters = requests[members[0]][2]
+        by_shard: Dict[str, List[int]] = {}
+        for i in members:
+            for name in self._route(vectors[i], filters):
+                by_shard.setdefault(name, []).append(i)
+
+        for name, shard_members in by_shard.items():
+            top_k = max(requests[i][1] for i in shard_members)
+            shard = self._shard(name)
+            rows = shard.retrieve_by_vectors(vectors[shard_members], top_k=top_k, filters=filters)
+            for i, row in zip(shard_members, rows):
+                results[i].extend(row)
+
+    def _shard(self, name: str) -> RAGRetriever:
+        """Return a shard, loading it from disk on first use"""
+        with self._lock:
+            shard = self._shards.get(name)
+            if shard is not None:
+                self._shards.move_to_end(name)
+                return shard
+
+            if self.shard_dir is None:
+                raise ValueError(f"Shard '{name}' is not loaded and no index directory is set")
+
+            shard = self._new_shard()
+            shard.load(str(self.shard_dir / name))
+            self._shards[name] = shard
+
+            # Evict least recently used shards beyond the residency limit
+            while self.max_loaded_shards and len(self._shards) > self.max_loaded_shards:
+                self._shards.popitem(last=False)
+            return shard
+
+    def _new_shard(self) -> RAGRetriever:
+        return RAGRetriever(
+            embeddings=self.embeddings,
+            storage=self.storage,
+            rerank_factor=self.rerank_factor,
+            compress_text=self.compress_text,
+            doc_candidates=self.doc_candidates,
+            section_size=self.section_size,
+        )
+
+    def prefetch(self) -> int:
+        """Load shards (up to the residency limit) and fault their pages in; bytes touched"""
+        names = self.router.names[: self.max_loaded_shards or None]
+        return sum(self._shard(name).prefetch() for name in names)
+
+    def memory_bytes(self) -> int:
+        """Approximate resident vector memory of the shards currently loaded"""
+        with self._lock:
+            return sum(shard.memory_bytes() for shard in self._shards.values())
+
+    def save(self, save_dir: str = "data/embeddings"):
+        """Save every shard and the router to disk"""
+        if not self._shards:
+            raise ValueError("No shards to save. Build the index first.")
+
+        shard_dir = Path(save_dir) / SHARDS_SUBDIR
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        for name, shard in self._shards.items():
+            shard.save(str(shard_dir / name))
+
+        with open(shard_dir / ROUTER_FILE, "w", encoding="utf-8") as f:
+            json.dump(self.router.to_dict(), f)
+        self.shard_dir = shard_dir
+        print(f"✓ Router saved to {shard_dir / ROUTER_FILE}")
+
+    def load(self, load_dir: str = "data/embeddings"):
+        """Load the router; shards are loaded lazily when first routed to"""
+        shard_dir = Path(load_dir) / SHARDS_SUBDIR
+        router_file = shard_dir / ROUTER_FILE
+        if not router_file.exists():
+            raise FileNotFoundError(f"No sharded index found at {load_dir}")
+
+        with open(router_file, "r", encoding="utf-8") as f:
+            self.router.load_dict(json.load(f))
+
+        self.shard_dir = shard_dir
+        self._shards.clear()
+        sizes = ", ".join(f"{n} ({self.router.sizes[n]})" for n in self.router.names)
+        print(f"✓ Shard router loaded from {load_dir}: {sizes}")
@@ -0,0 +1,141 @@
+"""
+Single-Flight Module
+Identical questions asked at the same time share one retrieval and generation:
+the first request computes, the others attach to its result or its stream
+"""
+
+import threading
+from typing import Dict, Iterator, List, Tuple
+
+from cancellation import CancelToken
+from metrics import REGISTRY
+
+
+class Flight:
+    """One computation in progress and the requests attached to it"""
+
+    def __init__(self, key: Tuple):
+        self.key = key
+        # Cancelled only once every attached request is gone
+        self.cancel = CancelToken()
+        # Stream events published so far, replayed to requests that attach late
+        self.events: List[Dict] = []
+        self.result: Dict | None = None
+        self.error: BaseException | None = None
+        self.finished = False
+        self.members = 0
+        self._cond = threading.Condition()
+
+    def publish(self, event: Dict):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def land(self, result: Dict | None = None, error: BaseException | None = None):
+        with self._cond:
+            self.result, self.error, self.finished = result, error, True
+            self._cond.notify_all()
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def wait(self, cancel: CancelToken) -> Dict:
+        """The computation's result (or its exception); a cancelled request stops waiting"""
+        with self._cond:
+            while not self.finished and not cancel.cancelled:
+                self._cond.wait()
+        cancel.check()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def follow(self, cancel: CancelToken) -> Iterator[Dict]:
+        """Every published event from the first, then live ones until the computation lands"""
+        position = 0
+        while True:
+            with self._cond:
+                while position == len(self.events) and not self.finished and not cancel.cancelled:
+                    self._cond.wait()
+                batch = self.events[position:]
+                finished, error = self.finished, self.error
+            cancel.check()
+            for event in batch:
+                yield event
+            position += len(batch)
+            if finished and position == len(self.events):
+                if error is not None:
+                    raise error
+                return
+
+
+class Membership:
+    """One request's attachment to a flight; leaves when done or when the request is cancelled"""
+
+    def __init__(self, flights: "SingleFlight", flight: Flight, cancel: CancelToken):
+        self.flight = flight
+        self._flights = flights
+        self._left = False
+        self._lock = threading.Lock()
+        self._unsubscribe = cancel.on_cancel(lambda: self.leave(cancel.reason))
+
+    def leave(self, reason: str | None = None):
+        """Idempotent; the last request to leave an unfinished flight cancels it with `reason`"""
+        with self._lock:
+            if self._left:
+                return
+            self._left = True
+        self._unsubscribe()
+        self._flights.release(self.flight, reason)
+        self.flight.wake()
+
+
+class SingleFlight:
+    """Registry of in-progress computations keyed by normalized query and parameters"""
+
+    def __init__(self):
+        self._flights: Dict[Tuple, Flight] = {}
+        self._lock = threading.Lock()
+        self._requests = {"leader": 0, "follower": 0}
+        REGISTRY.describe(
+            "rag_singleflight_requests_total",
+            "Answer requests that started a computation (leader) or joined one in flight (follower)",
+        )
+        REGISTRY.gauge("rag_singleflight_in_flight", lambda: len(self._flights))
+        REGISTRY.gauge("rag_singleflight_dedup_ratio", self.dedup_ratio)
+
+    def attach(self, key: Tuple, cancel: CancelToken) -> Tuple[Membership, bool]:
+        """(membership, leader): the leader must compute and land the flight"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None or flight.cancel.cancelled
+            if leader:
+                flight = self._flights[key] = Flight(key)
+            flight.members += 1
+            role = "leader" if leader else "follower"
+            self._requests[role] += 1
+        REGISTRY.inc("rag_singleflight_requests_total", kind=key[0], role=role)
+        return Membership(self, flight, cancel), leader
+
+    def land(self, flight: Flight, result: Dict | None = None, error: BaseException | None = None):
+        """Publish the outcome; later identical requests start afresh (or hit the answer cache)"""
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.land(result, error)
+
+    def dedup_ratio(self) -> float:
+        """Share of requests that joined an identical request in flight instead of computing"""
+        total = self._requests["leader"] + self._requests["follower"]
+        return self._requests["follower"] / total if total else 0.0
+
+    def release(self, flight: Flight, reason: str | None = None):
+        """One request fewer attached to `flight`"""
+        with self._lock:
+            flight.members -= 1
+            abandoned = flight.members == 0 and not flight.finished
+            if abandoned and self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        if abandoned:
+            # Nobody is waiting any more (e.g. the last client disconnected): stop the generation
+            flight.cancel.cancel(reason or "abandoned")
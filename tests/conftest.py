@@ -0,0 +1,27 @@
+"""
+Pytest configuration and fixtures
+"""
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def gate():
+    """Event that blocked work waits on; opened at teardown so no thread is left hanging"""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+@pytest.fixture
+def make_pipeline():
+    """Builds a RAGPipeline around a FakeLLM and a FakeRetriever (no Ollama, no index)"""
+    from llm_generation import RAGPipeline
+    from tests.helpers import FakeLLM, FakeRetriever
+
+    def build(llm=None, retriever=None, **kwargs):
+        kwargs.setdefault("answer_mode", "generate")
+        return RAGPipeline(retriever or FakeRetriever(), llm=llm or FakeLLM(), **kwargs)
+
+    return build
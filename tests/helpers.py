@@ -0,0 +1,125 @@
+"""
+Shared test helpers
+"""
+import threading
+import time
+
+import pytest
+
+
+def wait_until(predicate, timeout: float = 2.0):
+    """Poll until predicate() is true; fail the test if it never is"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            pytest.fail("condition not reached in time")
+        time.sleep(0.005)
+
+
+class FakeEmbeddings:
+    """Bag-of-letters vectors: enough for the extractive answerer"""
+
+    def embed_query(self, text: str):
+        vector = [float(text.lower().count(letter)) for letter in "abcdefghijklmnopqrstuvwxyz"]
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+class FakeRetriever:
+    """Returns the same chunks for every query, optionally failing instead"""
+
+    def __init__(self, error: Exception | None = None, gate: threading.Event | None = None):
+        self.embeddings = FakeEmbeddings()
+        self.error = error
+        self.gate = gate
+        self.calls = 0
+
+    def retrieve(self, query: str, top_k: int = 5, filters=None, request_id=None):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return [
+            {
+                "text": "Vendors register with a tax ID and a business license. Approval takes two days.",
+                "source": "vendor_manual.pdf",
+                "score": 0.9,
+                "metadata": {"source_file": "vendor_manual.pdf"},
+            }
+        ][:top_k]
+
+
+class FakeLLM:
+    """
+    LangChain-style LLM whose stream() yields `tokens` words, `delay` seconds apart,
+    after waiting for `gate` (if given). Counts calls, and streams that ended
+    (finished or closed by the pipeline, i.e. the backend connection dropped).
+    """
+
+    def __init__(self, tokens: int = 20, delay: float = 0.0, gate: threading.Event | None = None):
+        self.tokens = tokens
+        self.delay = delay
+        self.gate = gate
+        self.calls = 0
+        self.started = 0
+        self.ended = 0
+        self._lock = threading.Lock()
+
+    def stream(self, prompt: str):
+        with self._lock:
+            self.calls += 1
+        return self._pieces()
+
+    def _pieces(self):
+        with self._lock:
+            self.started += 1
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            for i in range(self.tokens):
+                if self.delay:
+                    time.sleep(self.delay)
+                yield f"word{i} "
+        finally:
+            with self._lock:
+                self.ended += 1
+
+
+CHUNKS = [
+    ("vendor_manual.pdf", "vendor", "Vendors register with a tax ID and a business license."),
+    ("vendor_manual.pdf", "vendor", "Vendor approval takes two working days after review."),
+    ("expense_policy.pdf", "finance", "Expense claims need receipts and a manager signature."),
+    ("expense_policy.pdf", "finance", "Travel expenses are reimbursed within thirty days."),
+    ("leave_policy.pdf", "hr", "Annual leave requests go to the line manager first."),
+    ("leave_policy.pdf", "hr", "Sick leave longer than three days needs a doctor's note."),
+]
+
+
+def sample_chunks():
+    """DocumentChunker-style chunks over three small documents"""
+    counters = {}
+    chunks = []
+    for source, category, text in CHUNKS:
+        index = counters[source] = counters.get(source, -1) + 1
+        chunks.append(
+            {
+                "text": text,
+                "source": source,
+                "chunk_id": f"{source}_chunk_{index}",
+                "metadata": {"source_file": source, "category": category, "chunk_index": index},
+            }
+        )
+    return chunks
+
+
+def build_retriever(chunks=None, **kwargs):
+    """RAGRetriever over `chunks` (default sample_chunks()) with FakeEmbeddings (no model download)"""
+    from embeddings_store import RAGRetriever
+
+    retriever = RAGRetriever(embeddings=FakeEmbeddings(), **kwargs)
+    retriever.index_documents(chunks or sample_chunks())
+    return retriever
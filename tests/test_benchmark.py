@@ -0,0 +1,66 @@
+"""
+Tests for the offline benchmark suite (tiny sizes, no model download)
+"""
+import json
+
+import numpy as np
+
+import benchmark
+from tests.helpers import build_retriever, sample_chunks
+
+
+class TestBenchmarkSections:
+    """Test that each section runs and reports its numbers"""
+
+    def test_latency_stats(self):
+        stats = benchmark.latency_stats([0.001, 0.002, 0.003])
+        assert stats["count"] == 3
+        assert stats["mean_ms"] == 2.0 and stats["max_ms"] == 3.0
+        assert benchmark.latency_stats([]) == {}
+
+    def test_chunking(self):
+        docs = [{"content": "word " * 2000, "source": "a.pdf", "category": "general"}]
+        result = benchmark.bench_chunk(docs, repeats=1)
+        assert result["chunks"] == len(result.pop("_chunks")) > 1
+        assert result["words"] == 2000
+
+    def test_search_sizes(self):
+        result = benchmark.bench_search(build_retriever(), dim=26, sizes=[200, 400], queries=5, top_k=3)
+        assert set(result) == {"200", "400"}
+        assert result["200"]["search"]["count"] == 5
+        assert result["400"]["filtered_search"]["count"] == 5
+
+    def test_quantization_recall(self):
+        rng = np.random.default_rng(0)
+        vectors = benchmark._normalize(rng.standard_normal((300, 26)).astype(np.float32))
+        rows = benchmark.bench_quantization(build_retriever(), {"300": vectors}, 10, 5, rerank_factor=4)["300"]
+        assert set(rows) == {"fp32", "fp16", "int8", "int8+rerank4"}
+        assert rows["fp32"]["recall@5"] == 1.0
+        assert rows["int8+rerank4"]["recall@5"] >= rows["int8"]["recall@5"]
+        assert rows["int8"]["index_mb"] < rows["fp32"]["index_mb"]
+
+    def test_docstore(self):
+        result = benchmark.bench_docstore(sample_chunks() * 20, lookups=50)
+        assert result["chunks"] == 120
+        for name in ("langchain", "chunk_store", "chunk_store_zlib"):
+            assert result[name]["lookup_us"] > 0
+
+    def test_end_to_end(self):
+        llm = benchmark.FakeLLM(prefill_seconds=0.0, tokens_per_second=1e6, answer_tokens=3)
+        report = benchmark.bench_e2e(build_retriever(), queries=3, top_k=2, llm=llm)
+        assert report["latency"]["count"] == 3
+        assert report["extractive"]["latency"]["count"] == 3
+        assert "retrieve" in report["stages"]
+
+
+class TestCompare:
+    """Test diffing two result files"""
+
+    def test_prints_relative_change(self, tmp_path, capsys):
+        old, new = tmp_path / "old.json", tmp_path / "new.json"
+        old.write_text(json.dumps({"results": {"search": {"p50_ms": 2.0}, "gone": {"x": 1}}}))
+        new.write_text(json.dumps({"results": {"search": {"p50_ms": 1.0}}}))
+        benchmark.compare(str(old), str(new))
+        output = capsys.readouterr().out
+        assert "search.p50_ms" in output and "-50.0%" in output
+        assert "gone" not in output
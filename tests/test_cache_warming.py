@@ -0,0 +1,63 @@
+"""
+Tests for the answer cache and the query log
+"""
+import os
+
+from cache_warming import AnswerCache, QueryLog, hot_queries
+
+
+class TestAnswerCache:
+    """Test keys, LRU eviction and expiry"""
+
+    def test_key_ignores_case_and_spacing(self):
+        assert AnswerCache.key("How do I  register a Vendor?", 5, None, "auto", "v1") == AnswerCache.key(
+            "how do i register a vendor", 5, None, "auto", "v1"
+        )
+        assert AnswerCache.key("vendor", 5, None, "auto", "v1") != AnswerCache.key("vendor", 5, None, "auto", "v2")
+
+    def test_evicts_least_recently_used(self):
+        cache = AnswerCache(max_entries=2)
+        cache.put(("a",), {"answer": "a"})
+        cache.put(("b",), {"answer": "b"})
+        cache.get(("a",))
+        cache.put(("c",), {"answer": "c"})
+        assert cache.get(("b",)) is None
+        assert cache.get(("a",)) == {"answer": "a"}
+
+    def test_expires_entries(self):
+        cache = AnswerCache(ttl=0.0)
+        cache.put(("a",), {"answer": "a"})
+        assert cache.get(("a",)) is None
+
+
+class TestQueryLog:
+    """Test logging, hot queries and rotation"""
+
+    def test_top_counts_normalized_questions(self, tmp_path):
+        log = QueryLog(str(tmp_path / "queries.jsonl"))
+        for query in ["Vendor registration?", "vendor registration", "Expense claims"]:
+            log.add(query)
+        assert log.top(1) == ["Vendor registration?"]
+        assert hot_queries(["Expense claims"], log, 5) == ["Expense claims", "Vendor registration?"]
+
+    def test_rotates_into_previous_file(self, tmp_path):
+        log = QueryLog(str(tmp_path / "queries.jsonl"), max_bytes=200)
+        for i in range(10):
+            log.add(f"question {i}")
+        assert (tmp_path / "queries.1.jsonl").exists()
+        assert os.path.getsize(tmp_path / "queries.jsonl") < 200
+
+    def test_stale_size_check_does_not_rotate_twice(self, tmp_path, monkeypatch):
+        path = tmp_path / "queries.jsonl"
+        first, second = QueryLog(str(path), max_bytes=200), QueryLog(str(path), max_bytes=200)
+        for i in range(8):
+            first.add(f"question {i}")
+        rotated = (tmp_path / "queries.1.jsonl").read_text()
+        assert os.path.getsize(path) < 200
+
+        # `second` (another worker) saw the file full just before `first` rotated it
+        checks = iter([True])
+        real_full = second._full
+        monkeypatch.setattr(second, "_full", lambda: next(checks, None) or real_full())
+        second.add("late question")
+        assert (tmp_path / "queries.1.jsonl").read_text() == rotated
@@ -0,0 +1,164 @@
+"""
+Tests for generation limits and cancellation
+"""
+import threading
+import time
+
+import pytest
+
+from cancellation import CancelToken, GenerationCancelled
+from scheduler import RequestScheduler
+from tests.helpers import FakeLLM, wait_until
+
+
+class TestCancelToken:
+    """Test the token shared by a request and whoever may stop it"""
+
+    def test_first_reason_sticks(self):
+        token = CancelToken()
+        token.cancel("superseded")
+        token.cancel("disconnected")
+        assert token.reason == "superseded"
+        with pytest.raises(GenerationCancelled) as cancelled:
+            token.check()
+        assert cancelled.value.reason == "superseded"
+
+    def test_callbacks_run_once_and_can_unsubscribe(self):
+        token = CancelToken()
+        calls = []
+        token.on_cancel(lambda: calls.append("kept"))
+        unsubscribe = token.on_cancel(lambda: calls.append("dropped"))
+        unsubscribe()
+        token.cancel()
+        token.cancel()
+        assert calls == ["kept"]
+        # Subscribing to an already cancelled token runs at once
+        token.on_cancel(lambda: calls.append("late"))
+        assert calls == ["kept", "late"]
+
+    def test_child_follows_parent(self):
+        parent = CancelToken()
+        child = parent.child()
+        child.cancel("own")
+        assert not parent.cancelled
+
+        second = parent.child()
+        parent.cancel("disconnected")
+        assert second.reason == "disconnected"
+
+
+class TestGenerationLimits:
+    """Test max_tokens and the generation deadline"""
+
+    def test_stops_at_max_tokens(self, make_pipeline):
+        llm = FakeLLM(tokens=50)
+        pipeline = make_pipeline(llm=llm, max_tokens=5)
+
+        result = pipeline.answer_question("vendor registration")
+
+        assert result["answer"].split() == [f"word{i}" for i in range(5)]
+        assert "stopped" not in result
+        wait_until(lambda: llm.ended == 1)  # Backend stream closed, not read to the end
+
+    def test_deadline_returns_partial_answer(self, make_pipeline):
+        llm = FakeLLM(tokens=200, delay=0.02)
+        pipeline = make_pipeline(llm=llm, generation_timeout=0.3)
+
+        start = time.perf_counter()
+        result = pipeline.answer_question("vendor registration")
+
+        assert time.perf_counter() - start < 2.0
+        assert result["stopped"] == "deadline"
+        assert 0 < len(result["answer"].split()) < 200
+        wait_until(lambda: llm.ended == 1)
+
+    def test_deadline_in_auto_mode_answers_extractively(self, make_pipeline):
+        pipeline = make_pipeline(llm=FakeLLM(tokens=200, delay=0.02), answer_mode="auto", generation_timeout=0.2)
+
+        result = pipeline.answer_question("vendor registration")
+
+        assert result["mode"] == "extractive"
+        assert result["fallback"] == "deadline"
+
+    def test_stopped_answer_is_not_cached(self, make_pipeline):
+        from cache_warming import AnswerCache
+
+        llm = FakeLLM(tokens=200, delay=0.02)
+        pipeline = make_pipeline(llm=llm, generation_timeout=0.2, answer_cache=AnswerCache())
+        pipeline.answer_question("vendor registration")
+        pipeline.answer_question("vendor registration")
+        assert llm.calls == 2
+
+
+class TestCancellation:
+    """Test cancelled, superseded and disconnected requests"""
+
+    def test_cancelled_request_raises_before_admission(self, make_pipeline):
+        llm = FakeLLM()
+        pipeline = make_pipeline(llm=llm)
+        admitted = []
+        token = CancelToken()
+        token.cancel("disconnected")
+
+        with pytest.raises(GenerationCancelled) as cancelled:
+            pipeline.answer_question("vendor registration", cancel=token, admit=lambda *a, **k: admitted.append(a))
+
+        assert cancelled.value.reason == "disconnected"
+        assert admitted == []
+        assert llm.calls == 0
+
+    def test_cancel_after_admission_frees_the_scheduler_slot(self, make_pipeline):
+        llm = FakeLLM(tokens=500, delay=0.02)
+        pipeline = make_pipeline(llm=llm)
+        scheduler = RequestScheduler(max_in_flight=1, queue_timeout=5.0)
+        token = CancelToken()
+        outcome = {}
+
+        def ask():
+            try:
+                pipeline.answer_question("vendor registration", cancel=token, admit=scheduler.run)
+            except GenerationCancelled as e:
+                outcome["reason"] = e.reason
+
+        thread = threading.Thread(target=ask, daemon=True)
+        thread.start()
+        wait_until(lambda: llm.started == 1)
+        assert scheduler.stats()["in_flight"] == 1
+
+        token.cancel("disconnected")
+        thread.join(2)
+        assert outcome == {"reason": "disconnected"}
+        assert scheduler.stats()["in_flight"] == 0
+        wait_until(lambda: llm.ended == 1)
+
+    def test_newer_request_supersedes_session(self, make_pipeline):
+        llm = FakeLLM(tokens=500, delay=0.02)
+        pipeline = make_pipeline(llm=llm)
+        outcome = {}
+
+        def ask():
+            try:
+                pipeline.answer_question("vendor registration", session="tab")
+            except GenerationCancelled as e:
+                outcome["reason"] = e.reason
+
+        thread = threading.Thread(target=ask, daemon=True)
+        thread.start()
+        wait_until(lambda: llm.started == 1)
+        pipeline.max_tokens = 3
+        result = pipeline.answer_question("expense claims", session="tab")
+
+        thread.join(2)
+        assert outcome == {"reason": "superseded"}
+        assert len(result["answer"].split()) == 3
+
+    def test_closing_a_stream_stops_the_generation(self, make_pipeline):
+        llm = FakeLLM(tokens=500, delay=0.01)
+        pipeline = make_pipeline(llm=llm)
+
+        events = pipeline.stream_answer("vendor registration")
+        kinds = [next(events)["event"] for _ in range(3)]
+        events.close()
+
+        assert kinds == ["sources", "token", "token"]
+        wait_until(lambda: llm.ended == 1)
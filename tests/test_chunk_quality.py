@@ -0,0 +1,83 @@
+"""
+Tests for the junk-chunk quality filter
+"""
+import json
+
+import pytest
+
+from chunk_quality import ChunkQualityFilter
+from ingestion import DocumentChunker
+
+PROSE = (
+    "Vendors must register with a valid tax identification number and a current business "
+    "license before the purchase department can approve any order. The approval usually "
+    "takes two working days after all documents have been reviewed by the finance team."
+)
+SYMBOL_SOUP = "ÿ¤§ #@%$ ^&*~ |}{ ¬¦ ±µ¶ ¼½¾ ÆÐ× Þß ø÷ ¡¢£ ¥© «®° ²³´ ·¸¹ º»¿ " * 4
+DOT_LEADERS = "." * 300
+REPEATED_ROWS = "total amount due net total amount due net " * 15
+
+
+def chunk(text: str, source: str = "manual.pdf"):
+    return {"text": text, "source": source, "metadata": {"source_file": source}}
+
+
+class TestChunkQualityFilter:
+    """Test scoring, drop/flag actions and the per-file report"""
+
+    def test_keeps_prose(self):
+        assert ChunkQualityFilter().filter([chunk(PROSE)]) == [chunk(PROSE)]
+
+    @pytest.mark.parametrize(
+        "text, reason",
+        [(SYMBOL_SOUP, "few_words"), (DOT_LEADERS, "low_entropy"), (REPEATED_ROWS, "repetitive")],
+    )
+    def test_drops_junk(self, text, reason):
+        quality = ChunkQualityFilter()
+        assert quality.filter([chunk(PROSE), chunk(text)]) == [chunk(PROSE)]
+        assert reason in quality.report()[0]["reasons"]
+
+    def test_flag_keeps_junk_with_its_reasons(self):
+        kept = ChunkQualityFilter(action="flag").filter([chunk(PROSE), chunk(DOT_LEADERS)])
+        assert len(kept) == 2
+        assert "quality_flags" not in kept[0]["metadata"]
+        assert "low_entropy" in kept[1]["metadata"]["quality_flags"]
+
+    def test_off_keeps_everything(self):
+        chunks = [chunk(DOT_LEADERS)]
+        assert ChunkQualityFilter(action="off").filter(chunks) is chunks
+
+    def test_rejects_unknown_action(self):
+        with pytest.raises(ValueError):
+            ChunkQualityFilter(action="delete")
+
+    def test_report_ranks_files_by_junk_share(self, tmp_path):
+        quality = ChunkQualityFilter()
+        quality.filter([chunk(PROSE, "clean.pdf"), chunk(PROSE, "scan.pdf"), chunk(DOT_LEADERS, "scan.pdf")])
+        report = quality.report()
+        assert [row["file"] for row in report] == ["scan.pdf", "clean.pdf"]
+        assert (report[0]["chunks"], report[0]["junk"]) == (2, 1)
+
+        path = tmp_path / "quality.json"
+        quality.save_report(str(path))
+        later = ChunkQualityFilter()
+        later.filter([chunk(PROSE, "new.pdf")])
+        later.save_report(str(path))
+        # Incremental runs merge into the report instead of replacing it
+        assert [row["file"] for row in json.loads(path.read_text())["files"]] == ["clean.pdf", "new.pdf", "scan.pdf"]
+
+    def test_settings_change_with_thresholds(self):
+        assert ChunkQualityFilter().settings() != ChunkQualityFilter(min_word_ratio=0.6).settings()
+
+
+class TestChunkerIntegration:
+    """Test that junk never leaves the chunker"""
+
+    def test_chunker_drops_junk_documents(self):
+        chunker = DocumentChunker(chunk_size=1000, chunk_overlap=100, quality=ChunkQualityFilter())
+        docs = [
+            {"content": PROSE, "source": "good.pdf", "category": "vendor"},
+            {"content": REPEATED_ROWS, "source": "table.pdf", "category": "vendor"},
+        ]
+        sources = {c["source"] for c in chunker.chunk_documents(docs)}
+        assert sources == {"good.pdf"}
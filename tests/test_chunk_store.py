@@ -0,0 +1,62 @@
+"""
+Tests for the compact interned chunk store
+"""
+import pytest
+
+from chunk_store import ChunkStore
+from tests.helpers import sample_chunks
+
+
+def odd_chunks():
+    """Chunks the chunker would not produce: extra metadata, custom IDs, missing fields, non-ASCII"""
+    return [
+        {"text": "Zahlungsziel: 30 Tage — netto.", "source": "de.pdf", "chunk_id": "custom-1",
+         "metadata": {"source_file": "de.pdf", "chunk_index": 0, "page": 4, "category": "finance"}},
+        {"text": "No metadata at all.", "chunk_id": ""},
+        {"text": "Negative index kept as extra.", "source": "x.pdf", "chunk_id": "x",
+         "metadata": {"chunk_index": -3}},
+    ]
+
+
+def expected_metadata(chunk):
+    return {"source": chunk.get("source", "Unknown"), "chunk_id": chunk.get("chunk_id", ""), **chunk.get("metadata", {})}
+
+
+@pytest.mark.parametrize("compress", [False, True])
+class TestChunkStore:
+    """Test round trips of text and metadata, in memory and through save/load"""
+
+    def test_round_trip(self, compress):
+        chunks = sample_chunks() + odd_chunks()
+        store = ChunkStore.from_chunks(chunks, compress=compress, block_size=2)
+        assert len(store) == len(chunks)
+        for i, chunk in enumerate(chunks):
+            assert store.text(i) == chunk["text"]
+            assert store.metadata(i) == expected_metadata(chunk)
+
+    def test_round_trip_through_disk(self, compress, tmp_path):
+        chunks = sample_chunks() + odd_chunks()
+        ChunkStore.from_chunks(chunks, compress=compress, block_size=2).save(str(tmp_path))
+        assert ChunkStore.exists(str(tmp_path))
+
+        loaded = ChunkStore.load(str(tmp_path))
+        for i in reversed(range(len(chunks))):
+            assert loaded.text(i) == chunks[i]["text"]
+            assert loaded.metadata(i) == expected_metadata(chunks[i])
+        assert loaded.prefetch() > 0
+
+
+class TestInterning:
+    """Test that repeated strings are stored once"""
+
+    def test_repeated_sources_are_interned(self):
+        store = ChunkStore.from_chunks(sample_chunks() * 50)
+        assert sorted(store.strings) == sorted(
+            {"vendor_manual.pdf", "expense_policy.pdf", "leave_policy.pdf", "vendor", "finance", "hr"}
+        )
+        # Chunker-style IDs are derived, not stored per chunk
+        assert store.extras == {}
+
+    def test_compressed_store_is_smaller(self):
+        chunks = sample_chunks() * 50
+        assert ChunkStore.from_chunks(chunks, compress=True).nbytes() < ChunkStore.from_chunks(chunks).nbytes()
@@ -0,0 +1,122 @@
+"""
+Tests for scatter-gather search over shard servers
+"""
+import json
+import socket
+import threading
+
+import pytest
+
+from distributed_search import DistributedRetriever, RemoteShard, ShardServer
+from embedding_service import _recv, _send
+from metrics import REGISTRY
+from tests.helpers import FakeEmbeddings, build_retriever, sample_chunks
+
+
+@pytest.fixture
+def shards(tmp_path):
+    """Start ShardServers over parts of sample_chunks(); yields a function returning their addresses"""
+    servers = []
+
+    def start(*parts, slow: threading.Event | None = None):
+        addresses = []
+        for i, chunks in enumerate(parts):
+            index_dir = tmp_path / f"shard-{len(servers)}-{i}"
+            build_retriever(chunks).save(str(index_dir))
+            shard = ShardServer(str(index_dir), "127.0.0.1:0")
+            if slow is not None:
+                search = shard.search
+                shard.search = lambda *args: slow.wait(5) and search(*args)
+            server = shard.make_server()
+            threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+            servers.append(server)
+            addresses.append(f"127.0.0.1:{server.server_address[1]}")
+        return addresses
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def unused_address() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"127.0.0.1:{sock.getsockname()[1]}"
+
+
+def halves():
+    chunks = sample_chunks()
+    return chunks[:3], chunks[3:]
+
+
+def failures(reason: str) -> int:
+    return sum(
+        int(float(line.rsplit(" ", 1)[1]))
+        for line in REGISTRY.render().splitlines()
+        if line.startswith("rag_shard_failures_total{") and f'reason="{reason}"' in line
+    )
+
+
+class TestDistributedRetriever:
+    """Test merging, timeouts and partial results"""
+
+    def test_merges_shards_like_one_index(self, shards):
+        retriever = DistributedRetriever(shards(*halves()), embeddings=FakeEmbeddings())
+        flat = build_retriever()
+        for query in ["vendor tax registration", "leave requests", "expense receipts"]:
+            merged = retriever.retrieve(query, top_k=4)
+            expected = flat.retrieve(query, top_k=4)
+            assert [row["text"] for row in merged] == [row["text"] for row in expected]
+            assert [row["score"] for row in merged] == pytest.approx([row["score"] for row in expected])
+
+    def test_filters_apply_on_every_shard(self, shards):
+        retriever = DistributedRetriever(shards(*halves()), embeddings=FakeEmbeddings())
+        rows = retriever.retrieve("policy", top_k=6, filters={"category": "finance"})
+        assert len(rows) == 2 and {row["metadata"]["category"] for row in rows} == {"finance"}
+
+    def test_slow_shard_is_left_out_after_timeout(self, shards, gate):
+        first, second = halves()
+        addresses = shards(first) + shards(second, slow=gate)
+        retriever = DistributedRetriever(addresses, embeddings=FakeEmbeddings(), shard_timeout=0.3)
+        before = failures("timeout")
+
+        rows = retriever.retrieve("policy", top_k=6)
+
+        assert {row["source"] for row in rows} <= {chunk["source"] for chunk in first}
+        assert len(rows) == 3
+        assert failures("timeout") == before + 1
+
+    def test_unreachable_shard_gives_partial_results(self, shards):
+        first, _ = halves()
+        retriever = DistributedRetriever(shards(first) + [unused_address()], embeddings=FakeEmbeddings())
+        before = failures("error")
+        assert len(retriever.retrieve("policy", top_k=6)) == 3
+        assert failures("error") == before + 1
+
+    def test_fails_when_no_shard_answers(self):
+        retriever = DistributedRetriever([unused_address()], embeddings=FakeEmbeddings())
+        with pytest.raises(RuntimeError):
+            retriever.retrieve("policy")
+
+
+class TestShardServer:
+    """Test replies to malformed requests"""
+
+    def test_bad_search_gets_an_error_and_keeps_the_connection(self, shards):
+        (address,) = shards(sample_chunks())
+        shard = RemoteShard(address)
+        with pytest.raises(RuntimeError, match="bad request"):
+            shard._call({"op": "search", "shape": [3, 7], "top_k": 1}, b"\0" * 12)
+        with pytest.raises(RuntimeError, match="bad request"):
+            shard._call({"op": "search", "top_k": 1}, b"\0" * 12)
+        assert shard.info()["vectors"] == len(sample_chunks())
+
+    def test_unreadable_header_gets_an_error(self, shards):
+        (address,) = shards(sample_chunks())
+        host, port = address.split(":")
+        with socket.create_connection((host, int(port)), timeout=5) as sock:
+            sock_file = sock.makefile("rwb")
+            _send(sock_file, b"not json")
+            sock_file.flush()
+            assert "bad request" in json.loads(_recv(sock_file))["error"]
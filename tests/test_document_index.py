@@ -0,0 +1,80 @@
+"""
+Tests for two-stage (document, then chunk) retrieval
+"""
+import numpy as np
+
+from chunk_store import ChunkStore
+from document_index import DocumentIndex
+from tests.helpers import FakeEmbeddings, build_retriever, sample_chunks
+
+
+def members_of(index: DocumentIndex, packed: np.ndarray):
+    return set(np.flatnonzero(np.unpackbits(packed, count=index.size, bitorder="little")).tolist())
+
+
+def built(section_size: int = 0) -> DocumentIndex:
+    chunks = sample_chunks()
+    vectors = np.asarray(FakeEmbeddings().embed_documents([c["text"] for c in chunks]), dtype=np.float32)
+    return DocumentIndex.build(ChunkStore.from_chunks(chunks), vectors, section_size)
+
+
+class TestDocumentIndex:
+    """Test centroids, candidate narrowing and persistence"""
+
+    def test_one_normalized_centroid_per_document(self):
+        index = built()
+        assert len(index) == 3
+        np.testing.assert_allclose(np.linalg.norm(index.centroids, axis=1), 1.0, rtol=1e-5)
+
+    def test_sections_split_documents(self):
+        assert len(built(section_size=1)) == 6
+
+    def test_candidates_are_the_best_documents_chunks(self):
+        index = built()
+        query = np.asarray(FakeEmbeddings().embed_query("Expense claims need receipts"), dtype=np.float32)
+        assert members_of(index, index.candidates(query, 1)) == {2, 3}
+        assert members_of(index, index.candidates(query, 5)) == set(range(6))
+
+    def test_ineligible_documents_are_skipped(self):
+        index = built()
+        query = np.asarray(FakeEmbeddings().embed_query("Expense claims need receipts"), dtype=np.float32)
+        only_leave = np.packbits(np.isin(np.arange(6), [4, 5]), bitorder="little")
+        eligible = index.eligible(only_leave)
+        assert eligible.tolist().count(True) == 1
+        assert members_of(index, index.candidates(query, 2, eligible)) == {4, 5}
+
+    def test_round_trip(self, tmp_path):
+        index = built()
+        index.save(str(tmp_path))
+        assert DocumentIndex.exists(str(tmp_path))
+        loaded = DocumentIndex.load(str(tmp_path), index.size)
+        np.testing.assert_array_equal(loaded.centroids, index.centroids)
+        np.testing.assert_array_equal(loaded.members, index.members)
+
+
+class TestTwoStageRetrieve:
+    """Test that the chunk search only covers candidate documents"""
+
+    def test_searches_only_candidate_documents(self):
+        retriever = build_retriever(doc_candidates=1)
+        rows = retriever.retrieve("Expense claims need receipts and a manager signature.", top_k=5)
+        assert {row["source"] for row in rows} == {"expense_policy.pdf"}
+        assert len(rows) == 2
+
+    def test_matches_flat_search_on_the_best_hit(self):
+        flat = build_retriever()
+        two_stage = build_retriever(doc_candidates=2)
+        for query in ["vendor tax registration", "sick leave doctor", "travel reimbursed"]:
+            assert two_stage.retrieve(query, top_k=1) == flat.retrieve(query, top_k=1)
+
+    def test_filters_narrow_the_candidate_documents(self):
+        retriever = build_retriever(doc_candidates=1)
+        rows = retriever.retrieve("Expense claims need receipts", top_k=5, filters={"category": "hr"})
+        assert {row["source"] for row in rows} == {"leave_policy.pdf"}
+
+    def test_batched_queries_get_their_own_candidates(self):
+        retriever = build_retriever(doc_candidates=1)
+        texts = [sample_chunks()[0]["text"], sample_chunks()[5]["text"]]
+        vectors = FakeEmbeddings().embed_documents(texts)
+        rows = retriever.retrieve_by_vectors(vectors, top_k=5)
+        assert [{row["source"] for row in r} for r in rows] == [{"vendor_manual.pdf"}, {"leave_policy.pdf"}]
@@ -0,0 +1,91 @@
+"""
+Tests for the shared embedding service and its framing
+"""
+import io
+import threading
+
+import numpy as np
+import pytest
+
+from embedding_service import EmbeddingServer, RemoteEmbeddings, _recv, _send, parse_address
+from tests.helpers import FakeEmbeddings
+
+
+class BrokenEmbeddings(FakeEmbeddings):
+    """Fails on texts containing "boom" """
+
+    def embed_documents(self, texts):
+        if any("boom" in text for text in texts):
+            raise RuntimeError("model exploded")
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def service():
+    """Start an EmbeddingServer over BrokenEmbeddings on a free port; yields its address"""
+    server = EmbeddingServer(BrokenEmbeddings(), "fake-model", address="127.0.0.1:0", max_wait=0.01).make_server()
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestFraming:
+    """Test length-prefixed frames and addresses"""
+
+    def test_frames_round_trip(self):
+        buffer = io.BytesIO()
+        for payload in [b"", b"{}", b"x" * 70000]:
+            _send(buffer, payload)
+        buffer.seek(0)
+        assert [_recv(buffer) for _ in range(3)] == [b"", b"{}", b"x" * 70000]
+
+    def test_truncated_frame_is_a_closed_connection(self):
+        buffer = io.BytesIO()
+        _send(buffer, b"hello")
+        for cut in (2, 7):
+            with pytest.raises(ConnectionError):
+                _recv(io.BytesIO(buffer.getvalue()[:cut]))
+
+    def test_parse_address(self):
+        assert parse_address("unix:/tmp/embed.sock") == ("unix", "/tmp/embed.sock")
+        assert parse_address("127.0.0.1:8765") == ("tcp", ("127.0.0.1", 8765))
+        assert parse_address(":9000") == ("tcp", ("127.0.0.1", 9000))
+
+
+class TestRemoteEmbeddings:
+    """Test the client against a running service"""
+
+    def test_matches_local_embeddings(self, service):
+        remote = RemoteEmbeddings(service, model_name="fake-model")
+        local = FakeEmbeddings()
+        texts = ["vendor registration", "expense receipts"]
+        np.testing.assert_allclose(remote.embed_documents(texts), local.embed_documents(texts), rtol=1e-6)
+        np.testing.assert_allclose(remote.embed_query("leave"), local.embed_query("leave"), rtol=1e-6)
+        assert remote.embed_array([]).shape == (0, 26)
+
+    def test_refuses_a_different_model(self, service):
+        with pytest.raises(ValueError):
+            RemoteEmbeddings(service, model_name="other-model")
+
+    def test_error_reply_keeps_the_connection(self, service):
+        remote = RemoteEmbeddings(service)
+        with pytest.raises(RuntimeError, match="model exploded"):
+            remote.embed_documents(["boom"])
+        assert len(remote.embed_query("still works")) == 26
+
+    def test_concurrent_clients_get_their_own_rows(self, service):
+        remote = RemoteEmbeddings(service)
+        texts = [f"question {'abcdefgh'[i]}" * (i + 1) for i in range(8)]
+        results = {}
+
+        def embed(text):
+            results[text] = remote.embed_query(text)
+
+        threads = [threading.Thread(target=embed, args=(text,)) for text in texts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        for text in texts:
+            np.testing.assert_allclose(results[text], FakeEmbeddings().embed_query(text), rtol=1e-6)
@@ -0,0 +1,84 @@
+"""
+Tests for extractive answers and the automatic fallback to them
+"""
+from extractive import ExtractiveAnswerer
+from tests.helpers import FakeEmbeddings, FakeLLM, build_retriever
+
+
+class FailingLLM(FakeLLM):
+    """An LLM backend that is down (like LangChain, the error surfaces once the stream is read)"""
+
+    def _pieces(self):
+        raise ConnectionError("connection refused")
+        yield
+
+
+def chunk(text: str):
+    return {"text": text, "source": "manual.pdf", "score": 0.5, "metadata": {}}
+
+
+class TestExtractiveAnswerer:
+    """Test sentence scoring, citations and deduplication"""
+
+    def test_best_sentence_first_with_its_source(self):
+        answerer = ExtractiveAnswerer(FakeEmbeddings(), max_sentences=2)
+        answer = answerer.answer(
+            "expense receipts",
+            [
+                chunk("Vendors register with a tax ID. Approval takes two working days."),
+                chunk("Expense claims need receipts attached. Travel is booked through the portal."),
+            ],
+        )
+        lines = answer.splitlines()
+        assert len(lines) == 2
+        assert lines[0] == "• Expense claims need receipts attached. [Source 2]"
+
+    def test_repeated_sentences_of_overlapping_chunks_appear_once(self):
+        answerer = ExtractiveAnswerer(FakeEmbeddings(), max_sentences=3)
+        text = "Expense claims need receipts attached."
+        answer = answerer.answer("receipts", [chunk(text), chunk(text)])
+        assert answer == f"• {text} [Source 1]"
+
+    def test_short_fragments_are_ignored(self):
+        answerer = ExtractiveAnswerer(FakeEmbeddings(), min_words=4)
+        assert answerer.answer("receipts", [chunk("1. Receipts.")]) == (
+            "I don't have that information in the provided documents"
+        )
+
+
+class TestFallback:
+    """Test extractive mode and the degraded fallback of "auto" mode"""
+
+    def test_extractive_mode_never_calls_the_llm(self, make_pipeline):
+        llm = FakeLLM()
+        pipeline = make_pipeline(retriever=build_retriever(), llm=llm)
+        result = pipeline.answer_question("vendor registration", mode="extractive")
+        assert result["mode"] == "extractive" and result["fallback"] is None
+        assert "[Source" in result["answer"]
+        assert llm.calls == 0
+
+    def test_auto_falls_back_when_the_backend_fails(self, make_pipeline):
+        llm = FailingLLM()
+        pipeline = make_pipeline(retriever=build_retriever(), llm=llm, answer_mode="auto", single_flight=False)
+
+        first = pipeline.answer_question("vendor registration")
+        assert first["mode"] == "extractive" and first["fallback"] == "backend_error"
+        assert "[Source" in first["answer"]
+
+        # The backend is now marked down: skipped without another attempt
+        second = pipeline.answer_question("expense receipts")
+        assert second["fallback"] == "backend_unhealthy"
+        assert llm.calls == 1
+
+    def test_auto_falls_back_when_generation_breaches_the_slo(self, make_pipeline, gate):
+        pipeline = make_pipeline(
+            retriever=build_retriever(), llm=FakeLLM(gate=gate), answer_mode="auto", generation_slo=0.1
+        )
+        result = pipeline.answer_question("vendor registration")
+        assert result["mode"] == "extractive" and result["fallback"] == "slo"
+
+    def test_generate_mode_reports_the_error_instead(self, make_pipeline):
+        pipeline = make_pipeline(retriever=build_retriever(), llm=FailingLLM())
+        result = pipeline.answer_question("vendor registration")
+        assert result["mode"] == "generate"
+        assert "connection refused" in result["error"]
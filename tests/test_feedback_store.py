@@ -0,0 +1,77 @@
+"""
+Tests for the buffered feedback store
+"""
+import json
+from datetime import datetime, timedelta
+
+from feedback_store import FeedbackStore
+
+
+def record(rating: int, when: datetime | None = None) -> dict:
+    return {"timestamp": (when or datetime.now()).isoformat(), "rating": rating, "comment": ""}
+
+
+class TestFeedbackStore:
+    """Test aggregates and rotation"""
+
+    def test_summary_counts_ratings(self, tmp_path):
+        store = FeedbackStore(str(tmp_path / "feedback.jsonl"), flush_interval=0.01)
+        store.add(record(5))
+        summary = store.add(record(3))
+        store.close()
+        assert summary["count"] == 2
+        assert summary["mean"] == 4.0
+        assert summary["histogram"][5] == 1
+
+    def test_aggregates_survive_deleted_backups(self, tmp_path):
+        path = tmp_path / "feedback.jsonl"
+        store = FeedbackStore(str(path), max_bytes=1, backup_count=1, flush_interval=0.01)
+        for rating in (1, 2, 3, 4, 5):
+            store.add(record(rating))
+            store.flush()  # One batch per file, so every write rotates
+        store.close()
+        assert len(list(tmp_path.glob("feedback.*.jsonl"))) == 1
+
+        restarted = FeedbackStore(str(path), flush_interval=0.01)
+        summary = restarted.summary()
+        restarted.close()
+        assert summary["count"] == 5
+        assert summary["mean"] == 3.0
+
+    def test_counted_file_left_by_a_crash_is_not_counted_twice(self, tmp_path):
+        path = tmp_path / "feedback.jsonl"
+        leftover = tmp_path / "feedback.20240101-000000-000000.jsonl"
+        leftover.write_text(json.dumps(record(4)) + "\n")
+        # The snapshot already holds it, but the process died before deleting it
+        (tmp_path / "feedback.retired.json").write_text(
+            json.dumps({"count": 1, "total": 4, "histogram": {"4": 1}, "files": [leftover.name]})
+        )
+
+        store = FeedbackStore(str(path), flush_interval=0.01)
+        summary = store.summary()
+        store.close()
+        assert summary["count"] == 1
+
+    def test_rotates_by_age_of_first_record_after_restart(self, tmp_path):
+        path = tmp_path / "feedback.jsonl"
+        path.write_text(json.dumps(record(2, datetime.now() - timedelta(days=2))) + "\n")
+
+        store = FeedbackStore(str(path), rotate_seconds=3600, flush_interval=0.01)
+        store.add(record(5))
+        store.flush()
+        store.close()
+
+        assert len(list(tmp_path.glob("feedback.*.jsonl"))) == 1
+        assert [json.loads(line)["rating"] for line in path.read_text().splitlines()] == [5]
+
+    def test_young_file_is_not_rotated(self, tmp_path):
+        path = tmp_path / "feedback.jsonl"
+        path.write_text(json.dumps(record(2)) + "\n")
+
+        store = FeedbackStore(str(path), rotate_seconds=3600, flush_interval=0.01)
+        store.add(record(5))
+        store.flush()
+        store.close()
+
+        assert not list(tmp_path.glob("feedback.*.jsonl"))
+        assert len(path.read_text().splitlines()) == 2
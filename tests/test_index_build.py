@@ -0,0 +1,101 @@
+"""
+Tests for checkpointed, resumable index builds
+"""
+import pytest
+
+from config import Config
+from index_build import CheckpointedIndexBuild, Progress
+from index_versions import IndexVersions, open_index
+from tests.helpers import FakeEmbeddings
+
+WORDS = ["vendor", "expense", "invoice", "approval", "leave", "receipt", "purchase", "budget"]
+
+
+class Interrupted(Exception):
+    pass
+
+
+class FlakyEmbeddings(FakeEmbeddings):
+    """Counts embedded texts and raises once `fail_after` batches were embedded"""
+
+    def __init__(self, fail_after: int | None = None):
+        self.fail_after = fail_after
+        self.batches = 0
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        if self.fail_after is not None and self.batches >= self.fail_after:
+            raise Interrupted()
+        self.batches += 1
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def raw(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "CHUNK_QUALITY", "off")
+    monkeypatch.setattr(Config, "SHARD_BY_CATEGORY", False)
+    monkeypatch.setattr(Config, "QUERY_BATCH_SIZE", 0)
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    for i, word in enumerate(WORDS[:4]):
+        text = " ".join(f"{word} {WORDS[(i + n) % len(WORDS)]} policy{n}" for n in range(400))
+        (raw_dir / f"{word}.txt").write_text(text)
+    return raw_dir
+
+
+def make_build(tmp_path, raw, embeddings):
+    return CheckpointedIndexBuild(
+        str(raw), str(tmp_path / "index"), str(tmp_path / "build"), part_size=2, embeddings=embeddings
+    )
+
+
+class TestCheckpointedIndexBuild:
+    """Test resume after interruption, restart on change and publishing"""
+
+    def test_resumes_after_interruption(self, tmp_path, raw):
+        with pytest.raises(Interrupted):
+            make_build(tmp_path, raw, FlakyEmbeddings(fail_after=2)).run()
+        assert (tmp_path / "build" / "state.json").exists()
+
+        embeddings = FlakyEmbeddings()
+        summary = make_build(tmp_path, raw, embeddings).run()
+
+        # Only the chunks after the last checkpoint were embedded again
+        assert embeddings.embedded == summary["chunks"] - 4
+        assert not (tmp_path / "build").exists()
+        assert IndexVersions(str(tmp_path / "index")).current() == summary["version"]
+
+        fresh = tmp_path / "fresh"
+        reference = CheckpointedIndexBuild(
+            str(raw), str(fresh / "index"), str(fresh / "build"), part_size=2, embeddings=FakeEmbeddings()
+        ).run()
+        resumed_index = open_index(str(tmp_path / "index" / "versions" / summary["version"]), FakeEmbeddings())
+        fresh_index = open_index(str(fresh / "index" / "versions" / reference["version"]), FakeEmbeddings())
+        for query in WORDS:
+            assert resumed_index.retrieve(query, top_k=3) == fresh_index.retrieve(query, top_k=3)
+
+    def test_starts_over_when_inputs_change(self, tmp_path, raw):
+        with pytest.raises(Interrupted):
+            make_build(tmp_path, raw, FlakyEmbeddings(fail_after=1)).run()
+        (raw / "vendor.txt").write_text("vendor " * 500)
+
+        embeddings = FlakyEmbeddings()
+        summary = make_build(tmp_path, raw, embeddings).run()
+        assert embeddings.embedded == summary["chunks"]
+
+    def test_nothing_to_index(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "CHUNK_QUALITY", "off")
+        (tmp_path / "empty").mkdir()
+        assert make_build(tmp_path, tmp_path / "empty", FakeEmbeddings()).run() is None
+
+
+class TestProgress:
+    """Test rate and ETA lines"""
+
+    def test_rate_ignores_restored_work(self):
+        progress = Progress("embed", total=100, unit="chunks", done=50)
+        assert progress.line().startswith("  [embed] 50/100 chunks (50%)")
+        assert "ETA ?" in progress.line()
+        progress.update(10)
+        assert "60/100" in progress.line()
@@ -0,0 +1,98 @@
+"""
+Tests for versioned indexes and hot swapping
+"""
+import threading
+
+import pytest
+
+from config import Config
+from index_versions import HotSwapRetriever, IndexVersions, open_index
+from tests.helpers import FakeEmbeddings, build_retriever, wait_until
+
+
+@pytest.fixture(autouse=True)
+def unbatched(monkeypatch):
+    monkeypatch.setattr(Config, "QUERY_BATCH_SIZE", 0)
+
+
+def publish(versions: IndexVersions, keep: int = 3) -> str:
+    staging = versions.staging_dir()
+    build_retriever().save(str(staging))
+    return versions.publish(staging, keep=keep)
+
+
+class GatedLoader:
+    """open_index whose retrievers block retrieve() until the gate opens"""
+
+    def __init__(self, gate: threading.Event):
+        self.gate = gate
+        self.waiting = 0
+
+    def __call__(self, path, embeddings):
+        retriever = open_index(path, embeddings)
+        inner = retriever.retrieve
+
+        def retrieve(*args, **kwargs):
+            self.waiting += 1
+            self.gate.wait(5)
+            return inner(*args, **kwargs)
+
+        retriever.retrieve = retrieve
+        return retriever
+
+
+class TestIndexVersions:
+    """Test publish, swap and prune"""
+
+    def test_publish_repoints_current_and_prunes_old_versions(self, tmp_path):
+        versions = IndexVersions(str(tmp_path))
+        published = [publish(versions, keep=2) for _ in range(3)]
+        assert versions.current() == published[-1]
+        assert versions.list() == published[1:]
+
+    def test_reload_swaps_to_published_version(self, tmp_path):
+        versions = IndexVersions(str(tmp_path))
+        first = publish(versions)
+        hot = HotSwapRetriever(str(tmp_path), embeddings=FakeEmbeddings())
+        assert hot.current_version == first
+        assert not hot.reload()
+
+        second = publish(versions)
+        assert hot.reload()
+        assert hot.current_version == second
+        assert hot.retrieve("vendor registration", top_k=1)[0]["source"] == "vendor_manual.pdf"
+
+    def test_prune_keeps_version_still_being_served(self, tmp_path):
+        versions = IndexVersions(str(tmp_path))
+        first = publish(versions)
+        hot = HotSwapRetriever(str(tmp_path), embeddings=FakeEmbeddings())
+
+        # Another process publishing must not delete the version this one serves
+        second = publish(versions, keep=1)
+        assert versions.list() == [first, second]
+
+        hot.reload()
+        publish(versions, keep=1)
+        assert first not in versions.list()
+        assert second in versions.list()
+
+    def test_prune_waits_for_in_flight_reader(self, tmp_path, gate):
+        versions = IndexVersions(str(tmp_path))
+        first = publish(versions)
+        loader = GatedLoader(gate)
+        hot = HotSwapRetriever(str(tmp_path), embeddings=FakeEmbeddings(), loader=loader)
+        results = []
+        reader = threading.Thread(target=lambda: results.append(hot.retrieve("vendor", top_k=1)))
+        reader.start()
+        wait_until(lambda: loader.waiting == 1)
+
+        publish(versions)
+        hot.reload()
+        publish(versions, keep=1)
+        assert first in versions.list()
+
+        gate.set()
+        reader.join(5)
+        assert results and results[0][0]["source"] == "vendor_manual.pdf"
+        publish(versions, keep=1)
+        assert first not in versions.list()
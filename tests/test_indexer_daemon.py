@@ -0,0 +1,76 @@
+"""
+Tests for incremental indexing
+"""
+import os
+
+import pytest
+
+from config import Config
+from indexer_daemon import IndexerDaemon
+from tests.helpers import FakeEmbeddings
+
+VENDOR_TEXT = "Vendors register with a tax ID and a business license. " * 20
+EXPENSE_TEXT = "Expense claims need receipts and a manager signature. " * 20
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    """FakeEmbeddings that counts the texts it embeds"""
+
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def raw(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "CHUNK_QUALITY", "off")
+    monkeypatch.setattr(Config, "SHARD_BY_CATEGORY", False)
+    monkeypatch.setattr(Config, "QUERY_BATCH_SIZE", 0)
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    (raw_dir / "vendor.txt").write_text(VENDOR_TEXT)
+    (raw_dir / "expense.txt").write_text(EXPENSE_TEXT)
+    return raw_dir
+
+
+def make_daemon(tmp_path, raw, embeddings):
+    return IndexerDaemon(
+        str(raw), str(tmp_path / "index"), str(tmp_path / "cache"), embeddings=embeddings
+    )
+
+
+class TestIndexerDaemon:
+    """Test that only changed files are re-embedded"""
+
+    def test_reembeds_only_changed_and_removed_files(self, tmp_path, raw):
+        embeddings = CountingEmbeddings()
+        daemon = make_daemon(tmp_path, raw, embeddings)
+        first = daemon.sync()
+        assert first["changed"] == ["expense.txt", "vendor.txt"] and first["version"]
+
+        assert daemon.sync()["version"] is None
+
+        embedded = embeddings.embedded
+        (raw / "vendor.txt").write_text(VENDOR_TEXT + "Approval takes two days.")
+        summary = daemon.sync()
+        assert summary["changed"] == ["vendor.txt"]
+        assert 0 < embeddings.embedded - embedded < embedded
+
+        os.remove(raw / "expense.txt")
+        summary = daemon.sync()
+        assert summary["removed"] == ["expense.txt"] and summary["version"]
+
+    def test_cache_survives_restart(self, tmp_path, raw):
+        make_daemon(tmp_path, raw, CountingEmbeddings()).sync()
+        embeddings = CountingEmbeddings()
+        assert make_daemon(tmp_path, raw, embeddings).sync()["changed"] == []
+        assert embeddings.embedded == 0
+
+    def test_settings_change_drops_cache(self, tmp_path, raw, monkeypatch):
+        make_daemon(tmp_path, raw, CountingEmbeddings()).sync()
+        monkeypatch.setattr(Config, "CHUNK_SIZE", Config.CHUNK_SIZE // 2)
+        summary = make_daemon(tmp_path, raw, CountingEmbeddings()).sync()
+        assert summary["changed"] == ["expense.txt", "vendor.txt"]
@@ -0,0 +1,64 @@
+"""
+Tests for metadata filters applied inside the FAISS search
+"""
+import pytest
+
+from chunk_store import ChunkStore
+from embeddings_store import RAGRetriever
+from metadata_index import MetadataIndex, check_filters
+from tests.helpers import FakeEmbeddings, build_retriever, sample_chunks
+
+
+@pytest.fixture
+def index():
+    return MetadataIndex(ChunkStore.from_chunks(sample_chunks()))
+
+
+def selected(selection):
+    return selection.count if selection is not None else 0
+
+
+class TestMetadataIndex:
+    """Test bitmap selection"""
+
+    def test_values_of_a_field_are_ored(self, index):
+        assert selected(index.select({"category": "vendor"})) == 2
+        assert selected(index.select({"category": ["vendor", "hr"]})) == 4
+        assert selected(index.select({"source": "leave_policy.pdf"})) == 2
+
+    def test_fields_are_anded(self, index):
+        assert selected(index.select({"category": ["vendor", "hr"], "chunk_range": [1, 1]})) == 2
+        assert selected(index.select({"category": "vendor", "source_file": "leave_policy.pdf"})) == 0
+
+    def test_unknown_value_selects_nothing(self, index):
+        assert selected(index.select({"category": "missing"})) == 0
+
+    @pytest.mark.parametrize(
+        "filters",
+        [{"bogus": "x"}, {"chunk_range": 3}, {"chunk_range": [1]}, {"chunk_range": ["a", "b"]}],
+    )
+    def test_rejects_bad_filters(self, index, filters):
+        with pytest.raises(ValueError):
+            check_filters(filters)
+        with pytest.raises(ValueError):
+            index.select(filters)
+
+
+class TestFilteredRetrieve:
+    """Test that filters narrow the search instead of the results"""
+
+    def test_returns_top_k_matches_of_a_rare_value(self):
+        retriever = build_retriever()
+        # Unfiltered, the best hits for this query are vendor chunks
+        rows = retriever.retrieve("vendor registration", top_k=2, filters={"source_file": "leave_policy.pdf"})
+        assert [row["source"] for row in rows] == ["leave_policy.pdf", "leave_policy.pdf"]
+
+    def test_no_match_returns_nothing(self):
+        assert build_retriever().retrieve("vendor", filters={"category": "missing"}) == []
+
+    def test_filters_survive_save_and_load(self, tmp_path):
+        build_retriever().save(str(tmp_path))
+        loaded = RAGRetriever(embeddings=FakeEmbeddings())
+        loaded.load(str(tmp_path))
+        rows = loaded.retrieve("policy", top_k=6, filters={"category": "finance", "chunk_range": [0, 0]})
+        assert [row["text"] for row in rows] == [sample_chunks()[2]["text"]]
@@ -0,0 +1,107 @@
+"""
+Tests for stage timing and the metrics endpoint
+"""
+import threading
+import urllib.request
+
+from metrics import MetricsRegistry, StageTimer, attribute, record, span, start_metrics_server
+from tests.helpers import FakeLLM, build_retriever
+
+
+class TestMetricsRegistry:
+    """Test histograms, counters, gauges and rendering"""
+
+    def test_renders_prometheus_text(self):
+        registry = MetricsRegistry()
+        registry.describe("latency_seconds", "Request latency")
+        registry.observe("latency_seconds", 0.003, stage="search")
+        registry.observe("latency_seconds", 0.2, stage="search")
+        registry.inc("requests_total", reason="ok")
+        registry.gauge("queue_depth", lambda: 3)
+
+        rendered = registry.render()
+        assert "# HELP latency_seconds Request latency" in rendered
+        assert 'latency_seconds_bucket{stage="search",le="0.005"} 1' in rendered
+        assert 'latency_seconds_bucket{stage="search",le="+Inf"} 2' in rendered
+        assert 'latency_seconds_count{stage="search"} 2' in rendered
+        assert 'requests_total{reason="ok"} 1.0' in rendered
+        assert "queue_depth 3.0" in rendered
+
+    def test_failing_gauge_is_skipped(self):
+        registry = MetricsRegistry()
+        registry.gauge("broken", lambda: 1 / 0)
+        assert "broken" not in registry.render()
+
+    def test_snapshot_quantiles(self):
+        registry = MetricsRegistry()
+        for value in range(1, 101):
+            registry.observe("x", float(value))
+        snapshot = registry.snapshot()["x"]
+        assert snapshot["count"] == 100
+        assert 50.0 <= snapshot["p50"] <= 51.0
+        assert snapshot["p99"] >= 99.0
+
+
+class TestStageTimer:
+    """Test spans recording into the active timer only"""
+
+    def test_spans_record_into_the_active_timer(self):
+        registry = MetricsRegistry()
+        timer = StageTimer(registry)
+        with timer.activate():
+            with span("embed_query"):
+                pass
+            record("llm_total", 0.5)
+            record("llm_total", 0.25)
+        with span("outside"):
+            pass
+
+        assert set(timer.timings) == {"embed_query", "llm_total"}
+        assert timer.as_dict()["llm_total"] == 750.0
+        assert registry.snapshot()['rag_stage_seconds{stage="llm_total"}']["count"] == 2
+
+    def test_timers_of_concurrent_requests_stay_apart(self):
+        timers = [StageTimer(MetricsRegistry()) for _ in range(2)]
+
+        def run(timer, stage):
+            with timer.activate():
+                record(stage, 0.1)
+
+        threads = [threading.Thread(target=run, args=(t, f"stage{i}")) for i, t in enumerate(timers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(2)
+        assert [list(t.timings) for t in timers] == [["stage0"], ["stage1"]]
+
+    def test_attribute_adds_without_observing_again(self):
+        registry = MetricsRegistry()
+        timer = StageTimer(registry)
+        with timer.activate():
+            attribute({"faiss_search": 0.01})
+        assert timer.timings == {"faiss_search": 0.01}
+        assert registry.snapshot() == {}
+
+
+class TestRequestTimings:
+    """Test the stage breakdown of a full request and the /metrics endpoint"""
+
+    def test_answer_reports_every_stage(self, make_pipeline):
+        pipeline = make_pipeline(retriever=build_retriever(), llm=FakeLLM(tokens=3))
+        timings = pipeline.answer_question("vendor registration")["timings"]
+        for stage in ["retrieve", "embed_query", "faiss_search", "prompt_build", "llm_first_token", "llm_total", "total"]:
+            assert stage in timings
+        assert timings["total"] >= timings["retrieve"]
+
+    def test_metrics_endpoint_serves_stage_histograms(self, make_pipeline):
+        make_pipeline(retriever=build_retriever()).answer_question("vendor registration")
+        server = start_metrics_server(port=0, host="127.0.0.1")
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert "# TYPE rag_stage_seconds histogram" in body
+        assert 'rag_stage_seconds_count{stage="faiss_search"}' in body
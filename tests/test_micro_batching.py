@@ -0,0 +1,101 @@
+"""
+Tests for micro-batched retrieval
+"""
+import threading
+
+import pytest
+
+from embedding_service import MicroBatcher
+from metrics import REGISTRY, size_buckets
+from sharding import ShardedRetriever
+from tests.helpers import FakeEmbeddings, build_retriever, sample_chunks
+
+
+class TestMicroBatcher:
+    """Test per-caller results and errors"""
+
+    def test_exception_result_fails_only_its_caller(self):
+        def fn(items):
+            return [ValueError(item) if item < 0 else item * 2 for item in items]
+
+        batcher = MicroBatcher(fn, max_batch=4, max_wait=0.0)
+        assert batcher.submit([3]) == [6]
+        with pytest.raises(ValueError):
+            batcher.submit([-1])
+        assert batcher.submit([4]) == [8]
+
+    def test_batch_size_histogram_counts_items(self):
+        assert size_buckets(32) == (1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+        assert size_buckets(6) == (1.0, 2.0, 4.0, 6.0)
+
+        batcher = MicroBatcher(lambda items: items, max_batch=8, name="size-test")
+        batcher.submit([1, 2, 3])
+        rendered = REGISTRY.render()
+        assert 'rag_batch_size_bucket{batcher="size-test",le="2.0"} 0' in rendered
+        assert 'rag_batch_size_bucket{batcher="size-test",le="4.0"} 1' in rendered
+
+
+class TestBatchedRetrieve:
+    """Test that queries sharing a batch match single-query results"""
+
+    def test_batched_results_match_unbatched(self):
+        batched = build_retriever(query_batch_size=4, query_batch_wait=0.01)
+        single = build_retriever()
+        for query in ["vendor tax registration", "expense receipts"]:
+            assert batched.retrieve(query, top_k=2) == single.retrieve(query, top_k=2)
+
+    def test_bad_filter_is_rejected_before_batching(self):
+        retriever = build_retriever(query_batch_size=4)
+        with pytest.raises(ValueError):
+            retriever.retrieve("vendor", filters={"bogus": "x"})
+        with pytest.raises(ValueError):
+            retriever.retrieve("vendor", filters={"chunk_range": 3})
+
+    def test_invalid_query_does_not_fail_its_batch(self):
+        retriever = build_retriever(query_batch_size=2, query_batch_wait=1.0)
+        barrier = threading.Barrier(2)
+        outcomes = {}
+
+        def submit(name, filters):
+            barrier.wait()
+            try:
+                outcomes[name] = retriever.batcher.submit([("vendor registration", 2, filters)])[0]
+            except Exception as e:
+                outcomes[name] = e
+
+        # Submitted to the batcher directly, so the bad filter gets past retrieve()'s check
+        threads = [
+            threading.Thread(target=submit, args=("valid", {"category": "vendor"})),
+            threading.Thread(target=submit, args=("invalid", {"chunk_range": ("a", "b")})),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        assert isinstance(outcomes["invalid"], Exception)
+        rows, _ = outcomes["valid"]
+        assert [row["metadata"]["category"] for row in rows] == ["vendor", "vendor"]
+
+
+class TestBatchedShardedRetrieve:
+    """Test the same contracts on the sharded retriever"""
+
+    def build(self, **kwargs):
+        retriever = ShardedRetriever(embeddings=FakeEmbeddings(), **kwargs)
+        retriever.index_documents(sample_chunks())
+        return retriever
+
+    def test_batched_results_match_unbatched(self):
+        batched = self.build(query_batch_size=4, query_batch_wait=0.01)
+        single = self.build()
+        for query, filters in [("vendor tax registration", None), ("policy", {"category": "hr"})]:
+            assert batched.retrieve(query, top_k=2, filters=filters) == single.retrieve(query, top_k=2, filters=filters)
+
+    def test_failing_filter_group_does_not_fail_the_others(self):
+        retriever = self.build()
+        results = retriever._search_batch(
+            [("vendor", 2, {"category": "vendor"}), ("vendor", 2, {"chunk_range": ("a", "b")})]
+        )
+        assert [row["metadata"]["category"] for row in results[0]] == ["vendor", "vendor"]
+        assert isinstance(results[1], Exception)
@@ -0,0 +1,62 @@
+"""
+Tests for request profiling
+"""
+from pathlib import Path
+
+import pytest
+
+from profiling import PROFILER, active
+from tests.helpers import build_retriever
+
+
+@pytest.fixture
+def profiler(tmp_path, monkeypatch):
+    """The global profiler, writing to a temporary directory and capturing nothing unforced"""
+    monkeypatch.setattr(PROFILER, "output_dir", tmp_path)
+    monkeypatch.setattr(PROFILER, "kinds", set())
+    monkeypatch.setattr(PROFILER, "sample_rate", 0.0)
+    return PROFILER
+
+
+def written(profiler):
+    return sorted(path.name for path in profiler.output_dir.glob("*.txt"))
+
+
+class TestProfiler:
+    """Test captures, naming and nesting"""
+
+    def test_captures_only_when_wanted(self, profiler):
+        with profiler.capture("retrieve", "skipped") as capture:
+            assert not active()
+        assert capture.path is None
+
+        with profiler.capture("retrieve", "forced", force=True) as capture:
+            assert active()
+        assert capture.path.exists()
+        assert written(profiler) == [capture.path.with_suffix(".txt").name]
+
+    def test_nested_capture_is_skipped(self, profiler):
+        with profiler.capture("answer", "outer", force=True):
+            with profiler.capture("retrieve", "inner", force=True) as inner:
+                pass
+        assert inner.path is None
+        assert len(written(profiler)) == 1
+
+    def test_retrieve_profile_is_named_by_request_id(self, profiler, monkeypatch):
+        retriever = build_retriever()
+        monkeypatch.setattr(profiler, "kinds", {"retrieve"})
+
+        retriever.retrieve("what is the vendor tax ID?", request_id="req-42")
+        retriever.retrieve("what is the vendor tax ID?")
+
+        names = written(profiler)
+        assert len(names) == 2
+        assert any(name.endswith("-retrieve-req-42.txt") for name in names)
+        # Without a request ID the name is generated, never the user's query
+        assert not any("vendor" in name for name in names)
+
+    def test_profiled_answer_reports_its_profile(self, profiler, make_pipeline):
+        pipeline = make_pipeline(retriever=build_retriever())
+        result = pipeline.answer_question("vendor registration", request_id="req-7", profile=True)
+        assert result["profile"].endswith("-answer-req-7.prof")
+        assert written(profiler) == [Path(result["profile"]).with_suffix(".txt").name]
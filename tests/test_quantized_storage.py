@@ -0,0 +1,85 @@
+"""
+Tests for fp16/int8 scalar-quantized vector storage and exact re-rank
+"""
+import numpy as np
+import pytest
+
+from embeddings_store import RAGRetriever
+from tests.helpers import FakeEmbeddings
+
+SIZE, DIM, TOP_K = 1000, 32, 10
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((SIZE, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = vectors[rng.integers(0, SIZE, 50)]
+    queries = picks + 0.05 * rng.standard_normal(picks.shape).astype(np.float32)
+    chunks = [
+        {"text": f"chunk {i}", "source": "bench.pdf", "metadata": {"source_file": "bench.pdf", "chunk_index": i}}
+        for i in range(SIZE)
+    ]
+    return chunks, vectors, queries
+
+
+def build(corpus, storage: str, rerank_factor: int = 0) -> RAGRetriever:
+    chunks, vectors, _ = corpus
+    retriever = RAGRetriever(embeddings=FakeEmbeddings(), storage=storage, rerank_factor=rerank_factor)
+    retriever.index_embeddings(chunks, vectors)
+    return retriever
+
+
+def recall(retriever: RAGRetriever, corpus) -> float:
+    _, vectors, queries = corpus
+    exact = np.argsort(((vectors[None, :, :] - queries[:, None, :]) ** 2).sum(axis=2), axis=1)[:, :TOP_K]
+    found = retriever.retrieve_by_vectors(queries, top_k=TOP_K)
+    hits = sum(
+        len({row["metadata"]["chunk_index"] for row in rows} & set(truth.tolist()))
+        for rows, truth in zip(found, exact)
+    )
+    return hits / (len(queries) * TOP_K)
+
+
+class TestQuantizedStorage:
+    """Test memory, recall and re-rank per storage format"""
+
+    def test_rejects_unknown_storage(self):
+        with pytest.raises(ValueError):
+            RAGRetriever(embeddings=FakeEmbeddings(), storage="int4")
+
+    def test_shrinks_index_memory(self, corpus):
+        fp32 = build(corpus, "fp32").memory_bytes()
+        assert build(corpus, "fp16").memory_bytes() == fp32 // 2
+        assert build(corpus, "int8").memory_bytes() == fp32 // 4
+
+    def test_recall_against_exact_search(self, corpus):
+        assert recall(build(corpus, "fp32"), corpus) == 1.0
+        assert recall(build(corpus, "fp16"), corpus) >= 0.98
+        int8 = recall(build(corpus, "int8"), corpus)
+        reranked = recall(build(corpus, "int8", rerank_factor=4), corpus)
+        assert reranked >= int8
+        assert reranked >= 0.98
+
+    def test_rerank_scores_are_exact(self, corpus):
+        _, _, queries = corpus
+        exact = build(corpus, "fp32").retrieve_by_vectors(queries[:5], top_k=TOP_K)
+        reranked = build(corpus, "int8", rerank_factor=4).retrieve_by_vectors(queries[:5], top_k=TOP_K)
+        for exact_rows, reranked_rows in zip(exact, reranked):
+            exact_scores = {row["metadata"]["chunk_index"]: row["score"] for row in exact_rows}
+            for row in reranked_rows:
+                if row["metadata"]["chunk_index"] in exact_scores:
+                    assert row["score"] == pytest.approx(exact_scores[row["metadata"]["chunk_index"]], abs=1e-5)
+
+    def test_full_vectors_are_memory_mapped_after_load(self, corpus, tmp_path):
+        _, _, queries = corpus
+        built = build(corpus, "int8", rerank_factor=4)
+        before = built.retrieve_by_vectors(queries[:5], top_k=TOP_K)
+        built.save(str(tmp_path))
+
+        loaded = RAGRetriever(embeddings=FakeEmbeddings(), rerank_factor=4)
+        loaded.load(str(tmp_path))
+        assert isinstance(loaded.full_vectors, np.memmap)
+        assert loaded.memory_bytes() == built.memory_bytes()
+        assert loaded.retrieve_by_vectors(queries[:5], top_k=TOP_K) == before
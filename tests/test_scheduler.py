@@ -0,0 +1,205 @@
+"""
+Tests for admission control and the bounded FIFO queue
+"""
+import os
+import threading
+
+import pytest
+
+from cancellation import CancelToken, GenerationCancelled
+from scheduler import RequestScheduler, SchedulerBusy, SharedSlots
+from tests.helpers import wait_until
+
+
+def start(scheduler, fn, *args):
+    """Run scheduler.run(fn, *args) on a thread; its result or exception lands in `outcome`"""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = scheduler.run(fn, *args)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+class TestRequestScheduler:
+    """Test slots, queue order and rejections"""
+
+    def test_runs_and_returns_result(self):
+        scheduler = RequestScheduler(max_in_flight=1)
+        assert scheduler.run(lambda a, b=0: a + b, 2, b=3) == 5
+        assert scheduler.stats()["admitted"] == 1
+
+    def test_rejects_invalid_limits(self):
+        with pytest.raises(ValueError):
+            RequestScheduler(max_in_flight=0)
+        with pytest.raises(ValueError):
+            RequestScheduler(max_queue_size=-1)
+
+    def test_caps_concurrent_requests(self, gate):
+        scheduler = RequestScheduler(max_in_flight=2, max_queue_size=8)
+        threads = [start(scheduler, gate.wait)[0] for _ in range(5)]
+
+        wait_until(lambda: scheduler.stats()["queue_depth"] == 3)
+        assert scheduler.stats()["in_flight"] == 2
+
+        gate.set()
+        for thread in threads:
+            thread.join(2)
+        assert scheduler.stats()["in_flight"] == 0
+        assert scheduler.stats()["admitted"] == 5
+
+    def test_admits_in_arrival_order(self, gate):
+        scheduler = RequestScheduler(max_in_flight=1, max_queue_size=8)
+        order = []
+        blocker, _ = start(scheduler, gate.wait)
+        wait_until(lambda: scheduler.stats()["in_flight"] == 1)
+
+        threads = []
+        for i in range(5):
+            threads.append(start(scheduler, order.append, i)[0])
+            # Next arrival only once this one holds its ticket
+            wait_until(lambda: scheduler.stats()["queue_depth"] == i + 1)
+
+        gate.set()
+        for thread in [blocker, *threads]:
+            thread.join(2)
+        assert order == [0, 1, 2, 3, 4]
+
+    def test_rejects_when_queue_is_full(self, gate):
+        scheduler = RequestScheduler(max_in_flight=1, max_queue_size=1)
+        start(scheduler, gate.wait)
+        start(scheduler, gate.wait)
+        wait_until(lambda: scheduler.stats()["queue_depth"] == 1)
+
+        with pytest.raises(SchedulerBusy) as busy:
+            scheduler.run(lambda: None)
+        assert busy.value.reason == "queue full"
+        assert busy.value.queue_depth == 1
+        assert scheduler.stats()["rejected_full"] == 1
+
+    def test_rejects_after_queue_timeout(self, gate):
+        scheduler = RequestScheduler(max_in_flight=1, max_queue_size=4, queue_timeout=0.1)
+        start(scheduler, gate.wait)
+        wait_until(lambda: scheduler.stats()["in_flight"] == 1)
+
+        with pytest.raises(SchedulerBusy) as busy:
+            scheduler.run(lambda: None)
+        assert busy.value.reason == "queue timeout"
+        assert scheduler.stats()["rejected_timeout"] == 1
+        assert scheduler.stats()["queue_depth"] == 0
+
+    def test_timed_out_ticket_does_not_stall_the_queue(self, gate):
+        scheduler = RequestScheduler(max_in_flight=1, max_queue_size=4, queue_timeout=0.2)
+        blocker, _ = start(scheduler, gate.wait)
+        wait_until(lambda: scheduler.stats()["in_flight"] == 1)
+        _, timed_out = start(scheduler, lambda: "late")
+        wait_until(lambda: "error" in timed_out)
+
+        gate.set()
+        blocker.join(2)
+        # The abandoned ticket is skipped instead of waited for
+        assert scheduler.run(lambda: "next") == "next"
+
+    def test_cancelled_request_leaves_the_queue(self, gate):
+        scheduler = RequestScheduler(max_in_flight=1, max_queue_size=1, queue_timeout=5.0)
+        blocker, _ = start(scheduler, gate.wait)
+        wait_until(lambda: scheduler.stats()["in_flight"] == 1)
+
+        token = CancelToken()
+        outcome = {}
+
+        def queued():
+            try:
+                scheduler.run(lambda cancel: "ran", cancel=token)
+            except Exception as e:
+                outcome["error"] = e
+
+        waiter = threading.Thread(target=queued, daemon=True)
+        waiter.start()
+        wait_until(lambda: scheduler.stats()["queue_depth"] == 1)
+
+        token.cancel("disconnected")
+        waiter.join(2)
+        assert isinstance(outcome["error"], GenerationCancelled)
+        assert scheduler.stats()["queue_depth"] == 0
+
+        # Its queue place is free again and its ticket doesn't stall the next request
+        _, after = start(scheduler, lambda: "next")
+        gate.set()
+        blocker.join(2)
+        wait_until(lambda: after.get("result") == "next")
+
+    def test_failing_request_frees_its_slot(self):
+        scheduler = RequestScheduler(max_in_flight=1, queue_timeout=0.5)
+
+        def fail():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            scheduler.run(fail)
+        assert scheduler.stats()["in_flight"] == 0
+        assert scheduler.run(lambda: "ok") == "ok"
+
+    def test_records_wait_times(self):
+        scheduler = RequestScheduler(max_in_flight=1)
+        for _ in range(3):
+            scheduler.run(lambda: None)
+        stats = scheduler.stats()
+        assert stats["wait_max"] >= stats["wait_p50"] >= 0.0
+        assert stats["wait_avg"] <= stats["wait_max"]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="shared slots are for forked workers")
+class TestSharedSlots:
+    """Test generation slots shared between worker processes"""
+
+    def test_caps_generations_across_schedulers(self, tmp_path, gate):
+        slots = SharedSlots(str(tmp_path), 2)
+        # Separate schedulers stand in for separate workers, each allowing 2 locally
+        schedulers = [RequestScheduler(max_in_flight=2, shared_slots=slots) for _ in range(3)]
+        running = []
+        lock = threading.Lock()
+        peak = []
+
+        def generate():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            gate.wait()
+            with lock:
+                running.pop()
+
+        threads = [start(scheduler, generate)[0] for scheduler in schedulers for _ in range(2)]
+        wait_until(lambda: len(running) == 2)
+        gate.set()
+        for thread in threads:
+            thread.join(2)
+        assert max(peak) == 2
+        assert len(peak) == 6
+
+    def test_times_out_waiting_for_a_shared_slot(self, tmp_path):
+        slots = SharedSlots(str(tmp_path), 1)
+        held = slots.acquire(0)
+        scheduler = RequestScheduler(max_in_flight=2, queue_timeout=0.1, shared_slots=slots)
+
+        with pytest.raises(SchedulerBusy) as busy:
+            scheduler.run(lambda: None)
+        assert busy.value.reason == "queue timeout"
+        assert scheduler.stats()["in_flight"] == 0
+
+        slots.release(held)
+        assert scheduler.run(lambda: "ok") == "ok"
+
+    def test_slot_of_an_exited_process_is_free(self, tmp_path):
+        slots = SharedSlots(str(tmp_path), 1)
+        pid = os.fork()
+        if pid == 0:
+            slots.acquire(0)
+            os._exit(0)  # Exits holding the slot
+        os.waitpid(pid, 0)
+        assert slots.acquire(0.5) is not None
@@ -0,0 +1,89 @@
+"""
+Tests for the JSON query API
+"""
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from scheduler import RequestScheduler
+from serving import start_api_server
+
+
+class FakePipeline:
+    """Answers every question after a short 'generation' run through the caller's admission"""
+
+    def __init__(self, seconds: float = 0.02):
+        self.seconds = seconds
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def answer_question(self, question, cancel=None, admit=None, **kwargs):
+        return admit(self._generate, question)
+
+    def _generate(self, question):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+        return {"answer": question.upper()}
+
+
+@pytest.fixture
+def api():
+    """(base URL, pipeline, scheduler) of an API server with a one-slot, no-queue scheduler"""
+    pipeline = FakePipeline()
+    scheduler = RequestScheduler(max_in_flight=1, max_queue_size=0, queue_timeout=5.0)
+    server = start_api_server(pipeline, scheduler, port=0, host="127.0.0.1")
+    yield f"http://127.0.0.1:{server.server_address[1]}", pipeline, scheduler
+    server.shutdown()
+    server.server_close()
+
+
+def post(url: str, body: dict) -> dict:
+    request = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"), method="POST")
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+class TestBatchQueries:
+    """Test /query/batch admission"""
+
+    def test_batch_does_not_reject_its_own_items(self, api):
+        url, pipeline, scheduler = api
+        questions = [f"question {i}" for i in range(12)]
+
+        payload = post(f"{url}/query/batch", {"questions": questions})
+
+        assert [result.get("answer") for result in payload["results"]] == [q.upper() for q in questions]
+        assert scheduler.stats()["rejected_full"] == 0
+        assert pipeline.peak == 1
+
+    def test_rejects_oversized_batch(self, api):
+        url, _, _ = api
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post(f"{url}/query/batch", {"questions": ["q"] * 65})
+        assert error.value.code == 400
+
+
+class TestQueryArgs:
+    """Test request validation"""
+
+    @pytest.mark.parametrize("top_k", [0, -1, 51])
+    def test_rejects_top_k_out_of_range(self, api, top_k):
+        url, _, _ = api
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post(f"{url}/query", {"question": "q", "top_k": top_k})
+        assert error.value.code == 400
+
+    def test_rejects_batch_default_top_k_out_of_range(self, api):
+        url, _, _ = api
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post(f"{url}/query/batch", {"questions": [{"question": "q", "top_k": 3}], "top_k": 0})
+        assert error.value.code == 400
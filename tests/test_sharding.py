@@ -0,0 +1,80 @@
+"""
+Tests for category shards and query routing
+"""
+import numpy as np
+
+from sharding import CentroidRouter, ShardedRetriever
+from tests.helpers import FakeEmbeddings, sample_chunks
+
+
+def build_sharded(**kwargs):
+    retriever = ShardedRetriever(embeddings=FakeEmbeddings(), **kwargs)
+    retriever.index_documents(sample_chunks())
+    return retriever
+
+
+class TestCentroidRouter:
+    """Test routing by centroid and by filter"""
+
+    def fitted(self, **kwargs):
+        router = CentroidRouter(**kwargs)
+        router.fit(
+            {"a": np.array([[1.0, 0.0], [0.9, 0.1]]), "b": np.array([[0.0, 1.0]])},
+            {"a": ["a.pdf"], "b": ["b1.pdf", "b2.pdf"]},
+        )
+        return router
+
+    def test_routes_to_nearest_centroid(self):
+        router = self.fitted(max_shards=2, margin=0.1)
+        assert router.route(np.array([1.0, 0.0], dtype=np.float32)) == ["a"]
+        assert router.route(np.array([0.0, 1.0], dtype=np.float32)) == ["b"]
+
+    def test_margin_adds_close_shards_up_to_max(self):
+        query = np.array([0.7, 0.7], dtype=np.float32)
+        assert sorted(self.fitted(max_shards=2, margin=0.5).route(query)) == ["a", "b"]
+        assert len(self.fitted(max_shards=1, margin=0.5).route(query)) == 1
+
+    def test_filters_select_shards(self):
+        router = self.fitted()
+        assert router.shards_for({"category": ["b", "missing"]}) == ["b"]
+        assert router.shards_for({"source_file": "b2.pdf"}) == ["b"]
+        assert router.shards_for({"category": "a", "source": "b1.pdf"}) == []
+        assert router.shards_for({"chunk_range": [0, 3]}) is None
+
+    def test_round_trips_through_dict(self):
+        router = self.fitted()
+        loaded = CentroidRouter()
+        loaded.load_dict(router.to_dict())
+        assert loaded.names == router.names and loaded.sources == router.sources
+        np.testing.assert_allclose(loaded.centroids, router.centroids)
+
+
+class TestShardedRetriever:
+    """Test one shard per category, routing and lazy loading"""
+
+    def test_builds_one_shard_per_category(self):
+        retriever = build_sharded()
+        assert retriever.router.names == ["finance", "hr", "vendor"]
+        assert retriever.router.sizes == {"finance": 2, "hr": 2, "vendor": 2}
+
+    def test_category_filter_searches_only_that_shard(self):
+        retriever = build_sharded(max_shards=1)
+        rows = retriever.retrieve("vendor registration", top_k=5, filters={"category": "hr"})
+        assert {row["metadata"]["category"] for row in rows} == {"hr"}
+
+    def test_routed_query_finds_its_category(self):
+        retriever = build_sharded(max_shards=1, margin=0.0)
+        rows = retriever.retrieve("Vendors register with a tax ID and a business license.", top_k=1)
+        assert rows[0]["source"] == "vendor_manual.pdf"
+
+    def test_saved_shards_load_lazily_within_residency_limit(self, tmp_path):
+        build_sharded().save(str(tmp_path))
+        assert ShardedRetriever.exists(str(tmp_path))
+
+        loaded = ShardedRetriever(embeddings=FakeEmbeddings(), max_loaded_shards=1)
+        loaded.load(str(tmp_path))
+        assert loaded.memory_bytes() == 0
+        for category in ["vendor", "finance", "hr"]:
+            rows = loaded.retrieve("policy", top_k=2, filters={"category": category})
+            assert {row["metadata"]["category"] for row in rows} == {category}
+        assert len(loaded._shards) == 1
@@ -0,0 +1,200 @@
+"""
+Tests for single-flight deduplication of identical in-flight questions
+"""
+import threading
+
+import pytest
+
+from cancellation import CancelToken, GenerationCancelled
+from tests.helpers import FakeLLM, FakeRetriever, wait_until
+
+
+def ask_all(pipeline, questions, **kwargs):
+    """answer_question for every question on its own thread; returns (threads, outcomes by index)"""
+    outcomes = {}
+
+    def ask(i, question):
+        try:
+            outcomes[i] = pipeline.answer_question(question, request_id=f"r{i}", **kwargs)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=ask, args=(i, q), daemon=True) for i, q in enumerate(questions)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def attached(pipeline, n: int) -> bool:
+    """n requests joined the first one's flight"""
+    return pipeline.flights.dedup_ratio() == pytest.approx(n / (n + 1))
+
+
+class TestSingleFlight:
+    """Test leaders, followers and flight lifetime"""
+
+    def test_identical_questions_share_one_generation(self, make_pipeline, gate):
+        llm = FakeLLM(gate=gate)
+        retriever = FakeRetriever()
+        pipeline = make_pipeline(llm=llm, retriever=retriever)
+        questions = ["How do I register a vendor?", "how do i  register a VENDOR", "How do I register a vendor"] * 2
+
+        threads, outcomes = ask_all(pipeline, questions)
+        wait_until(lambda: attached(pipeline, len(questions) - 1))
+        gate.set()
+        for thread in threads:
+            thread.join(2)
+
+        assert llm.calls == 1
+        assert retriever.calls == 1
+        results = [outcomes[i] for i in range(len(questions))]
+        assert len({result["answer"] for result in results}) == 1
+        assert sum(bool(result.get("deduplicated")) for result in results) == len(questions) - 1
+        assert [result["request_id"] for result in results] == [f"r{i}" for i in range(len(questions))]
+
+    def test_different_parameters_do_not_share(self, make_pipeline, gate):
+        llm = FakeLLM(gate=gate)
+        pipeline = make_pipeline(llm=llm)
+        outcomes = {}
+
+        def ask(top_k):
+            outcomes[top_k] = pipeline.answer_question("vendor registration", top_k=top_k)
+
+        threads = [threading.Thread(target=ask, args=(top_k,), daemon=True) for top_k in (3, 5)]
+        for thread in threads:
+            thread.start()
+        wait_until(lambda: llm.started == 2)
+        gate.set()
+        for thread in threads:
+            thread.join(2)
+        assert llm.calls == 2
+
+    def test_followers_get_the_leaders_error(self, make_pipeline, gate):
+        retriever = FakeRetriever(error=RuntimeError("index gone"), gate=gate)
+        pipeline = make_pipeline(retriever=retriever)
+
+        threads, outcomes = ask_all(pipeline, ["vendor registration"] * 4)
+        wait_until(lambda: attached(pipeline, 3))
+        gate.set()
+        for thread in threads:
+            thread.join(2)
+
+        assert not any(thread.is_alive() for thread in threads)
+        assert all(isinstance(outcomes[i], RuntimeError) for i in range(4))
+        assert retriever.calls == 1
+
+        # The failed flight is gone: the next identical question tries again
+        retriever.error = None
+        assert pipeline.answer_question("vendor registration")["answer"]
+        assert retriever.calls == 2
+
+    def test_cancelled_leader_does_not_cancel_followers(self, make_pipeline, gate):
+        llm = FakeLLM(gate=gate)
+        pipeline = make_pipeline(llm=llm)
+        leader_token = CancelToken()
+        outcomes = {}
+
+        def lead():
+            try:
+                pipeline.answer_question("vendor registration", cancel=leader_token)
+            except GenerationCancelled as e:
+                outcomes["leader"] = e.reason
+
+        leader = threading.Thread(target=lead, daemon=True)
+        leader.start()
+        wait_until(lambda: llm.started == 1)
+        followers, follower_outcomes = ask_all(pipeline, ["vendor registration"])
+        wait_until(lambda: attached(pipeline, 1))
+
+        leader_token.cancel("disconnected")
+        gate.set()
+        for thread in [leader, *followers]:
+            thread.join(2)
+
+        assert outcomes == {"leader": "disconnected"}
+        assert follower_outcomes[0]["deduplicated"] is True
+        assert len(follower_outcomes[0]["answer"].split()) == llm.tokens
+        assert llm.calls == 1
+
+    def test_generation_stops_when_everyone_leaves(self, make_pipeline):
+        llm = FakeLLM(tokens=500, delay=0.01)
+        pipeline = make_pipeline(llm=llm)
+        tokens = [CancelToken(), CancelToken()]
+        reasons = []
+
+        def ask(token):
+            try:
+                pipeline.answer_question("vendor registration", cancel=token)
+            except GenerationCancelled as e:
+                reasons.append(e.reason)
+
+        threads = [threading.Thread(target=ask, args=(token,), daemon=True) for token in tokens]
+        for thread in threads:
+            thread.start()
+        wait_until(lambda: attached(pipeline, 1) and llm.started == 1)
+
+        tokens[0].cancel("disconnected")
+        assert llm.ended == 0  # Still generating for the other request
+        tokens[1].cancel("disconnected")
+        for thread in threads:
+            thread.join(2)
+
+        assert reasons == ["disconnected", "disconnected"]
+        wait_until(lambda: llm.ended == 1)
+
+    def test_flight_is_removed_after_completion(self, make_pipeline):
+        llm = FakeLLM()
+        pipeline = make_pipeline(llm=llm)
+
+        first = pipeline.answer_question("vendor registration")
+        second = pipeline.answer_question("vendor registration")
+
+        assert llm.calls == 2
+        assert "deduplicated" not in first and "deduplicated" not in second
+        assert pipeline.flights.dedup_ratio() == 0.0
+
+    def test_can_be_turned_off(self, make_pipeline, gate):
+        llm = FakeLLM(gate=gate)
+        pipeline = make_pipeline(llm=llm, single_flight=False)
+
+        threads, _ = ask_all(pipeline, ["vendor registration"] * 3)
+        wait_until(lambda: llm.started == 3)
+        gate.set()
+        for thread in threads:
+            thread.join(2)
+        assert llm.calls == 3
+
+
+class TestSingleFlightStreams:
+    """Test streams attaching to a stream in flight"""
+
+    def test_late_stream_replays_and_follows(self, make_pipeline):
+        llm = FakeLLM(tokens=30, delay=0.005)
+        pipeline = make_pipeline(llm=llm)
+
+        leader = pipeline.stream_answer("vendor registration", request_id="first")
+        head = [next(leader) for _ in range(4)]
+        follower = list(pipeline.stream_answer("vendor registration", request_id="second"))
+        leader_events = head + list(leader)
+
+        def text(events):
+            return "".join(event["text"] for event in events if event["event"] == "token")
+
+        assert text(follower) == text(leader_events)
+        assert llm.calls == 1
+        assert leader_events[-1]["request_id"] == "first"
+        assert follower[-1]["event"] == "done"
+        assert follower[-1]["request_id"] == "second"
+        assert follower[-1]["deduplicated"] is True
+
+    def test_closed_follower_leaves_leader_streaming(self, make_pipeline):
+        llm = FakeLLM(tokens=30, delay=0.005)
+        pipeline = make_pipeline(llm=llm)
+
+        leader = pipeline.stream_answer("vendor registration")
+        next(leader)
+        follower = pipeline.stream_answer("vendor registration")
+        next(follower)
+        follower.close()
+
+        assert list(leader)[-1]["event"] == "done"
@@ -3,9 +3,14 @@ ERP RAG UI - Cyberpunk Holographic Design (Final Corrected)
 """
 
 import gradio as gr
-import json
+import uuid
 from datetime import datetime
-from pathlib import Path
+
+from cache_warming import QUICK_ACCESS_QUESTIONS
+from config import Config
+from feedback_store import FeedbackStore
+from cancellation import GenerationCancelled
+from scheduler import SchedulerBusy
 
 
 # Ultra Modern Custom CSS
@@ -264,19 +269,38 @@ p, span, label {
 
 
 class RAGInterface:
-    def __init__(self, pipeline):
+    def __init__(self, pipeline, scheduler=None, feedback_store=None):
         self.pipeline = pipeline
-        self.feedback_log = []
-        self.query_count = 0
+        self.scheduler = scheduler
+        self.feedback_store = feedback_store or FeedbackStore(
+            Config.FEEDBACK_FILE,
+            max_bytes=Config.FEEDBACK_MAX_BYTES,
+            rotate_seconds=Config.FEEDBACK_ROTATE_SECONDS,
+            backup_count=Config.FEEDBACK_BACKUP_COUNT,
+            flush_interval=Config.FEEDBACK_FLUSH_SECONDS,
+        )
 
-    def respond(self, message, history):
+    def respond(self, message, history, mode=None):
+        response, _ = self.answer(message, mode)
+        return response
+
+    def answer(self, message, mode=None, session=None):
+        """Return (markdown response, request_id) for one chat message"""
         if not message or not message.strip():
-            return ""
+            return "", None
 
-        self.query_count += 1
+        request_id = uuid.uuid4().hex[:12]
 
         try:
-            result = self.pipeline.answer_question(message, top_k=3)
+            # Cached and in-flight questions are answered without entering the generation queue
+            result = self.pipeline.answer_question(
+                message,
+                top_k=Config.UI_TOP_K,
+                request_id=request_id,
+                mode=mode,
+                session=session,
+                admit=self.scheduler.run if self.scheduler is not None else None,
+            )
 
             response = "### 🌟 SYSTEM RESPONSE\n\n"
             response += f"> {result.get('answer', 'No data found')}\n\n"
@@ -292,10 +316,27 @@ class RAGInterface:
 
             confidence = result.get("confidence", 0)
             response += "\n---\n"
-            response += f"🔢 **QUERY ID:** #{self.query_count} | "
+            response += f"🔢 **QUERY ID:** {request_id} | "
             response += f"📊 **ACCURACY:** {confidence:.1%} | "
-            response += f"🤖 **ENGINE:** Ollama-3.2"
-
+            response += f"⏱️ **LATENCY:** {result.get('timings', {}).get('total', 0):.0f}ms | "
+            if result.get("mode") == "extractive":
+                fallback = result.get("fallback")
+                engine = f"Extractive (fallback: {fallback})" if fallback else "Extractive"
+            else:
+                engine = "Ollama-3.2"
+            if result.get("cached"):
+                engine += " (cached)"
+            response += f"🤖 **ENGINE:** {engine}"
+
+        except GenerationCancelled as e:
+            # "superseded": a newer question from this session replaced it
+            response = f"### ⏹️ CANCELLED\n\nThis answer was stopped ({e.reason})."
+        except SchedulerBusy as e:
+            response = (
+                "### ⏳ SYSTEM BUSY\n\n"
+                f"All answer slots are taken ({e.reason}, {e.queue_depth} waiting).\n\n"
+                "Please try again in a few seconds."
+            )
         except Exception as e:
             response = (
                 "### ⚠️ SYSTEM ERROR\n\n"
@@ -306,27 +347,34 @@ class RAGInterface:
                 "3. Test: `ollama run llama3.2`"
             )
 
-        return response
+        return response, request_id
 
-    def save_feedback(self, rating, comment):
+    def queue_status(self):
+        if self.scheduler is None:
+            return ""
+
+        stats = self.scheduler.stats()
+        return (
+            f"📶 **QUEUE:** {stats['queue_depth']}/{stats['max_queue_size']} | "
+            f"⚙️ **ACTIVE:** {stats['in_flight']}/{stats['max_in_flight']} | "
+            f"⏱️ **WAIT p95:** {stats['wait_p95']:.1f}s | "
+            f"🚫 **REJECTED:** {stats['rejected_full'] + stats['rejected_timeout']}"
+        )
+
+    def save_feedback(self, rating, comment, request_id=None):
         feedback = {
             "timestamp": datetime.now().isoformat(),
             "rating": int(rating),
             "comment": comment,
-            "query_id": self.query_count,
+            "request_id": request_id,
         }
 
-        self.feedback_log.append(feedback)
-        Path("data/feedback").mkdir(parents=True, exist_ok=True)
+        summary = self.feedback_store.add(feedback)
 
-        with open("data/feedback/feedback.jsonl", "a", encoding="utf-8") as f:
-            f.write(json.dumps(feedback) + "\n")
-
-        avg = sum(f["rating"] for f in self.feedback_log) / len(self.feedback_log)
-        
         # Return success message AND clear inputs
         return (
-            f"✨ FEEDBACK LOGGED | Rating: {rating}⭐ | Avg: {avg:.1f}⭐",
+            f"✨ FEEDBACK LOGGED | Rating: {rating}⭐ | Avg: {summary['mean']:.1f}⭐ "
+            f"({summary['count']} ratings)",
             5,  # Reset rating slider to 5
             ""  # Clear comment textbox
         )
@@ -361,26 +409,38 @@ class RAGInterface:
                     )
 
                     send_btn = gr.Button("🚀 ASK", variant="primary")
+                    answer_mode = gr.Radio(
+                        ["auto", "generate", "extractive"],
+                        value=self.pipeline.answer_mode,
+                        label="🧠 ANSWER MODE",
+                    )
+                    queue_info = gr.Markdown(self.queue_status())
+                    # Per-session ID of the last answer, so feedback links to it
+                    last_request_id = gr.State(None)
 
                     # Chat function
-                    def send_message(message, history):
+                    def send_message(message, history, request_id, mode, request: gr.Request = None):
                         if not message:
-                            return "", history
+                            return "", history, self.queue_status(), request_id
                         
                         if history is None:
                             history = []
 
                         # Get response
-                        response = self.respond(message, history)
+                        # A new question from the same browser session stops the previous answer
+                        session = request.session_hash if request is not None else None
+                        response, request_id = self.answer(message, mode, session)
 
                         # Append to history
                         history.append({"role": "user", "content": message})
                         history.append({"role": "assistant", "content": response})
 
-                        return "", history
+                        return "", history, self.queue_status(), request_id
 
-                    send_btn.click(send_message, [msg, chatbot], [msg, chatbot])
-                    msg.submit(send_message, [msg, chatbot], [msg, chatbot])
+                    chat_inputs = [msg, chatbot, last_request_id, answer_mode]
+                    chat_outputs = [msg, chatbot, queue_info, last_request_id]
+                    send_btn.click(send_message, chat_inputs, chat_outputs)
+                    msg.submit(send_message, chat_inputs, chat_outputs)
 
                 # Right Column - Examples & Feedback
                 with gr.Column(scale=2):
@@ -390,11 +450,10 @@ class RAGInterface:
                             <h3 style="color:#667eea;margin-bottom:20px;">
                                 💫 QUICK ACCESS COMMANDS
                             </h3>
-                            <div class="cyber-example">🔹 Purchase order workflow</div>
-                            <div class="cyber-example">🔹 Expense validation protocol</div>
-                            <div class="cyber-example">🔹 Vendor registration</div>
-                            <div class="cyber-example">🔹 Payment processing</div>
-                            <div class="cyber-example">🔹 Invoice verification</div>
+                            """ + "".join(
+                                f'<div class="cyber-example">🔹 {question}</div>'
+                                for question in QUICK_ACCESS_QUESTIONS
+                            ) + """
                         </div>
                     """)
 
@@ -415,7 +474,7 @@ class RAGInterface:
                     # Feedback submission with auto-clear
                     feedback_btn.click(
                         self.save_feedback,
-                        inputs=[rating, comment],
+                        inputs=[rating, comment, last_request_id],
                         outputs=[status, rating, comment]
                     )
 
@@ -456,6 +515,14 @@ class RAGInterface:
         print("💡 SHUTDOWN: Ctrl+C\n")
         print("=" * 80 + "\n")
 
+        # Let requests reach the scheduler so it can queue or reject them itself
+        if self.scheduler is not None:
+            demo.queue(
+                default_concurrency_limit=(
+                    self.scheduler.max_in_flight + self.scheduler.max_queue_size
+                )
+            )
+
         demo.launch(
             server_port=port,
             server_name="0.0.0.0",